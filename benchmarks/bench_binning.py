@@ -0,0 +1,86 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+benchmarks.bench_binning
+------------------------
+
+Times `BinningOp`, with and without `BinningOp.bin_count_name`, and 
+counting the events in each bin with ``DataFrame.groupby`` (the way 
+`BinningOp` used to) for comparison.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 10000000,
+                        help = "Number of events")
+    parser.add_argument('-b', '--bins', type = int, default = 1000,
+                        help = "Number of bins")
+    parser.add_argument('-c', '--channels', type = int, default = 4,
+                        help = "Number of channels")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    
+    ex = flow.Experiment()
+    ex.data = pd.DataFrame(index = range(args.events))
+    for c in range(args.channels):
+        ex.add_channel("C{}".format(c), pd.Series(rng.normal(500, 100, size = args.events)))
+    
+    x = ex["C0"]
+    bin_width = (x.max() - min(x.min(), 0)) / (args.bins - 1)
+    
+    op = flow.BinningOp(name = "Bin",
+                        channel = "C0",
+                        scale = "linear",
+                        bin_width = bin_width,
+                        _max_num_bins = 2 * args.bins)
+    
+    t_bin, ex2 = time_it(op.apply, ex)
+    
+    op.bin_count_name = "Bin_Count"
+    t_count, _ = time_it(op.apply, ex)
+    
+    def groupby_count(data):
+        agg_count = data.groupby("Bin").count()
+        return data["Bin"].map(agg_count[agg_count.columns[0]])
+    
+    t_groupby, _ = time_it(groupby_count, ex2.data)
+    
+    print("{:>10} {:>6} {:>14} {:>17} {:>13}"
+          .format("events", "bins", "no count (s)", "bin_count_name (s)", "groupby (s)"))
+    print("{:>10} {:>6} {:>14.3f} {:>17.3f} {:>13.3f}"
+          .format(args.events, len(ex2.metadata["Bin"]["bins"]), 
+                  t_bin, t_count, t_groupby))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+benchmarks.bench_bleedthrough
+-----------------------------
+
+Times `BleedthroughLinearOp.apply` compensating many channels, and the
+same compensation as one `numpy.dot` of the whole (events x channels) 
+frame for comparison.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 5000000,
+                        help = "Number of events")
+    parser.add_argument('-c', '--channels', type = int, default = 12,
+                        help = "Number of channels")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    channels = ["C{}".format(c) for c in range(args.channels)]
+    
+    ex = flow.Experiment()
+    ex.data = pd.DataFrame(index = range(args.events))
+    for c in channels:
+        ex.add_channel(c, pd.Series(rng.lognormal(5, 1, size = args.events)))
+        
+    op = flow.BleedthroughLinearOp(spillover = {(x, y) : rng.uniform(0, 0.05)
+                                                for x in channels 
+                                                for y in channels 
+                                                if x != y})
+    
+    t_apply, ex2 = time_it(op.apply, ex)
+    
+    order = ex2.metadata[channels[0]]["bleedthrough_channels"]
+    a_inv = np.linalg.pinv([[op.spillover[(y, x)] if x != y else 1.0 for x in order]
+                            for y in order])
+    t_dot, expected = time_it(lambda: np.dot(ex.data[order], a_inv))
+    
+    print("{:>10} {:>9} {:>10} {:>14} {:>12}"
+          .format("events", "channels", "apply (s)", "np.dot (s)", "max rel err"))
+    print("{:>10} {:>9} {:>10.3f} {:>14.3f} {:>12.2g}"
+          .format(args.events, args.channels, t_apply, t_dot,
+                  np.max(np.abs(ex2.data[order].values - expected) / np.abs(expected))))
+
+if __name__ == '__main__':
+    main()
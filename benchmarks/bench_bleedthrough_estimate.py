@@ -0,0 +1,91 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+"""
+benchmarks.bench_bleedthrough_estimate
+--------------------------------------
+
+Times the fits in `BleedthroughLinearOp.estimate` -- every other channel 
+against one control's channel at once -- on synthetic data, against 
+fitting each pair with `scipy.optimize.curve_fit`.  Then times 
+`BleedthroughLinearOp.estimate` on the single-color controls in the test 
+data, with one and with several workers.
+"""
+
+import argparse, os, time
+
+import numpy as np
+import scipy.optimize
+
+import cytoflow as flow
+from cytoflow.operations.bleedthrough_linear import _fit_spillover
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def curve_fit_all(x, y):
+    return np.array([scipy.optimize.curve_fit(lambda x, k: x * k, x, y[:, i], 0)[0][0]
+                     for i in range(y.shape[1])])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 100000,
+                        help = "Number of events in each synthetic control")
+    parser.add_argument('-c', '--channels', type = int, default = 16,
+                        help = "Number of channels")
+    parser.add_argument('-w', '--workers', type = int, default = 4,
+                        help = "Number of threads to load the controls with")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(5, 1, size = args.events)
+    k = rng.uniform(0, 0.05, size = args.channels - 1)
+    y = np.outer(x, k) + rng.normal(0, 5, size = (args.events, args.channels - 1))
+    
+    # one fit per control, so the whole panel is (channels) of these
+    t_curve_fit, k_curve_fit = time_it(curve_fit_all, x, y)
+    print("{:>10} {:>9} {:>14} {:>12}"
+          .format("events", "channels", "fit", "panel (s)"))
+    print("{:>10} {:>9} {:>14} {:>12.3f}"
+          .format(args.events, args.channels, "curve_fit", t_curve_fit * args.channels))
+    for regression in ["least_squares", "huber", "trimmed"]:
+        t_fit, k_fit = time_it(_fit_spillover, x, y, regression)
+        print("{:>10} {:>9} {:>14} {:>12.3f}"
+              .format(args.events, args.channels, regression, t_fit * args.channels))
+        
+    data = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        '..', 'cytoflow', 'tests', 'data', 'tasbe')
+    ex = flow.ImportOp(tubes = [flow.Tube(file = os.path.join(data, 'rby.fcs'))]).apply()
+    controls = {'Pacific Blue-A' : os.path.join(data, 'ebfp.fcs'),
+                'FITC-A' : os.path.join(data, 'eyfp.fcs'),
+                'PE-Tx-Red-YG-A' : os.path.join(data, 'mkate.fcs')}
+
+    print()
+    print("{:>10} {:>14}".format("workers", "estimate (s)"))
+    for workers in sorted({1, args.workers}):
+        op = flow.BleedthroughLinearOp(controls = controls, workers = workers)
+        t_estimate, _ = time_it(op.estimate, ex)
+        print("{:>10} {:>14.3f}".format(workers, t_estimate))
+
+if __name__ == '__main__':
+    main()
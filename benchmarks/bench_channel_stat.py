@@ -0,0 +1,105 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_channel_stat
+-----------------------------
+
+Times `ChannelStatisticOp` computing a per-well, per-bin statistic, with a
+function that has a vectorized version (see `util.group_reduce
+<cytoflow.utility.reducers.group_reduce>`) and with the same function
+wrapped in a ``lambda``, which is called once per group.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 1000000,
+                        help = "Number of events")
+    parser.add_argument('-w', '--wells', type = int, default = 96,
+                        help = "Number of wells")
+    parser.add_argument('-b', '--bins', type = int, default = 100,
+                        help = "Number of bins in each well")
+    parser.add_argument('-f', '--function', default = "geom_mean",
+                        choices = ["len", "mean", "median", "std", "geom_mean", 
+                                   "geom_sd", "quantile"],
+                        help = "The statistic to compute")
+    args = parser.parse_args()
+    
+    function = {"len" : len,
+                "mean" : np.mean,
+                "median" : np.median,
+                "std" : np.std,
+                "geom_mean" : flow.geom_mean,
+                "geom_sd" : flow.geom_sd,
+                "quantile" : util.quantile(0.9)}[args.function]
+    
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({"Y" : 10 ** rng.normal(3, 0.5, size = args.events)})
+    
+    ex = flow.Experiment()
+    ex.add_condition("Well", "int")
+    ex.add_channel("Y")
+    ex.metadata["Y"]["range"] = data["Y"].max()
+    for w, well_data in enumerate(np.array_split(data, args.wells)):
+        ex.add_events(well_data, {"Well" : w})
+    ex.add_condition("Bin", "int", 
+                     pd.Series(rng.integers(0, args.bins, size = args.events)))
+        
+    # don't time building the group index
+    ex.group_index(["Well", "Bin"])
+    
+    vectorized = flow.ChannelStatisticOp(name = "Stat",
+                                         channel = "Y",
+                                         function = function,
+                                         by = ["Well", "Bin"])
+    
+    per_group = flow.ChannelStatisticOp(name = "Stat",
+                                        channel = "Y",
+                                        function = lambda x: function(x),
+                                        statistic_name = function.__name__,
+                                        by = ["Well", "Bin"])
+    
+    t_group, ex_group = time_it(per_group.apply, ex)
+    t_vector, ex_vector = time_it(vectorized.apply, ex)
+    
+    stat_group = ex_group.statistics[("Stat", function.__name__)]
+    stat_vector = ex_vector.statistics[("Stat", function.__name__)]
+    
+    print("{:>10} {:>8} {:>12} {:>15} {:>16} {:>12}"
+          .format("events", "groups", "function", "per group (s)", 
+                  "vectorized (s)", "max rel err"))
+    print("{:>10} {:>8} {:>12} {:>15.3f} {:>16.3f} {:>12.2g}"
+          .format(args.events, len(stat_group), function.__name__, t_group, t_vector,
+                  np.max(np.abs(stat_vector - stat_group) / np.abs(stat_group))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+benchmarks.bench_ci
+-------------------
+
+Times a `ChannelStatisticOp` that computes a bootstrapped confidence 
+interval (`util.ci <cytoflow.utility.algorithms.ci>`) for each of many
+groups.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 1000000,
+                        help = "Number of events")
+    parser.add_argument('-g', '--groups', type = int, default = 384,
+                        help = "Number of groups")
+    parser.add_argument('-b', '--boots', type = int, default = 1000,
+                        help = "Number of bootstrap resamples")
+    parser.add_argument('-f', '--function', default = "geom_mean",
+                        choices = ["mean", "median", "geom_mean"],
+                        help = "The statistic to compute the CI of")
+    parser.add_argument('-w', '--workers', type = int, default = 1,
+                        help = "Number of threads for each bootstrap")
+    args = parser.parse_args()
+    
+    function = {"mean" : np.mean,
+                "median" : np.median,
+                "geom_mean" : flow.geom_mean}[args.function]
+    
+    rng = np.random.default_rng(0)
+    
+    ex = flow.Experiment()
+    ex.data = pd.DataFrame(index = range(args.events))
+    ex.add_channel("Y", pd.Series(10 ** rng.normal(3, 0.5, size = args.events)))
+    ex.add_condition("Well", "int", 
+                     pd.Series(rng.integers(0, args.groups, size = args.events)))
+    
+    op = flow.ChannelStatisticOp(name = "CI",
+                                 channel = "Y",
+                                 function = lambda x: util.ci(x, function, 
+                                                              boots = args.boots,
+                                                              workers = args.workers),
+                                 statistic_name = "ci",
+                                 by = ["Well"])
+    
+    t, _ = time_it(op.apply, ex)
+    
+    print("{:>10} {:>8} {:>8} {:>12} {:>8}"
+          .format("events", "groups", "boots", "function", "time (s)"))
+    print("{:>10} {:>8} {:>8} {:>12} {:>8.2f}"
+          .format(args.events, args.groups, args.boots, function.__name__, t))
+
+if __name__ == '__main__':
+    main()
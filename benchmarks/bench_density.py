@@ -0,0 +1,84 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_density
+------------------------
+
+Times `DensityGateOp.estimate` and `DensityGateOp.apply` on N events drawn
+from a 2D gaussian, split into a few groups.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 10000000,
+                        help = "Number of events")
+    parser.add_argument('-b', '--bins', type = int, default = 200,
+                        help = "Number of bins on each axis")
+    parser.add_argument('-k', '--keep', type = float, default = 0.9,
+                        help = "Proportion of events to keep")
+    parser.add_argument('-g', '--groups', type = int, default = 4,
+                        help = "Number of groups")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({"X" : 10 ** rng.normal(3, 0.5, size = args.events),
+                         "Y" : 10 ** rng.normal(3, 0.5, size = args.events)})
+    
+    ex = flow.Experiment()
+    ex.add_condition("Group", "int")
+    for c in ["X", "Y"]:
+        ex.add_channel(c)
+        ex.metadata[c]["range"] = data[c].max()
+    for g, group_data in enumerate(np.array_split(data, args.groups)):
+        ex.add_events(group_data, {"Group" : g})
+    
+    op = flow.DensityGateOp(name = "Density",
+                            xchannel = "X",
+                            xscale = "log",
+                            ychannel = "Y",
+                            yscale = "log",
+                            bins = args.bins,
+                            keep = args.keep,
+                            by = ["Group"])
+    
+    t_estimate, _ = time_it(op.estimate, ex)
+    t_apply, ex2 = time_it(op.apply, ex)
+    
+    print("{:>10} {:>6} {:>12} {:>14} {:>12} {:>10}"
+          .format("events", "bins", "kept bins", "estimate (s)", "apply (s)", "kept"))
+    print("{:>10} {:>6} {:>12} {:>14.3f} {:>12.3f} {:>10.3f}"
+          .format(args.events, args.bins, 
+                  int(np.mean([len(b) for b in op._keep_xbins.values()])),
+                  t_estimate, t_apply, ex2["Density"].mean()))
+
+if __name__ == '__main__':
+    main()
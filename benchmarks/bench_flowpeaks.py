@@ -0,0 +1,73 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_flowpeaks
+--------------------------
+
+Times `FlowPeaksOp.estimate` on N events drawn from a few gaussian clusters
+in D dimensions.  The number of k-means clusters (and so the number of
+peak-finding starts) grows with N.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 100000,
+                        help = "Number of events")
+    parser.add_argument('-d', '--dimensions', type = int, default = 3,
+                        help = "Number of channels")
+    parser.add_argument('-k', '--clusters', type = int, default = 4,
+                        help = "Number of true clusters")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 1, size = (args.clusters, args.dimensions))
+    comp = rng.integers(args.clusters, size = args.events)
+    channels = ["C{}".format(i) for i in range(args.dimensions)]
+    data = pd.DataFrame(rng.normal(centers[comp], 0.05), columns = channels)
+    
+    ex = flow.Experiment()
+    for c in channels:
+        ex.add_channel(c)
+        ex.metadata[c]["range"] = data[c].max()
+    ex.add_events(data, {})
+    
+    op = flow.FlowPeaksOp(name = "FP",
+                          channels = channels,
+                          scale = {c : "linear" for c in channels})
+    
+    start = time.perf_counter()
+    op.estimate(ex)
+    t = time.perf_counter() - start
+    
+    print("{:>10} {:>10} {:>10} {:>10} {:>12}"
+          .format("events", "channels", "k-means", "peaks", "estimate (s)"))
+    print("{:>10} {:>10} {:>10} {:>10} {:>12.3f}"
+          .format(args.events, args.dimensions, len(op._means[True]),
+                  len(set(op._cluster_group[True])), t))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_gate_set
+-------------------------
+
+Applies 12 gates (threshold, range, 2D range, quad and polygon gates on
+four channels) to N events, first one at a time and then all at once with
+a `GateSetOp`.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 10000000,
+                        help = "Number of events")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    channels = ["FSC-A", "SSC-A", "B1-A", "Y2-A"]
+    data = pd.DataFrame(10 ** rng.normal(3, 0.5, size = (args.events, len(channels))),
+                        columns = channels)
+    
+    ex = flow.Experiment()
+    for c in channels:
+        ex.add_channel(c)
+        ex.metadata[c]["range"] = data[c].max()
+    ex.add_events(data, {})
+    del data
+    
+    polygon = [(300, 300), (3000, 500), (5000, 5000), (500, 3000)]
+    gates = [flow.PolygonOp(name = "Cells", xchannel = "FSC-A", ychannel = "SSC-A",
+                            xscale = "log", yscale = "log", vertices = polygon),
+             flow.Range2DOp(name = "Singlets", xchannel = "FSC-A", ychannel = "SSC-A",
+                            xlow = 200, xhigh = 20000, ylow = 200, yhigh = 20000),
+             flow.ThresholdOp(name = "B1_pos", channel = "B1-A", threshold = 1000),
+             flow.ThresholdOp(name = "Y2_pos", channel = "Y2-A", threshold = 1000),
+             flow.ThresholdOp(name = "B1_hi", channel = "B1-A", threshold = 10000),
+             flow.ThresholdOp(name = "Y2_hi", channel = "Y2-A", threshold = 10000),
+             flow.RangeOp(name = "B1_mid", channel = "B1-A", low = 500, high = 5000),
+             flow.RangeOp(name = "Y2_mid", channel = "Y2-A", low = 500, high = 5000),
+             flow.QuadOp(name = "Quad", xchannel = "B1-A", ychannel = "Y2-A",
+                         xthreshold = 1000, ythreshold = 1000),
+             flow.PolygonOp(name = "B1_Y2", xchannel = "B1-A", ychannel = "Y2-A",
+                            xscale = "log", yscale = "log", vertices = polygon),
+             flow.Range2DOp(name = "Both_mid", xchannel = "B1-A", ychannel = "Y2-A",
+                            xlow = 500, xhigh = 5000, ylow = 500, yhigh = 5000),
+             flow.QuadOp(name = "Scatter_quad", xchannel = "FSC-A", ychannel = "SSC-A",
+                         xthreshold = 1000, ythreshold = 1000)]
+    
+    # one at a time
+    start = time.perf_counter()
+    ex2 = ex
+    for gate in gates:
+        ex2 = gate.apply(ex2)
+    t_separate = time.perf_counter() - start
+    del ex2
+    
+    # all at once, on a fresh copy so no scaled columns are cached
+    ex = ex.clone(deep = True)
+    start = time.perf_counter()
+    ex3 = flow.GateSetOp(gates = gates).apply(ex)
+    t_set = time.perf_counter() - start
+    
+    print("{:>10} {:>8} {:>14} {:>14} {:>10}"
+          .format("events", "gates", "separate (s)", "gate set (s)", "speedup"))
+    print("{:>10} {:>8} {:>14.3f} {:>14.3f} {:>10.1f}"
+          .format(args.events, len(gates), t_separate, t_set, t_separate / t_set))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_gmm_apply
+--------------------------
+
+Fits a 2D, 3-component `GaussianMixtureOp` with `sigma` set, then times 
+`apply` on N events with different numbers of threads.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 50000000,
+                        help = "Number of events")
+    parser.add_argument('-w', '--workers', type = int, nargs = '+', 
+                        default = [1, 2, 4, 8],
+                        help = "Numbers of threads to apply the model with")
+    parser.add_argument('--posteriors', action = 'store_true',
+                        help = "Also compute the posterior probabilities")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    means = np.array([[0, 0], [5, 0], [0, 5]])
+    comp = rng.integers(len(means), size = args.events)
+    data = pd.DataFrame(rng.normal(means[comp], 1.0), columns = ["X", "Y"])
+    del comp
+    
+    ex = flow.Experiment()
+    for c in ["X", "Y"]:
+        ex.add_channel(c)
+        ex.metadata[c]["range"] = data[c].max()
+    ex.add_events(data, {})
+    del data
+    
+    op = flow.GaussianMixtureOp(name = "GM",
+                                channels = ["X", "Y"],
+                                scale = {"X" : "linear", "Y" : "linear"},
+                                num_components = len(means),
+                                sigma = 2.0,
+                                posteriors = args.posteriors,
+                                estimate_events = 100000)
+    op.estimate(ex)
+    
+    print("{:>10} {:>12}".format("threads", "apply (s)"))
+    for w in args.workers:
+        op.workers = w
+        t, ex2 = time_it(op.apply, ex)
+        del ex2
+        print("{:>10} {:>12.3f}".format(w, t))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_import
+-----------------------
+
+Imports N synthetic tubes with `ImportOp` and reports how long it takes.
+Also times `Experiment.add_events` on its own, without the FCS parsing.
+The time per tube should stay roughly constant as N grows.
+"""
+
+import argparse, tempfile, time, os, warnings
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+CHANNELS = ["FSC-A", "SSC-A", "B1-A", "Y2-A", "V2-A", "R1-A"]
+
+def make_tubes(path, n_tubes, n_events, seed = 0):
+    rng = np.random.default_rng(seed)
+    tubes = []
+    for i in range(n_tubes):
+        filename = os.path.join(path, "tube_{}.fcs".format(i))
+        data = rng.lognormal(mean = 5, sigma = 1, 
+                             size = (n_events, len(CHANNELS)))
+        util.write_fcs(filename, 
+                       CHANNELS, 
+                       {c : 2 ** 18 for c in CHANNELS}, 
+                       data,
+                       compat_chn_names = False,
+                       compat_percent = False,
+                       compat_negative = False)
+        tubes.append(flow.Tube(file = filename, 
+                               conditions = {"Well" : "W{}".format(i),
+                                             "Dox" : float(i)}))
+    return tubes
+
+def time_import(tubes, workers = 1):
+    op = flow.ImportOp(conditions = {"Well" : "category", "Dox" : "float"},
+                       tubes = tubes,
+                       workers = workers)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        ex = op.apply()
+    ex.data
+    return time.perf_counter() - start
+
+def time_add_events(n_tubes, n_events, seed = 0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(rng.lognormal(mean = 5, sigma = 1, 
+                                      size = (n_events, len(CHANNELS))),
+                        columns = CHANNELS)
+    ex = flow.Experiment()
+    ex.add_condition("Well", "category")
+    ex.add_condition("Dox", "float")
+    for c in CHANNELS:
+        ex.add_channel(c)
+
+    start = time.perf_counter()
+    for i in range(n_tubes):
+        ex.add_events(data, {"Well" : "W{}".format(i), "Dox" : float(i)})
+    ex.data
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--tubes', type = int, nargs = '+', 
+                        default = [12, 24, 48, 96, 192, 384],
+                        help = "Numbers of tubes to import")
+    parser.add_argument('-e', '--events', type = int, default = 10000,
+                        help = "Events per tube")
+    parser.add_argument('-w', '--workers', type = int, default = 1,
+                        help = "ImportOp.workers")
+    parser.add_argument('--no-fcs', action = 'store_true',
+                        help = "Only time Experiment.add_events")
+    args = parser.parse_args()
+    
+    print("{:>8} {:>12} {:>14} {:>12} {:>14}"
+          .format("tubes", "import (s)", "ms / tube", "add (s)", "ms / tube"))
+    
+    for n in args.tubes:
+        t_add = time_add_events(n, args.events)
+        
+        if args.no_fcs:
+            t_import = float('nan')
+        else:
+            with tempfile.TemporaryDirectory() as path:
+                t_import = time_import(make_tubes(path, n, args.events),
+                                       workers = args.workers)
+        
+        print("{:>8} {:>12.3f} {:>14.2f} {:>12.3f} {:>14.2f}"
+              .format(n, t_import, 1000 * t_import / n, 
+                      t_add, 1000 * t_add / n))
+
+if __name__ == '__main__':
+    main()
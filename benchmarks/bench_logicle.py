@@ -0,0 +1,83 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_logicle
+------------------------
+
+Times the logicle transform (and its inverse) on N events, one event at a 
+time with `numpy.vectorize` (the way `LogicleScale` used to do it) and on the
+whole array at once with `scale_array` and `inverse_array`.
+"""
+
+import argparse, sys, time
+
+import numpy as np
+
+from cytoflow.utility.logicle_ext.Logicle import FastLogicle
+from cytoflow.utility.logicle_ext.arrays import scale_array, inverse_array
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 10000000,
+                        help = "Number of events")
+    parser.add_argument('-w', '--workers', type = int, nargs = '+', 
+                        default = [1, 2, 4, 8],
+                        help = "Numbers of threads for the array transform")
+    parser.add_argument('--no-vectorize', action = 'store_true',
+                        help = "Skip the (slow) numpy.vectorize baseline")
+    args = parser.parse_args()
+    
+    logicle = FastLogicle(2 ** 18, 0.5, 4.5, 0.0)
+    logicle_min = logicle.inverse(0.0)
+    logicle_max = logicle.inverse(1.0 - sys.float_info.epsilon)
+    
+    rng = np.random.default_rng(0)
+    data = np.clip(rng.normal(loc = 1000, scale = 5000, size = args.events),
+                   logicle_min, logicle_max)
+    scaled = scale_array(logicle, data)
+    
+    print("{:>16} {:>12} {:>12} {:>10}"
+          .format("method", "scale (s)", "inverse (s)", "speedup"))
+    
+    if args.no_vectorize:
+        t_base = float('nan')
+    else:
+        t_scale, ret = time_it(np.vectorize(logicle.scale), data)
+        assert np.array_equal(ret, scaled)
+        t_inverse, _ = time_it(np.vectorize(logicle.inverse), scaled)
+        t_base = t_scale + t_inverse
+        print("{:>16} {:>12.3f} {:>12.3f} {:>10.1f}"
+              .format("np.vectorize", t_scale, t_inverse, 1.0))
+        
+    for w in args.workers:
+        t_scale, ret = time_it(scale_array, logicle, data, workers = w)
+        assert np.array_equal(ret, scaled)
+        t_inverse, _ = time_it(inverse_array, logicle, scaled, workers = w)
+        print("{:>16} {:>12.3f} {:>12.3f} {:>10.1f}"
+              .format("array, {} thr".format(w), t_scale, t_inverse, 
+                      t_base / (t_scale + t_inverse)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_multi_stat
+---------------------------
+
+Times building a table of statistics -- the count, mean, geometric mean,
+geometric SD and three quantiles of each channel, per well -- with a
+`ChannelStatisticOp` for each (channel, function) pair, and with one
+`MultiStatisticOp`.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 2000000,
+                        help = "Number of events")
+    parser.add_argument('-c', '--channels', type = int, default = 8,
+                        help = "Number of channels")
+    parser.add_argument('-w', '--wells', type = int, default = 96,
+                        help = "Number of wells")
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = "Number of threads for MultiStatisticOp")
+    args = parser.parse_args()
+    
+    channels = ["C{}".format(i) for i in range(args.channels)]
+    functions = [len, np.mean, flow.geom_mean, flow.geom_sd, 
+                 util.quantile(0.1), util.quantile(0.5), util.quantile(0.9)]
+    
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({c : 10 ** rng.normal(3, 0.5, size = args.events)
+                         for c in channels})
+    
+    ex = flow.Experiment()
+    ex.add_condition("Well", "int")
+    for c in channels:
+        ex.add_channel(c)
+        ex.metadata[c]["range"] = data[c].max()
+    for w, well_data in enumerate(np.array_split(data, args.wells)):
+        ex.add_events(well_data, {"Well" : w})
+        
+    def chained(ex):
+        for c in channels:
+            for fn in functions:
+                ex = flow.ChannelStatisticOp(name = "Stats",
+                                             channel = c,
+                                             function = fn,
+                                             statistic_name = "{}_{}".format(c, fn.__name__),
+                                             by = ["Well"]).apply(ex)
+        return ex
+    
+    op = flow.MultiStatisticOp(name = "Stats",
+                               channels = channels,
+                               functions = functions,
+                               by = ["Well"],
+                               workers = args.workers)
+    
+    t_chained, ex_chained = time_it(chained, ex)
+    t_multi, ex_multi = time_it(op.apply, ex)
+    
+    err = max(np.max(np.abs(ex_multi.statistics[k] - ex_chained.statistics[k]) 
+                     / np.abs(ex_chained.statistics[k]))
+              for k in ex_chained.statistics)
+    
+    print("{:>10} {:>10} {:>12} {:>13} {:>21} {:>12}"
+          .format("events", "channels", "statistics", "chained (s)", 
+                  "MultiStatisticOp (s)", "max rel err"))
+    print("{:>10} {:>10} {:>12} {:>13.3f} {:>21.3f} {:>12.2g}"
+          .format(args.events, args.channels, len(ex_multi.statistics), 
+                  t_chained, t_multi, err))
+
+if __name__ == '__main__':
+    main()
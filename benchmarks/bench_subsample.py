@@ -0,0 +1,102 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+benchmarks.bench_subsample
+--------------------------
+
+Fits a `GaussianMixtureOp` to N synthetic events, first on all of them and
+then on subsamples of different sizes (``estimate_events``), and reports how
+long each fit took and how close its means are to the full fit's and to the
+true means.  Every fit labels all N events, so the table also reports how 
+many of the subsample fits' labels agree with the full fit's.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def agreement(labels, full_labels):
+    """The fraction of events that are labeled the same, up to the order
+    of the components"""
+    counts = pd.crosstab(labels, full_labels).values
+    return counts.max(axis = 1).sum() / len(labels)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type = int, default = 1000000,
+                        help = "Number of events")
+    parser.add_argument('-s', '--sizes', type = int, nargs = '+', 
+                        default = [1000, 10000, 100000],
+                        help = "Subsample sizes to fit on")
+    parser.add_argument('-k', '--components', type = int, default = 3,
+                        help = "Number of components")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    true_means = np.linspace(1, 4, args.components)
+    comp = rng.integers(args.components, size = args.events)
+    data = pd.DataFrame({"X" : 10 ** rng.normal(true_means[comp], 0.2),
+                         "Y" : 10 ** rng.normal(true_means[::-1][comp], 0.2)})
+    
+    ex = flow.Experiment()
+    for c in ["X", "Y"]:
+        ex.add_channel(c)
+        ex.metadata[c]["range"] = data[c].max()
+    ex.add_events(data, {})
+    
+    def fit(events):
+        op = flow.GaussianMixtureOp(name = "GM",
+                                    channels = ["X", "Y"],
+                                    scale = {"X" : "log", "Y" : "log"},
+                                    num_components = args.components,
+                                    estimate_events = events)
+        t_fit, _ = time_it(op.estimate, ex)
+        # the components may come out in a different order each fit
+        means = np.sort(op._gmms[True].means_[:, 0])
+        labels = op.apply(ex)["GM"].values
+        return t_fit, means, labels
+    
+    t_full, full_means, full_labels = fit(None)
+    
+    print("{:>10} {:>10} {:>10} {:>14} {:>14} {:>10}"
+          .format("events", "fit (s)", "speedup", "err vs full", 
+                  "err vs true", "agree"))
+    
+    for events in sorted(args.sizes) + [None]:
+        if events is None:
+            t, means, labels = t_full, full_means, full_labels
+        else:
+            t, means, labels = fit(events)
+        print("{:>10} {:>10.3f} {:>10.1f} {:>14.2e} {:>14.2e} {:>10.4f}"
+              .format(events or args.events, t, t_full / t,
+                      np.abs(means - full_means).max(),
+                      np.abs(means - true_means).max(),
+                      agreement(labels, full_labels)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+benchmarks.bench_xform_stat
+---------------------------
+
+Times `TransformStatisticOp` on a large per-plate, per-well, per-bin 
+statistic: normalizing each well (a transformation), and summing each
+well with a function that has a vectorized version (see `util.group_reduce
+<cytoflow.utility.reducers.group_reduce>`) and with a ``lambda``.
+"""
+
+import argparse, time
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ret = fn(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-p', '--plates', type = int, default = 10,
+                        help = "Number of plates")
+    parser.add_argument('-w', '--wells', type = int, default = 384,
+                        help = "Number of wells on each plate")
+    parser.add_argument('-b', '--bins', type = int, default = 25,
+                        help = "Number of bins in each well")
+    args = parser.parse_args()
+    
+    idx = pd.MultiIndex.from_product([range(args.plates), 
+                                      range(args.wells), 
+                                      range(args.bins)],
+                                     names = ["Plate", "Well", "Bin"])
+    rng = np.random.default_rng(0)
+    
+    ex = flow.Experiment()
+    ex.statistics[("Stat", "len")] = \
+        pd.Series(rng.integers(1, 1000, size = len(idx)).astype(np.float64), 
+                  index = idx)
+        
+    ops = [("normalize", flow.TransformStatisticOp(name = "Norm",
+                                                   statistic = ("Stat", "len"),
+                                                   function = lambda x: x / x.sum(),
+                                                   statistic_name = "norm",
+                                                   by = ["Plate", "Well"])),
+           ("sum (lambda)", flow.TransformStatisticOp(name = "Sum",
+                                                      statistic = ("Stat", "len"),
+                                                      function = lambda x: x.sum(),
+                                                      statistic_name = "sum",
+                                                      by = ["Plate", "Well"])),
+           ("sum (np.sum)", flow.TransformStatisticOp(name = "Sum",
+                                                      statistic = ("Stat", "len"),
+                                                      function = np.sum,
+                                                      by = ["Plate", "Well"]))]
+    
+    print("{:>10} {:>8} {:>14} {:>10}"
+          .format("rows", "groups", "function", "time (s)"))
+    for label, op in ops:
+        t, _ = time_it(op.apply, ex)
+        print("{:>10} {:>8} {:>14} {:>10.3f}"
+              .format(len(idx), args.plates * args.wells, label, t))
+
+if __name__ == '__main__':
+    main()
@@ -63,6 +63,7 @@ from .operations.range import RangeOp
 from .operations.range2d import Range2DOp
 from .operations.polygon import PolygonOp
 from .operations.quad import QuadOp
+from .operations.gate_set import GateSetOp
 
 # TASBE
 from .operations.autofluorescence import AutofluorescenceOp
@@ -82,6 +83,7 @@ from .operations.pca import PCAOp
 from .operations.channel_stat import ChannelStatisticOp
 from .operations.frame_stat import FrameStatisticOp
 from .operations.xform_stat import TransformStatisticOp
+from .operations.multi_stat import MultiStatisticOp
 
 # misc
 from .operations.binning import BinningOp
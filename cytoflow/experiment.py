@@ -26,6 +26,9 @@ Defines `Experiment`, `cytoflow`'s main data structure.
 `Experiment` -- manages the data and metadata for a flow experiment.
 """
 
+import weakref
+
+import numpy as np
 import pandas as pd
 from natsort import natsorted
 
@@ -161,17 +164,54 @@ class Experiment(HasStrictTraits):
 
     """
 
+    # the events, as a DataFrame.  reading `data` consolidates any events
+    # that are still pending from `add_events` (see `_pending_events`, below)
+    data = Property(Instance(pd.DataFrame))
+    
     # this doesn't play nice with copy.copy() (used if, say, you copy
     # an Experiment with HasTraits.clone_traits()) -- instead, copy
     # a reference when clone_traits() is called, then replace it with
     # using pandas.DataFrame.copy(deep = False)
-    data = Instance(pd.DataFrame, args=(), copy = "ref")
+    _data = Instance(pd.DataFrame, args=(), copy = "ref")
+    
+    # events added by `add_events` that haven't been merged into `_data`
+    # yet.  each entry is a tuple of (channel arrays, conditions, length).
+    # appending to a DataFrame copies the whole frame, so we keep the new
+    # tubes column-wise here and concatenate them once, the next time 
+    # someone asks for `data`.
+    _pending_events = List(Tuple, copy = "ref")
+    
+    # memoized group indices: `by` tuple --> (weakref to the index of `_data`
+    # they were built from, GroupIndex).  a shallow clone keeps the same
+    # row index, so it starts with a copy of these dicts from the experiment
+    # it was cloned from (but not the entries either adds after that -- 
+    # sibling clones can add different columns with the same name); 
+    # anything that adds or removes rows replaces the row index, which 
+    # invalidates them.  adding or replacing a column drops the entries that
+    # mention it.  (they're not `Dict` traits because those copy the dict
+    # when it's assigned.)  they're transient, so they aren't pickled (the
+    # weakrefs can't be); an unpickled experiment starts with empty memos.
+    _group_indices = Instance(dict, args = (), copy = "ref", transient = True)
+    
+    # memoized scales, filled in by `util.scale_factory`: (scale name, 
+    # params) --> (weakref to the index of `_data`, scale).  they're 
+    # copied and invalidated the same way as `_group_indices`.
+    _scales = Instance(dict, args = (), copy = "ref", transient = True)
+    
+    # memoized scaled columns (see `scaled`): (column, scale) --> (weakref 
+    # to the index of `_data`, read-only numpy.ndarray), least recently used
+    # first.
+    _scaled_columns = Instance(dict, args = (), copy = "ref", transient = True)
+    
+    # memoized statistic indices (see `statistic_index`): (`by` tuple, 
+    # levels) --> (weakref to the index of `_data`, pandas.Index).
+    _statistic_indices = Instance(dict, args = (), copy = "ref", transient = True)
     
     # potentially mutable.  deep copy required
     metadata = Dict(Str, Any, copy = "deep")
     
-    # statistics.  mutable, deep copy required
-    statistics = Dict(Tuple(Str, Str), pd.Series, copy = "deep")
+    # statistics.  `clone` shares their values copy-on-write
+    statistics = Dict(Tuple(Str, Str), pd.Series, copy = "shallow")
     
     history = List(Any, copy = "shallow")
     
@@ -183,18 +223,57 @@ class Experiment(HasStrictTraits):
         return self.data.__getitem__(key)
      
     def __setitem__(self, key, value):
-        """Override __setitem__ so we can assign columns like ex.column = ..."""
+        """
+        Override __setitem__ so we can assign columns like ex.column = ...
+        
+        Replacing a column never writes to the old column's memory (which
+        may be shared with a clone), and keeps the column where it was.
+        """
         if key in self.data:
-            self.data.drop(key, axis = 'columns', inplace = True)
-        return self.data.__setitem__(key, value)
+            self._forget_column(key)
+            
+            loc = self.data.columns.get_loc(key)
+            del self.data[key]
+            self.data.insert(loc, key, value)
+        else:
+            self.data.__setitem__(key, value)
+    
+    def _forget_column(self, column):
+        """Drop the memos that were computed from ``column``"""
+        self._group_indices = {by : v for by, v in self._group_indices.items()
+                               if column not in by}
+        self._statistic_indices = {k : v for k, v in self._statistic_indices.items()
+                                   if column not in k[0]}
+        self._scales = {k : v for k, v in self._scales.items()
+                        if column not in (v[1].channel, v[1].condition)}
+        self._scaled_columns = {k : v for k, v in self._scaled_columns.items()
+                                if column not in (k[0], k[1].channel, k[1].condition)}
     
     def __len__(self):
         """Return the length of the underlying `pandas.DataFrame`"""
-        return len(self.data)
+        return len(self._data) + sum(n for _, _, n in self._pending_events)
+    
+    def _get_data(self):
+        """Getter for the `data` property"""
+        if self._pending_events:
+            self._consolidate_events()
+        return self._data
+    
+    def _set_data(self, data):
+        """Setter for the `data` property"""
+        self._pending_events = []
+        self._data = data
+        
+        # forget the memos, which were computed from the old data
+        self._group_indices = {}
+        self._scales = {}
+        self._scaled_columns = {}
+        self._statistic_indices = {}
 
     def _get_channels(self):
         """Getter for the `channels` property"""
-        return sorted([x for x in self.data if self.metadata[x]['type'] == "channel"])
+        # pending events never add columns, so we don't need to consolidate
+        return sorted([x for x in self._data if self.metadata[x]['type'] == "channel"])
     
     def _get_conditions(self):
         """Getter for the `conditions` property"""
@@ -288,6 +367,9 @@ class Experiment(HasStrictTraits):
                                          "{1} but it already existed in the "
                                          " DataFrame."
                                          .format(name, new_name))
+            elif isinstance(col.dtype, util.BitMaskDtype):
+                # pandas.eval doesn't understand extension arrays
+                resolvers[new_name] = col.astype("bool")
             else:
                 resolvers[new_name] = col
                 
@@ -300,24 +382,202 @@ class Experiment(HasStrictTraits):
         
         return ret
     
+    def group_index(self, by):
+        """
+        Group the events by the conditions in ``by``.  
+        
+        The result is memoized, so operations that group by the same 
+        conditions -- or the same operation's `estimate`, `apply` and 
+        `default_view` -- only have to find the groups once.  It stays valid
+        in shallow clones, until events are added or removed or one of the
+        conditions is replaced with ``experiment[condition] = ...``.
+        
+        Parameters
+        ----------
+        by : List(Str)
+            The conditions to group by.  If empty, there is one group, 
+            ``True``, containing all the events.
+            
+        Returns
+        -------
+        `util.GroupIndex <cytoflow.utility.group_index.GroupIndex>`
+            The groups.  Iterate over it to get ``(group, positions)`` pairs,
+            where ``group`` is the same as the group keys from
+            `pandas.DataFrame.groupby`.
+        """
+        
+        by = tuple(by)
+        data = self.data
+        
+        if by in self._group_indices:
+            row_index, groups = self._group_indices[by]
+            if row_index() is data.index:
+                return groups
+            
+        for b in by:
+            if b not in data:
+                raise util.CytoflowError("{} is not a column in data".format(b))
+        
+        groups = util.GroupIndex(data, by)
+        self._group_indices[by] = (weakref.ref(data.index), groups)
+
+        return groups
+
+    def statistic_index(self, by, **levels):
+        """
+        Make the index of a statistic that's computed for each subset of
+        the events: every combination of the values of the conditions in
+        ``by`` (whether or not there are any events with that combination),
+        then of the values of each of ``levels``, sorted.
+
+        The result is memoized like `group_index`, so all the statistics
+        with the same conditions and levels share the same index.
+
+        Parameters
+        ----------
+        by : List(Str)
+            The conditions.
+
+        **levels : List
+            More levels to add to the index, after the conditions: the
+            keyword is the level's name, and the value is a list of the
+            level's values.  (For example, ``Channel = ["FITC-A", "PE-A"]``.)
+
+        Returns
+        -------
+        pandas.Index
+            The index.  If there's only one condition and no ``levels``, it's
+            a `pandas.Index`; otherwise, it's a `pandas.MultiIndex`.
+        """
+
+        by = tuple(by)
+        key = (by, tuple((name, tuple(values)) for name, values in levels.items()))
+        data = self.data
+
+        if key in self._statistic_indices:
+            row_index, idx = self._statistic_indices[key]
+            if row_index() is data.index:
+                return idx
+
+        for b in by:
+            if b not in data:
+                raise util.CytoflowError("{} is not a column in data".format(b))
+
+        # this shouldn't be necessary, but see pandas bug #38053
+        if len(by) == 1 and not levels:
+            idx = pd.Index(data[by[0]].unique(), name = by[0])
+        else:
+            idx = pd.MultiIndex.from_product([data[b].unique() for b in by] +
+                                             [list(v) for v in levels.values()],
+                                             names = list(by) + list(levels))
+
+        idx = pd.Series(index = idx, dtype = np.dtype(object)).sort_index().index
+        self._statistic_indices[key] = (weakref.ref(data.index), idx)
+
+        return idx
+
+    def scaled(self, column, scale):
+        """
+        Get a column, transformed by a scale.
+        
+        The result is memoized, so re-plotting a view or re-estimating an
+        operation doesn't transform the same events again.  Like 
+        `group_index`, it stays valid in shallow clones, until events are
+        added or removed or the column is replaced with 
+        ``experiment[column] = ...``.  Each `Experiment` keeps at most
+        `util.get_scale_cache_size <cytoflow.utility.scale.get_scale_cache_size>` 
+        bytes of scaled columns, dropping the least recently used ones first.
+        
+        Parameters
+        ----------
+        column : Str
+            The column to scale.
+            
+        scale : `IScale <cytoflow.utility.scale.IScale>`
+            The scale to apply.  Its parameters must not change once it has
+            been used here.
+            
+        Returns
+        -------
+        pandas.Series
+            The scaled column.  Its values are read-only.
+        """
+        
+        data = self.data
+        key = (column, scale)
+        
+        if key in self._scaled_columns:
+            row_index, values = self._scaled_columns.pop(key)
+            if row_index() is data.index:
+                # move it to the end -- the most recently used
+                self._scaled_columns[key] = (row_index, values)
+                return pd.Series(values, index = data.index, name = column, copy = False)
+            
+        if column not in data:
+            raise util.CytoflowError("{} is not a column in data".format(column))
+        
+        raw = data[column]
+        values = np.asarray(scale(raw)).view()
+        values.flags.writeable = False
+        
+        # don't count scales that don't copy the data (ie, linear)
+        budget = util.get_scale_cache_size()
+        if values.nbytes <= budget and not np.may_share_memory(values, raw.values):
+            self._scaled_columns[key] = (weakref.ref(data.index), values)
+            
+            # forget scaled columns from old rows, and the least recently 
+            # used columns that don't fit in the budget
+            used = 0
+            for k, (row_index, v) in reversed(list(self._scaled_columns.items())):
+                if row_index() is not data.index or used + v.nbytes > budget:
+                    del self._scaled_columns[k]
+                else:
+                    used += v.nbytes
+        
+        return pd.Series(values, index = data.index, name = column, copy = False)
+    
     def clone(self, deep = True):
         """
-        Create a copy of this `Experiment`. `metadata`, 
-        `statistics` and `history` are deep copies; whether
-        or not `data` is a deep copy depends on the value of
-        the ``deep`` parameter.
-        
-        .. warning:: The intent is that ``deep`` is set to ``False`` by 
-                     operations that are only adding columns to the 
-                     underlying `pandas.DataFrame`.  This will
-                     improve memory performance.  However, the resulting
-                     `Experiment`  **CANNOT BE MODIFIED IN-PLACE**,
-                     because doing so will affect the other `Experiment` s
-                     that are clones of the one being modified.
+        Create a copy of this `Experiment`. `metadata` and `history` are
+        deep copies; whether or not `data` is a deep copy depends on the 
+        value of the ``deep`` parameter.  
+        
+        Each statistic in `statistics` is a new `pandas.Series`, but it 
+        shares its values with the original, copy-on-write: the values 
+        become read-only in both `Experiment` s.  (Replace a statistic 
+        instead of changing it in place.)
+        
+        If ``deep`` is ``False``, the two `Experiment` s share their 
+        columns' memory, copy-on-write.  The shared columns become 
+        read-only in both `Experiment` s; to change one, replace it with
+        ``experiment[column] = new_values``, which gives that `Experiment`
+        its own copy of that column (and only that column.)  Adding columns
+        with `add_channel` and `add_condition` doesn't copy anything.
+        
+        .. note:: The intent is that ``deep`` is set to ``False`` by 
+                  operations that add or replace columns, which is most of
+                  them.  Writing to a shared column in place (for example,
+                  ``experiment.data.loc[idx, column] = x``) raises a 
+                  ``ValueError`` instead of changing the other 
+                  `Experiment` s that share it.
         """
         
+        data = self.data
+        if not deep:
+            _share_columns(data)
+            
         new_exp = self.clone_traits()
-        new_exp.data = self.data.copy(deep = deep)
+        new_exp.data = data.copy(deep = deep)
+        
+        # setting `data` forgets the memos, but the clone has the same
+        # rows (or a copy of them), so it can start with copies of them
+        new_exp._group_indices = dict(self._group_indices)
+        new_exp._scales = dict(self._scales)
+        new_exp._scaled_columns = dict(self._scaled_columns)
+        new_exp._statistic_indices = dict(self._statistic_indices)
+        
+        new_exp.statistics = {k : _share_statistic(v) 
+                              for k, v in self.statistics.items()}
 
         return new_exp
             
@@ -346,7 +606,9 @@ class Experiment(HasStrictTraits):
         dtype : String
             The type of the new column in `data`.  Must be a string that
             `pandas.Series` recognizes as a ``dtype``: common types are 
-            ``category``, ``float``, ``int``, and ``bool``.
+            ``category``, ``float``, ``int``, and ``bool``.  Use ``bitmask``
+            for a ``bool`` that takes one bit per event instead of one byte
+            (see `util.BitMaskArray <cytoflow.utility.bitmask.BitMaskArray>`).
             
         data : pandas.Series (default = None)
             The `pandas.Series` to add to `data`.  Must be the same
@@ -388,6 +650,13 @@ class Experiment(HasStrictTraits):
         if data is not None and len(self) != len(data):
             raise util.CytoflowError("data must be the same length as self.data")
         
+        # numpy doesn't know about pandas' extension dtypes (like "bitmask")
+        if isinstance(data, np.ndarray):
+            data = pd.Series(data, index = self.data.index, copy = False)
+        
+        # in case a memo mentions an old column with this name
+        self._forget_column(name)
+        
         try:
             if data is not None:
                 self.data[name] = data.astype(dtype, copy = True)
@@ -409,7 +678,16 @@ class Experiment(HasStrictTraits):
         elif self.data[name].dtype.kind in "OSU":
             self.metadata[name]['values_type'] = 'categorical'
             
-        self.metadata[name]['values'] = natsorted(self.data[name].unique())
+        values = self.data[name].unique()
+        if self.data[name].dtype.kind in "iuf":
+            # natsort is slow for millions of numbers (say, a posterior 
+            # probability), and numpy sorts them the same way -- except 
+            # that natsort puts NaNs first, so we do too
+            values = np.sort(values)
+            nan = np.isnan(values)
+            self.metadata[name]['values'] = list(np.concatenate((values[nan], values[~nan])))
+        else:
+            self.metadata[name]['values'] = natsorted(values)
     
             
     def add_channel(self, name, data = None):
@@ -461,6 +739,9 @@ class Experiment(HasStrictTraits):
         if data is not None and len(self) != len(data):
             raise util.CytoflowError("data must be the same length as self.data")
         
+        # in case a memo mentions an old column with this name
+        self._forget_column(name)
+        
         try:
             if data is not None:
                 self.data[name] = data.astype("float64", copy = True)
@@ -490,6 +771,12 @@ class Experiment(HasStrictTraits):
             *Every* column in `data` must be accounted for.  Each column 
             of type ``channel`` must appear in ``data``; each column of 
             metadata must have a key:value pair in ``conditions``.
+            
+        .. note::
+        
+            The new events are held aside and concatenated onto `data` 
+            the next time `data` is accessed, so adding many tubes in a 
+            row takes linear time.
         
         Parameters
         ----------
@@ -534,51 +821,148 @@ class Experiment(HasStrictTraits):
             raise util.CytoflowError("New events don't have the same channels")
             
         # check that the conditions for this tube exist in the experiment
-        # already
+        # already.  don't use self.conditions -- it would consolidate the
+        # pending events.
+        
+        exp_conditions = [x for x in self._data 
+                          if self.metadata[x]['type'] == "condition"]
 
-        if( any(True for k in conditions if k not in self.conditions) or \
-            any(True for k in self.conditions if k not in conditions) ):
+        if( any(True for k in conditions if k not in exp_conditions) or \
+            any(True for k in exp_conditions if k not in conditions) ):
             raise util.CytoflowError("Metadata for this tube should be {}"
-                                     .format(list(self.conditions.keys())))
+                                     .format(exp_conditions))
             
-        # add the conditions to tube's internal data frame.  specify the conditions
-        # dtype using self.conditions.  check for errors as we do so.
+        # convert the conditions to the dtypes of their columns, and check 
+        # for errors as we do so.
         
+        new_conditions = {}
+        for meta_name, meta_value in conditions.items():
+            meta_type = self._data[meta_name].dtype
+            
+            if is_categorical_dtype(meta_type):
+                meta_type = CategoricalDtype([meta_value])
+            
+            try:
+                value = pd.Series([meta_value], dtype = meta_type)
+            except (ValueError, TypeError) as exc:
+                raise util.CytoflowError("Had trouble converting {} to type {}"
+                                         .format(meta_value, meta_type)) from exc
+            
+            new_conditions[meta_name] = value.iloc[0]
+            
+            # update the metadata 'values'
+            if len(data) > 0:
+                values = set(self.metadata[meta_name]['values'])
+                values.add(value.iloc[0])
+                self.metadata[meta_name]['values'] = natsorted(values)
+            
         # take this chance to up-convert the float32s to float64.
-        # this happened automatically in DataFrame.append(), below, but 
+        # this happened automatically in DataFrame.append(), but 
         # only in certain cases.... :-/
         
         # TODO - the FCS standard says you can specify the precision.  
         # check with int/float/double files!
         
-        new_data = data.astype("float64", copy=True)
+        new_channels = {c : np.array(data[c], dtype = "float64", copy = True) 
+                        for c in data.columns}
         
-        for meta_name, meta_value in conditions.items():
-            meta_type = self.conditions[meta_name].dtype
+        self._pending_events.append((new_channels, new_conditions, len(data)))
+        
+    def _consolidate_events(self):
+        """
+        Concatenate the events that `add_events` has accumulated onto 
+        `data`.  The channels are copied once, into a single preallocated
+        block, instead of copying the entire `pandas.DataFrame` once per
+        tube.
+        """
+        
+        chunks = self._pending_events
+        self._pending_events = []
+        
+        # match the column ordering of DataFrame.append(..., sort = True):
+        # if any chunk has a different column order than the existing data,
+        # the columns are sorted.
+        columns = list(self._data.columns)
+        for chunk_channels, chunk_conditions, _ in chunks:
+            chunk_columns = list(chunk_channels) + list(chunk_conditions)
+            if chunk_columns != columns:
+                columns = sorted(set(columns) | set(chunk_columns))
+                
+        conditions = [c for c in columns 
+                      if any(c in chunk_conditions for _, chunk_conditions, _ in chunks)]
+        channels = [c for c in columns if c not in conditions]
             
-            if is_categorical_dtype(meta_type):
-                meta_type = CategoricalDtype([meta_value])
-
-            new_data[meta_name] = \
-                pd.Series(data = [meta_value] * len(new_data),
-                          index = new_data.index,
-                          dtype = meta_type)
-            
-            # if we're categorical, merge the categories
-            if is_categorical_dtype(meta_type) and meta_name in self.data:
-                cats = set(self.data[meta_name].cat.categories) | set(new_data[meta_name].cat.categories)
-                cats = sorted(cats) 
-                self.data[meta_name] = self.data[meta_name].cat.set_categories(cats)
-                new_data[meta_name] = new_data[meta_name].cat.set_categories(cats)
+        counts = np.array([n for _, _, n in chunks], dtype = np.intp)
+        old_len = len(self._data)
+        
+        # pandas stores same-typed columns together as one 2D block, so 
+        # build the channels' block directly.
+        block = np.full((len(channels), old_len + counts.sum()), np.nan)
+        for i, col in enumerate(channels):
+            if col in self._data:
+                block[i, :old_len] = self._data[col].values
+            
+            start = old_len
+            for (chunk_channels, _, _), n in zip(chunks, counts):
+                if col in chunk_channels:
+                    block[i, start:start + n] = chunk_channels.pop(col)
+                start += n
+            
+        new_data = pd.DataFrame(block.T, columns = channels, copy = False)
+        
+        for col in conditions:
+            old = self._data[col]
+            values = [chunk_conditions[col] for _, chunk_conditions, _ in chunks]
                 
-
+            if is_categorical_dtype(old.dtype):
+                # merge the categories, then build the codes directly
+                cats = sorted(set(old.cat.categories) | set(values))
+                codes_dtype = np.min_scalar_type(-len(cats))
+                old_codes = old.cat.set_categories(cats).cat.codes.values
+                old_codes = old_codes.astype(codes_dtype, copy = False)
+                new_codes = np.array([cats.index(v) for v in values], 
+                                     dtype = codes_dtype)
+                codes = np.concatenate([old_codes, new_codes.repeat(counts)])
+                value = pd.Categorical.from_codes(codes, categories = cats)
+            else:
+                values = pd.Series(values, dtype = old.dtype).values
+                value = np.concatenate([old.values, values.repeat(counts)])
+                
+            new_data.insert(columns.index(col), col, value)
+            
+        self._data = new_data
         
-        self.data = self.data.append(new_data, ignore_index = True, sort = True)
-        del new_data
+def _share_statistic(stat):
+    """
+    Make the memory behind ``stat`` read-only, and return a new 
+    `pandas.Series` that shares it (see `Experiment.clone`).
+    """
+    
+    values = stat.values
+    while isinstance(values, np.ndarray):
+        values.flags.writeable = False
+        values = values.base
         
-        # update the metadata 'values'
-        for condition in self.conditions:
-            self.metadata[condition]['values'] = natsorted(self.data[condition].unique())
+    return stat.copy(deep = False)
+
+def _share_columns(data):
+    """
+    Make the memory behind each column of ``data`` read-only, so that it can
+    be shared between `Experiment` s (see `Experiment.clone`).
+    """
+    
+    # pandas writes to the 2D blocks (not the 1D views of them that
+    # ``data[col].values`` returns), so protect the blocks themselves
+    for block in data._mgr.blocks:
+        values = block.values
+        if isinstance(values, pd.Categorical):
+            values = values.codes
+        elif isinstance(values, util.BitMaskArray):
+            values = values._data
+            
+        while isinstance(values, np.ndarray):
+            values.flags.writeable = False
+            values = values.base
 
 if __name__ == "__main__":
     from fcsparser import fcsparser
@@ -35,6 +35,7 @@ from .range import RangeOp
 from .range2d import Range2DOp
 from .polygon import PolygonOp
 from .quad import QuadOp
+from .gate_set import GateSetOp
 
 # data-driven
 from .ratio import RatioOp
@@ -48,6 +49,7 @@ from .pca import PCAOp
 from .channel_stat import ChannelStatisticOp
 from .frame_stat import FrameStatisticOp
 from .xform_stat import TransformStatisticOp
+from .multi_stat import MultiStatisticOp
  
 # TASBE
 from .autofluorescence import AutofluorescenceOp
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+cytoflow.operations.base_estimate
+---------------------------------
+
+Base classes for operations whose `IOperation.estimate` can fit its model
+to a random subset of the events:
+
+`SubsampleOp` -- an operation with the `SubsampleOp.estimate_events`,
+`SubsampleOp.estimate_fraction` and `SubsampleOp.estimate_seed` attributes
+and a `SubsampleOp._subsample` method that chooses the subset.
+
+`StratifiedSubsampleOp` -- a `SubsampleOp` that can also stratify the subset
+by the conditions in `StratifiedSubsampleOp.estimate_strata`.
+'''
+
+from traits.api import HasStrictTraits, List, Str, Int
+
+import cytoflow.utility as util
+
+class SubsampleOp(HasStrictTraits):
+    """
+    Attributes
+    ----------
+    estimate_events : Int (default = None)
+        If set, `estimate` fits the model to a random subset of at most this
+        many events.  If the model is fit separately to each group in `by`,
+        each group is subsampled separately.  `apply` still uses every event.
+        
+    estimate_fraction : Float (default = None)
+        If set, `estimate` fits the model to a random subset of this fraction
+        (between 0 and 1) of the events.  If `estimate_events` is also set,
+        the smaller subset is used.
+        
+    estimate_seed : Int (default = 0)
+        The random seed used to choose the subset.
+    """
+    
+    estimate_events = util.PositiveInt(None, allow_zero = False, allow_none = True)
+    estimate_fraction = util.UnitFloat(None, allow_zero = False, allow_none = True)
+    estimate_seed = Int(0)
+    
+    def _subsample(self, positions, strata = None):
+        """
+        Choose the events to estimate the model from.
+        
+        Parameters
+        ----------
+        positions : numpy.ndarray
+            The row positions of the events to choose from.
+            
+        strata : numpy.ndarray (default = None)
+            If set, the stratum of every event.  See `util.subsample`.
+            
+        Returns
+        -------
+        numpy.ndarray
+            The chosen subset of ``positions``.
+        """
+        
+        return util.subsample(positions,
+                              events = self.estimate_events,
+                              fraction = self.estimate_fraction,
+                              seed = self.estimate_seed,
+                              strata = strata)
+    
+    
+class StratifiedSubsampleOp(SubsampleOp):
+    """
+    Attributes
+    ----------
+    estimate_strata : List(Str)
+        Conditions to stratify the random subset by.  Each combination of 
+        their values contributes events to the subset in proportion to its 
+        size.
+    """
+    
+    estimate_strata = List(Str)
+    
+    def _strata(self, experiment):
+        """
+        Check `estimate_strata` against an `Experiment` and return the stratum
+        of each of its events, to pass to `_subsample`.
+        
+        Parameters
+        ----------
+        experiment : Experiment
+            The `Experiment` that `estimate` is fitting the model to.
+            
+        Returns
+        -------
+        numpy.ndarray, or None
+            The stratum of each event, or ``None`` if `estimate_strata` is 
+            empty.
+        """
+        
+        for s in self.estimate_strata:
+            if s not in experiment.conditions:
+                raise util.CytoflowOpError('estimate_strata',
+                                           "Stratum {0} not found in the experiment"
+                                           .format(s))
+                
+        return experiment.group_index(self.estimate_strata).codes \
+               if self.estimate_strata else None
+
+util.expand_class_attributes(StratifiedSubsampleOp)
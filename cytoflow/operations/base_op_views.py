@@ -311,7 +311,7 @@ class ByView(OpView):
                                                      [x for x in self.enum_plots(experiment)],
                                                      groupby.groups.keys()))
                 
-            experiment = experiment.clone()
+            experiment = experiment.clone(deep = False)
             experiment.data = groupby.get_group(plot_name)
             experiment.data.reset_index(drop = True, inplace = True)
             
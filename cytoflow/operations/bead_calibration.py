@@ -456,7 +456,7 @@ class BeadCalibrationOp(HasStrictTraits):
         # you have the equivalent of -5 molecules of fluoresceine?  so,
         # we filter out negative values here.
 
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
         
         for channel in channels:
             new_experiment.data = \
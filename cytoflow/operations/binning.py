@@ -31,6 +31,7 @@ width (after applying an optional scale)
 
 from traits.api import (HasStrictTraits, Str, provides, Constant, Int)
 import numpy as np
+import pandas as pd
 
 from cytoflow.views import IView, HistogramView
 import cytoflow.utility as util
@@ -64,7 +65,13 @@ class BinningOp(HasStrictTraits):
         The width of the bins. If `scale` is ``log``, `bin_width` 
         is in log-10 units; if `scale` is ``logicle``, an error is 
         thrown because the units are ill-defined.
-
+        
+    bin_count_name : Str
+        If set, also add a condition with this name that contains the 
+        number of events in each event's bin.
+        
+    The number of events in each bin is also added to 
+    `Experiment.statistics`, with the key ``(name, "count")``.
         
     Examples
     --------
@@ -131,7 +138,10 @@ class BinningOp(HasStrictTraits):
         `Experiment`
             A new experiment with a condition column named `name`, which
             contains the location of the left-most edge of the bin that the
-            event is in.
+            event is in; a statistic ``(name, "count")`` with the number of 
+            events in each bin; and, if `bin_count_name` is set, a 
+            condition with that name containing the number of events in 
+            each event's bin.
 
         """
         if experiment is None:
@@ -150,6 +160,11 @@ class BinningOp(HasStrictTraits):
                                        "Name {} is in the experiment already"
                                        .format(self.name))
             
+        if (self.name, "count") in experiment.statistics:
+            raise util.CytoflowOpError('name',
+                                       "{} is already in the experiment's statistics"
+                                       .format((self.name, "count")))
+            
         if self.bin_count_name and self.bin_count_name in experiment.data.columns:
             raise util.CytoflowOpError('bin_count_name',
                                        "bin_count_name {} is in the experiment already"
@@ -173,8 +188,9 @@ class BinningOp(HasStrictTraits):
         
         scale = util.scale_factory(self.scale, experiment, channel = self.channel)
             
-        scaled_min = scale(scale.clip(experiment.data[self.channel]).min())
-        scaled_max = scale(scale.clip(experiment.data[self.channel]).max())
+        clipped = scale.clip(experiment.data[self.channel])
+        scaled_min = scale(clipped.min())
+        scaled_max = scale(clipped.max())
                 
         if self.scale == 'linear':
             start = 0
@@ -220,19 +236,17 @@ class BinningOp(HasStrictTraits):
         new_experiment.metadata[self.name]["bin_scale"] = self.scale
         new_experiment.metadata[self.name]["bins"] = bins
         
+        # how many events are in each bin
+        bin_counts = np.bincount(bin_idx, minlength = len(bins))
+        new_experiment.statistics[(self.name, "count")] = \
+            pd.Series(bin_counts, 
+                      index = pd.Index(bins, name = self.name),
+                      name = "{} : {}".format(self.name, "count"))
+        
         if self.bin_count_name:
-            # TODO - this is a HUGE memory hog?!
-            # TODO - fix this, then turn it on by default
-            agg_count = new_experiment.data.groupby(self.name).count()
-            agg_count = agg_count[agg_count.columns[0]]
-            
-            # have to make the condition a float64, because if we're in log
-            # space there may be events that have NaN as the bin number.
-            
-            new_experiment.add_condition(
-                self.bin_count_name,
-                "float64",
-                new_experiment[self.name].map(agg_count))
+            new_experiment.add_condition(self.bin_count_name, 
+                                         "int", 
+                                         bin_counts[bin_idx])
         
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
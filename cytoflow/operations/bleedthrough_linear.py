@@ -31,15 +31,15 @@ that `BleedthroughLinearOp` correctly estimated its parameters.
 """
 
 import os, math
+from concurrent.futures import ThreadPoolExecutor
 from natsort import natsorted
 
 from traits.api import (HasStrictTraits, Str, File, Dict, Instance,
-                        Constant, Tuple, Float, Any, provides)
+                        Constant, Tuple, Float, Any, Enum, provides)
     
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import scipy.optimize
 
 import cytoflow.views
 import cytoflow.utility as util
@@ -90,6 +90,18 @@ class BleedthroughLinearOp(HasStrictTraits):
         history.)  Specify them here.  The key is the channel name; they value
         is a dictionary of the conditions (same as you would specify for a
         `cytoflow.operations.import_op.Tube` )
+        
+    regression : Enum("least_squares", "huber", "trimmed") (default = "least_squares")
+        How `estimate` fits the spillover from each control.  
+        ``least_squares`` is an ordinary least-squares fit of a line through
+        the origin.  ``huber`` uses Huber weights, so events far from the 
+        line count for less; ``trimmed`` drops the events furthest from the
+        least-squares line and fits again.  The robust fits are useful if 
+        the controls have debris or doublets that weren't gated out.
+        
+    workers : Int (default = 1)
+        How many threads to use to load the single-color controls (and 
+        apply the operations in the history to them) in `estimate`.
 
     Examples
     --------
@@ -164,6 +176,8 @@ class BleedthroughLinearOp(HasStrictTraits):
     controls = Dict(Str, File)
     spillover = Dict(Tuple(Str, Str), Float)
     control_conditions = Dict(Str, Dict(Str, Any), {})
+    regression = Enum("least_squares", "huber", "trimmed")
+    workers = util.PositiveInt(1, allow_zero = False)
     
     _sample = Dict(Str, Any, transient = True)
     
@@ -187,12 +201,21 @@ class BleedthroughLinearOp(HasStrictTraits):
                                            "Can't find file {0} for channel {1}."
                                            .format(self.controls[channel], channel))
                 
+        # the controls are imported in a fresh Experiment, and the operations
+        # in the history are applied to them
+        for op in experiment.history:
+            if hasattr(op, 'by'):
+                for by in op.by:
+                    if 'experiment' in experiment.metadata[by]:
+                        raise util.CytoflowOpError('experiment',
+                                                   "Prior to applying this operation, "
+                                                   "you must not apply any operation with 'by' "
+                                                   "set to an experimental condition.")
+                
         self.spillover = {}
         self._sample.clear()
-                
-        spillover = {}
-        for channel in channels:
-            
+        
+        def load_control(channel):
             # make a little Experiment
             check_tube(self.controls[channel], experiment)
             tube_conditions = self.control_conditions[channel] if channel in self.control_conditions else {}
@@ -206,13 +229,6 @@ class BleedthroughLinearOp(HasStrictTraits):
             
             # apply previous operations
             for op in experiment.history:
-                if hasattr(op, 'by'):
-                    for by in op.by:
-                        if 'experiment' in experiment.metadata[by]:
-                            raise util.CytoflowOpError('experiment',
-                                                       "Prior to applying this operation, "
-                                                       "you must not apply any operation with 'by' "
-                                                       "set to an experimental condition.")
                 tube_exp = op.apply(tube_exp)
                 
             # subset it
@@ -222,50 +238,39 @@ class BleedthroughLinearOp(HasStrictTraits):
                 except Exception as exc:
                     raise util.CytoflowOpError('subset',
                                                "Subset string '{0}' isn't valid"
-                                               .format(self.subset)) from exc
+                                               .format(subset)) from exc
                                 
                 if len(tube_exp.data) == 0:
                     raise util.CytoflowOpError('subset',
                                                "Subset string '{0}' returned no events"
-                                               .format(self.subset))
+                                               .format(subset))
             
-            tube_data = tube_exp.data
+            return tube_exp.data
+        
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers = self.workers) as executor:
+                controls = list(executor.map(load_control, channels))
+        else:
+            controls = [load_control(channel) for channel in channels]
                 
-            # polyfit requires sorted data
-            tube_data.sort_values(channel, inplace = True)
+        spillover = {}
+        for from_channel, tube_data in zip(channels, controls):
             
             # save a little of the data to plot later
-            self._sample[channel] = tube_data.sample(n = 1000)
-
-            from_channel = channel
+            self._sample[from_channel] = tube_data.sample(n = 1000)
+            
+            to_channels = [c for c in channels if c != from_channel]
             
             # sometimes some of the data is off the edge of the
             # plot, and this screws up a linear regression
+            x = _clip_edges(tube_data[from_channel].values)
+            y = _clip_edges(tube_data[to_channels].values)
             
-            from_min = np.min(tube_data[from_channel]) * 1.025
-            from_max = np.max(tube_data[from_channel]) * 0.975
-            tube_data[from_channel] = \
-                tube_data[from_channel].clip(from_min, from_max)
-            for to_channel in channels:
-                
-                if from_channel == to_channel:
-                    continue
-                
-                to_min = np.min(tube_data[to_channel]) * 1.025
-                to_max = np.max(tube_data[to_channel]) * 0.975
-                tube_data[to_channel] = \
-                    tube_data[to_channel].clip(to_min, to_max)
-                
-                tube_data.reset_index(drop = True, inplace = True)
-                 
-                f = lambda x, k: x * k
-                 
-                popt, _ = scipy.optimize.curve_fit(f,
-                                                   tube_data[from_channel],
-                                                   tube_data[to_channel],
-                                                   0)
-                 
-                spillover[(from_channel, to_channel)] = popt[0]
+            # fit every other channel against this one at once
+            k = _fit_spillover(x, y, self.regression)
+            
+            for to_channel, k_to in zip(to_channels, k):
+                spillover[(from_channel, to_channel)] = k_to
                 
         # set this atomically - to support GUI
         self.spillover = spillover
@@ -319,7 +324,7 @@ class BleedthroughLinearOp(HasStrictTraits):
                                            "Must have both (from, to) and "
                                            "(to, from) keys in self.spillover")
         
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
         
         # the completely arbitrary ordering of the channels
         channels = list(set([x for (x, _) in list(self.spillover.keys())]))
@@ -332,14 +337,12 @@ class BleedthroughLinearOp(HasStrictTraits):
         a_inv = np.linalg.pinv(a)
          
         # compute the corrected channels
-        new_channels = np.dot(experiment.data[channels], a_inv)
+        new_channels = _compensate([experiment.data[c].values for c in channels], 
+                                   a_inv)
          
         # and assign to the new experiment
         for i, c in enumerate(channels):
-            new_experiment[c] = pd.Series(new_channels[:, i])
-            
-        # make sure the new experiment has the same column order as the old one
-        new_experiment.data = new_experiment.data[list(experiment.data.columns)]
+            new_experiment[c] = new_channels[i]
          
         for channel in channels:
             # add the spillover values to the channel's metadata
@@ -373,6 +376,102 @@ class BleedthroughLinearOp(HasStrictTraits):
         v.trait_set(**kwargs)
         return v
     
+# the Huber tuning constant, in units of the residuals' robust scale
+_HUBER_T = 1.345
+
+# the most reweighting iterations a Huber fit does before giving up on
+# converging
+_HUBER_MAX_ITER = 50
+
+# the proportion of events with the largest residuals that a trimmed fit drops
+_TRIM_PROPORTION = 0.1
+
+def _clip_edges(x):
+    """
+    Clip each column of ``x`` just inside its range, so the events piled up 
+    at the edges of the detector's range don't skew the regression.
+    """
+    
+    lo = np.nanmin(x, axis = 0) * 1.025
+    hi = np.nanmax(x, axis = 0) * 0.975
+    
+    # if the minimum (or maximum) is negative, the bounds cross
+    return np.clip(x, np.minimum(lo, hi), np.maximum(lo, hi))
+
+def _fit_spillover(x, y, regression):
+    """
+    Fit ``y = k * x`` (a line through the origin) for each column of ``y``
+    at once, and return the slopes ``k``.
+    """
+    
+    x = np.asarray(x, dtype = np.float64)
+    
+    # one row per channel, so the per-channel reductions are contiguous
+    y = np.ascontiguousarray(np.asarray(y, dtype = np.float64).T)
+    
+    k = (y @ x) / (x @ x)
+    
+    if regression == "huber":
+        # iteratively reweighted least squares
+        for _ in range(_HUBER_MAX_ITER):
+            r = np.abs(y - k[:, np.newaxis] * x)
+            
+            # the median absolute deviation, scaled to estimate the sd
+            t = _HUBER_T * 1.4826 * np.median(r, axis = 1, keepdims = True)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                w = np.minimum(1.0, t / r, out = r)
+                
+            # if most of the residuals are 0, so is the scale
+            w[t[:, 0] == 0] = 1.0
+                
+            w *= x
+            k_new = np.einsum('ij,ij->i', w, y) / (w @ x)
+            
+            converged = np.allclose(k_new, k, rtol = 1e-6, atol = 1e-12)
+            k = k_new
+            if converged:
+                break
+            
+    elif regression == "trimmed":
+        r = np.abs(y - k[:, np.newaxis] * x)
+        n_keep = len(x) - int(len(x) * _TRIM_PROPORTION)
+        
+        if n_keep < len(x):
+            # keep the events closest to the least-squares line
+            keep = np.argpartition(r, n_keep - 1, axis = 1)[:, :n_keep]
+            xk = x[keep]
+            yk = np.take_along_axis(y, keep, axis = 1)
+            k = np.sum(xk * yk, axis = 1) / np.sum(xk * xk, axis = 1)
+            
+    return k
+
+# how many events to compensate at a time
+_COMPENSATE_CHUNK_SIZE = 2 ** 16
+
+def _compensate(columns, a_inv):
+    """
+    Multiply the events in ``columns`` (one array per channel) by ``a_inv``.
+    Each chunk of events is copied into one contiguous block, so it's a 
+    single matrix product, and the result has one contiguous row per 
+    channel.  Only one chunk of the input is copied at a time.
+    """
+    
+    num_events = len(columns[0])
+    a_inv_t = np.ascontiguousarray(np.transpose(a_inv), dtype = np.float64)
+    
+    out = np.empty((len(columns), num_events))
+    chunk = np.empty((len(columns), min(num_events, _COMPENSATE_CHUNK_SIZE)))
+    
+    for start in range(0, num_events, _COMPENSATE_CHUNK_SIZE):
+        stop = min(start + _COMPENSATE_CHUNK_SIZE, num_events)
+        x = chunk[:, :stop - start]
+        for i, column in enumerate(columns):
+            x[i] = column[start:stop]
+            
+        np.matmul(a_inv_t, x, out = out[:, start:stop])
+        
+    return out
+    
 @provides(cytoflow.views.IView)
 class BleedthroughLinearDiagnostic(HasStrictTraits):
     """
@@ -43,10 +43,11 @@ import cytoflow.views
 import cytoflow.utility as util
 
 from .i_operation import IOperation
+from .base_estimate import SubsampleOp
 from .import_op import Tube, ImportOp, check_tube
 
 @provides(IOperation)
-class ColorTranslationOp(HasStrictTraits):
+class ColorTranslationOp(SubsampleOp):
     """
     Translate measurements from one color's scale to another, using a two-color
     or three-color control.
@@ -84,7 +85,6 @@ class ColorTranslationOp(HasStrictTraits):
         history.)  Specify them here.  The key is a tuple of channel names; the 
         value is a dictionary of the conditions (same as you would specify for a
         `cytoflow.operations.import_op.Tube` )
-
         
     Notes
     -----
@@ -94,7 +94,11 @@ class ColorTranslationOp(HasStrictTraits):
     `estimate` is replayed on the control files in `controls`, so
     they are also corrected for autofluorescence and bleedthrough, and have
     metadata for subsetting.
-    
+
+    `estimate_events` and `estimate_fraction` only subsample the events that
+    the mixture model is fit to.  The regression is still weighted by every
+    event's posterior probability.
+
 
     Examples
     --------
@@ -151,6 +155,7 @@ class ColorTranslationOp(HasStrictTraits):
     linear_model = Bool(False)
     
     control_conditions = Dict(Tuple(Str, Str), Dict(Str, Any), {})
+    
 
     # The regression coefficients determined by `estimate()`, used to map 
     # colors between channels.  The keys are tuples of (*from-channel*,
@@ -275,7 +280,8 @@ class ColorTranslationOp(HasStrictTraits):
             if self.mixture_model:    
                 gmm = sklearn.mixture.BayesianGaussianMixture(n_components=2,
                                                               random_state = 1)
-                fit = gmm.fit(data)
+                fit_idx = self._subsample(np.arange(len(data)))
+                fit = gmm.fit(data.iloc[fit_idx])
                 
                 self._means[(from_channel), (to_channel)] = \
                     (10 ** fit.means_[0][0], 10 ** fit.means_[1][0])
@@ -360,7 +366,7 @@ class ColorTranslationOp(HasStrictTraits):
                                            "{} --> {}.  Did you call estimate()?"
                                            .format(key, val))
                        
-        new_experiment = experiment.clone(deep = True)
+        new_experiment = experiment.clone(deep = False)
         
         for channel in from_channels:
             new_experiment.data = \
@@ -499,3 +505,5 @@ class ColorTranslationDiagnostic(HasStrictTraits):
             plt_idx = plt_idx + 1
         
         plt.tight_layout(pad = 0.8)
+
+util.expand_class_attributes(ColorTranslationOp)
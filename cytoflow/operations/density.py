@@ -37,7 +37,6 @@ from traits.api import (HasStrictTraits, Str, Dict, Any, Instance,
 import numpy as np
 import scipy.stats
 import scipy.ndimage.filters
-import pandas as pd
 
 from cytoflow.views import IView, DensityView
 import cytoflow.utility as util
@@ -259,12 +258,7 @@ class DensityGateOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groups = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -286,15 +280,18 @@ class DensityGateOp(HasStrictTraits):
                                                          yscale(ylim[1]), 
                                                          self.bins))
                     
+        x = experiment.data[self.xchannel].values
+        y = experiment.data[self.ychannel].values
+                    
         histogram = {}
-        for group, group_data in groupby:
-            if len(group_data) == 0:
+        for group, group_idx in groups:
+            if len(group_idx) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
 
-            h, _, _ = np.histogram2d(group_data[self.xchannel], 
-                                     group_data[self.ychannel], 
+            h, _, _ = np.histogram2d(x[group_idx], 
+                                     y[group_idx], 
                                      bins=[xbins, ybins])
             
             h = scipy.ndimage.filters.gaussian_filter(h, sigma = self.sigma)
@@ -302,13 +299,13 @@ class DensityGateOp(HasStrictTraits):
             i = scipy.stats.rankdata(h, method = "ordinal") - 1
             i = np.unravel_index(np.argsort(-i), h.shape)
             
-            goal_count = self.keep * len(group_data)
-            curr_count = 0
-            num_bins = 0
-
-            while(curr_count < goal_count and num_bins < i[0].size):
-                curr_count += h[i[0][num_bins], i[1][num_bins]]
-                num_bins += 1
+            # keep adding bins, highest first, until we have enough events
+            goal_count = self.keep * len(group_idx)
+            curr_count = np.cumsum(h[i])
+            if goal_count > 0:
+                num_bins = min(np.searchsorted(curr_count, goal_count) + 1, i[0].size)
+            else:
+                num_bins = 0
                 
             self._keep_xbins[group] = i[0][0:num_bins]
             self._keep_ybins[group] = i[1][0:num_bins]
@@ -391,39 +388,33 @@ class DensityGateOp(HasStrictTraits):
                                            "must be one of {}"
                                            .format(b, experiment.conditions))
         
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that
-            # contains all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groups = experiment.group_index(self.by)
             
-        event_assignments = pd.Series([False] * len(experiment), dtype = "bool")
+        event_assignments = np.zeros(len(experiment), dtype = np.bool_)
         
-        for group, group_data in groupby:
+        # which bin is each event in?
+        x_bin = _bin_index(experiment.data[self.xchannel].values, self._xbins)
+        y_bin = _bin_index(experiment.data[self.ychannel].values, self._ybins)
+        
+        for group, group_idx in groups:
             if group not in self._keep_xbins:
                 # there weren't any events in this group, so we didn't get
                 # an estimate
                 continue
             
-            group_idx = groupby.groups[group]
-            
-            cX = pd.cut(group_data[self.xchannel], self._xbins, include_lowest = True, labels = False).reset_index(drop = True)
-            cY = pd.cut(group_data[self.ychannel], self._ybins, include_lowest = True, labels = False).reset_index(drop = True)
-
-            group_keep = pd.Series([False] * len(group_data))
+            # a lookup table: is each (x, y) bin kept?
+            keep = np.zeros((len(self._xbins) - 1, len(self._ybins) - 1), dtype = np.bool_)
+            keep[self._keep_xbins[group], self._keep_ybins[group]] = True
             
-            keep_x = self._keep_xbins[group]
-            keep_y = self._keep_ybins[group]
+            cX = x_bin[group_idx]
+            cY = y_bin[group_idx]
+            in_bins = (cX >= 0) & (cY >= 0)
             
-            for (xbin, ybin) in zip(keep_x, keep_y):
-                group_keep = group_keep | ((cX == xbin) & (cY == ybin))
-                            
-            event_assignments.iloc[group_idx] = group_keep
+            event_assignments[group_idx[in_bins]] = keep[cX[in_bins], cY[in_bins]]
                     
         new_experiment = experiment.clone(deep = False)
         
-        new_experiment.add_condition(self.name, "bool", event_assignments)
+        new_experiment.add_condition(self.name, "bitmask", event_assignments)
 
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
@@ -442,6 +433,16 @@ class DensityGateOp(HasStrictTraits):
         v.trait_set(**kwargs)
         return v
           
+def _bin_index(values, edges):
+    """
+    The bin each value is in, the same as ``pandas.cut(values, edges, 
+    include_lowest = True, labels = False)`` -- or -1 if it's not in a bin.
+    """
+    ret = np.searchsorted(edges, values, side = "left")
+    ret[values == edges[0]] = 1
+    ret[ret == len(edges)] = 0
+    return ret - 1
+
 @provides(IView)
 class DensityGateView(By2DView, AnnotatingView, DensityView):
     """
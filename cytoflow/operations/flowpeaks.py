@@ -44,11 +44,11 @@ import matplotlib.pyplot as plt
 from warnings import warn
 
 from traits.api import (HasStrictTraits, Str, Dict, Any, Instance, 
-                        Constant, List, provides, Array, Function)
+                        Constant, List, provides, Array, Function,
+                        Callable)
 
 import numpy as np
 import sklearn.cluster
-import scipy.stats
 import scipy.optimize
 import scipy.ndimage
 
@@ -60,10 +60,11 @@ from cytoflow.views import IView, HistogramView, ScatterplotView
 import cytoflow.utility as util
 
 from .i_operation import IOperation
+from .base_estimate import StratifiedSubsampleOp
 from .base_op_views import By1DView, By2DView, AnnotatingView, NullView
 
 @provides(IOperation)
-class FlowPeaksOp(HasStrictTraits):
+class FlowPeaksOp(StratifiedSubsampleOp):
     """
     This module uses the **flowPeaks** algorithm to assign events to clusters in
     an unsupervised manner.
@@ -122,6 +123,11 @@ class FlowPeaksOp(HasStrictTraits):
         
         .. note::
             I have disabled this code until I can try to make it faster.
+            
+    workers : Int (default = 1)
+        How many processes to use to fit the models.  If greater than 1, 
+        each group in `by` is fit in a process pool.  The result is the same
+        as fitting the groups one at a time.
         
     Notes
     -----
@@ -241,11 +247,15 @@ class FlowPeaksOp(HasStrictTraits):
     tol = util.PositiveFloat(0.5, allow_zero = False)
     merge_dist = util.PositiveFloat(5, allow_zero = False)
     
+    # how many processes to fit the groups' models with?
+    workers = util.PositiveInt(1, allow_zero = False)
+    
+    
     # estimate internals
     _kmeans = Dict(Any, Instance(sklearn.cluster.MiniBatchKMeans), transient = True)
     _means = Dict(Any, List, transient = True)
     _normals = Dict(Any, List(Function), transient = True)
-    _density = Dict(Any, Function, transient = True)
+    _density = Dict(Any, Callable, transient = True)
     _peaks = Dict(Any, List(Array), transient = True)  
     _peak_clusters = Dict(Any, List(Array), transient = True)
     _cluster_peak = Dict(Any, List, transient = True)  # kmeans cluster idx --> peak idx
@@ -311,12 +321,9 @@ class FlowPeaksOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        strata = self._strata(experiment)
+                 
+        data_groups = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -329,66 +336,39 @@ class FlowPeaksOp(HasStrictTraits):
             else:
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                                     
-        for data_group, data_subset in groupby:
+        group_data = []
+        for data_group, group_idx in data_groups:
+            group_idx = self._subsample(group_idx, strata = strata)
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data".format(data_group))
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
             
             # drop data that isn't in the scale range
             for c in self.channels:
                 x = x[~(np.isnan(x[c]))]
             x = x.values
             
-            #### choose the number of clusters and fit the kmeans
-            num_clusters = [util.num_hist_bins(x[:, c]) for c in range(len(self.channels))]
-            num_clusters = np.ceil(np.median(num_clusters))
-            num_clusters = int(num_clusters)
+            group_data.append((data_group, (x, self.h, self.h0)))
             
-            self._kmeans[data_group] = kmeans = \
-                sklearn.cluster.MiniBatchKMeans(n_clusters = num_clusters,
-                                                random_state = 0)
-            
-            kmeans.fit(x)
-            x_labels = kmeans.predict(x)
-            d = len(self.channels)
-
-            #### use the kmeans centroids to parameterize a finite gaussian
-            #### mixture model which estimates the density function
-                        
-            s0 = np.zeros([d, d])
-            for j in range(d):
-                r = x[d].max() - x[d].min()
-                s0[j, j] = (r / (num_clusters ** (1. / d))) ** 0.5 
-            
-            means = []
-            weights = []
-            normals = []
-                        
-            for k in range(num_clusters):
-                xk = x[x_labels == k]
-                num_k = np.sum(x_labels == k)
-                weight_k = num_k / len(x_labels)
-                mu = xk.mean(axis = 0)
-                means.append(mu)
-                s = np.cov(xk, rowvar = False)
-                
-                el = num_k / (num_clusters + num_k)
-                s_smooth = el * self.h * s + (1.0 - el) * self.h0 * s0
-                
-                n = scipy.stats.multivariate_normal(mean = mu, cov = s_smooth)
-                weights.append(weight_k)
-                normals.append(lambda x, n = n: n.pdf(x))
+        fits = util.map_groups(_fit_flowpeaks, group_data, workers = self.workers)
+        
+        for data_group, (kmeans, means, weights, covs) in fits.items():
+            density = _MixtureDensity(means, weights, covs)
+            normals = [lambda x, c = c, density = density: density.pdf(x, c)
+                       for c in range(len(means))]
                        
+            self._kmeans[data_group] = kmeans
             self._means[data_group] = means
             self._normals[data_group] = normals         
-            self._density[data_group] = density = lambda x, weights = weights, normals = normals: np.sum([w * n(x) for w, n in zip(weights, normals)], axis = 0)
+            self._density[data_group] = density
             
-        ### use optimization on the finite gmm to find the local peak for 
+        ### climb the finite gmm's density to find the local peak for 
         ### each kmeans cluster
-        for data_group, data_subset in groupby:
+        for data_group in data_groups.keys:
             kmeans = self._kmeans[data_group]
             num_clusters = kmeans.n_clusters
             means = self._means[data_group]
@@ -396,80 +376,25 @@ class FlowPeaksOp(HasStrictTraits):
             peaks = []
             peak_clusters = []  # peak idx --> list of clusters
                         
-            min_mu = [np.inf] * len(self.channels)
-            max_mu = [-1.0 * np.inf] * len(self.channels)
-             
-            for k in range(num_clusters):
-                mu = means[k]
-                for ci in range(len(self.channels)):
-                    if mu[ci] < min_mu[ci]:
-                        min_mu[ci] = mu[ci]
-                    if mu[ci] > max_mu[ci]:
-                        max_mu[ci] = mu[ci]
+            # climb from every cluster's mean at once
+            res_x, converged = density.find_peaks(np.array(means))
+            for k in np.flatnonzero(~converged):
+                warn("Peak finding failed for cluster {}: did not converge"
+                     .format(k),
+                     util.CytoflowWarning)
           
             for k in range(num_clusters):
-                mu = means[k]
-                f = lambda x: -1.0 * density(x)
-                
-                res = scipy.optimize.minimize(f, mu, method = "CG",
-                                              options = {'gtol' : 1e-3})
-
-                if not res.success:
-                    warn("Peak finding failed for cluster {}: {}"
-                         .format(k, res.message),
-                         util.CytoflowWarning)
-
-#                 ### The peak-searching algorithm from the paper.  works fine,
-#                 ### but slow!  we get similar results with the conjugate gradient
-#                 ### optimization method from scipy
-
-#                 x0 = x = means[k]
-#                 k0 = k
-#                 b = beta_max[k] / 10.0
-#                 Nsuc = 0
-#                 n = 0
-#                 
-#                 while(n < 1000):
-# #                     df = scipy.misc.derivative(density, x, 1e-6)
-#                     df = statsmodels.tools.numdiff.approx_fprime(x, density)
-#                     if np.linalg.norm(df) < 1e-3:
-#                         break
-#                     
-#                     y = x + b * df / np.linalg.norm(df)
-#                     if density(y) <= density(x):
-#                         Nsuc = 0
-#                         b = b / 2.0
-#                         continue
-#                     
-#                     Nsuc += 1
-#                     if Nsuc >= 2:
-#                         b = min(2*b, beta_max[k])
-# 
-#                     ky = kmeans.predict(y[np.newaxis, :])[0]
-#                     if ky == k:
-#                         x = y
-#                     else:
-#                         k = ky
-#                         b = beta_max[k] / 10.0
-#                         mu = means[k]
-#                         if density(mu) > density(y):
-#                             x = mu
-#                         else:
-#                             x = y
-#                             
-#                     n += 1 
-                                        
                 merged = False
                 for pi, p in enumerate(peaks):
                     # TODO - this probably only works for scaled measurements
-                    if np.linalg.norm(p - res.x) < (1e-2):  
+                    if np.linalg.norm(p - res_x[k]) < (1e-2):  
                         peak_clusters[pi].append(k)
                         merged = True
                         break
                         
                 if not merged:
                     peak_clusters.append([k])
-                    peaks.append(res.x)                    
+                    peaks.append(res_x[k])                    
             
             self._peaks[data_group] = peaks
             self._peak_clusters[data_group] = peak_clusters
@@ -477,7 +402,7 @@ class FlowPeaksOp(HasStrictTraits):
         ### merge peaks that are sufficiently close
             
         cluster_peak = {}
-        for data_group, data_subset in groupby:
+        for data_group in data_groups.keys:
             kmeans = self._kmeans[data_group]
             num_clusters = kmeans.n_clusters
             means = self._means[data_group]
@@ -663,12 +588,7 @@ class FlowPeaksOp(HasStrictTraits):
                                            "must be one of {}"
                                            .format(b, experiment.conditions))
                  
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        data_groups = experiment.group_index(self.by)
                  
         event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
          
@@ -679,7 +599,8 @@ class FlowPeaksOp(HasStrictTraits):
 #                                          names = list(self.by) + ["Cluster"] + ["Channel"])
 #         centers_stat = pd.Series(index = idx, dtype = np.dtype(object)).sort_index()
                      
-        for group, data_subset in groupby:
+        for group, group_idx in data_groups:
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
@@ -694,7 +615,7 @@ class FlowPeaksOp(HasStrictTraits):
             x = data_subset.loc[:, self.channels[:]]
             
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
                  
             # which values are missing?
  
@@ -704,7 +625,6 @@ class FlowPeaksOp(HasStrictTraits):
                          
             x = x.values
             x_na = x_na.values
-            group_idx = groupby.groups[group]
             
             kmeans = self._kmeans[group]
   
@@ -869,6 +789,185 @@ class FlowPeaksOp(HasStrictTraits):
                                          "Can't specify more than two channels for a default view")
         
     
+def _fit_flowpeaks(x, h, h0):
+    """
+    Fit one group's k-means clusters, and the finite gaussian mixture model
+    built from them.  Module-level so it can run in a process pool.
+    
+    Returns the fitted `sklearn.cluster.MiniBatchKMeans`, and each cluster's
+    mean, weight and smoothed covariance matrix.
+    """
+    
+    #### choose the number of clusters and fit the kmeans
+    num_clusters = [util.num_hist_bins(x[:, c]) for c in range(x.shape[1])]
+    num_clusters = np.ceil(np.median(num_clusters))
+    num_clusters = int(num_clusters)
+    
+    kmeans = sklearn.cluster.MiniBatchKMeans(n_clusters = num_clusters,
+                                             random_state = 0)
+    
+    kmeans.fit(x)
+    x_labels = kmeans.predict(x)
+    d = x.shape[1]
+
+    #### use the kmeans centroids to parameterize a finite gaussian
+    #### mixture model which estimates the density function
+                
+    s0 = np.zeros([d, d])
+    for j in range(d):
+        r = x[d].max() - x[d].min()
+        s0[j, j] = (r / (num_clusters ** (1. / d))) ** 0.5 
+    
+    means = []
+    weights = []
+    covs = []
+                
+    # sort the events by cluster once, instead of masking once per cluster
+    order = np.argsort(x_labels, kind = "stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(x_labels, minlength = num_clusters))))
+                
+    for k in range(num_clusters):
+        xk = x[order[offsets[k] : offsets[k + 1]]]
+        num_k = len(xk)
+        weight_k = num_k / len(x_labels)
+        mu = xk.mean(axis = 0)
+        means.append(mu)
+        s = np.cov(xk, rowvar = False)
+        
+        el = num_k / (num_clusters + num_k)
+        s_smooth = el * h * s + (1.0 - el) * h0 * s0
+        
+        weights.append(weight_k)
+        covs.append(s_smooth)
+        
+    return kmeans, means, weights, covs
+
+
+class _MixtureDensity(object):
+    """
+    The density of a finite gaussian mixture model, and its gradient,
+    evaluated at many points at once.  Like `scipy.stats.multivariate_normal.pdf`,
+    a single point gives a scalar.
+    
+    Parameters
+    ----------
+    means : list of numpy.ndarray
+        The components' means.
+        
+    weights : list of float
+        The components' weights.
+        
+    covs : list of numpy.ndarray
+        The components' covariance matrices.  Must be positive definite.
+    """
+    
+    def __init__(self, means, weights, covs):
+        self.means = np.array(means, dtype = np.float64)
+        self.weights = np.array(weights, dtype = np.float64)
+        k, d = self.means.shape
+        
+        # the precision matrices and the log normalizing constants, from
+        # the covariances' Cholesky factors
+        chol = np.linalg.cholesky(np.array(covs, dtype = np.float64))
+        chol_inv = np.linalg.inv(chol)
+        self.precisions = np.einsum('kji,kjl->kil', chol_inv, chol_inv)
+        self.log_norm = (-0.5 * d * np.log(2 * np.pi)
+                         - np.log(np.diagonal(chol, axis1 = 1, axis2 = 2)).sum(axis = 1))
+        
+        # the precisions times the means, for the peak-finding fixed point
+        self.precision_means = np.einsum('kij,kj->ki', self.precisions, self.means)
+        
+    def _points(self, x):
+        x = np.asarray(x, dtype = np.float64)
+        return x.reshape(-1, self.means.shape[1]), x.ndim <= 1 or x.shape[0] == 1
+    
+    def _log_pdfs(self, x):
+        """log(weight * pdf) for each point (row) and component (column)"""
+        diff = x[:, np.newaxis, :] - self.means
+        maha = np.einsum('nki,kij,nkj->nk', diff, self.precisions, diff)
+        return np.log(self.weights) + self.log_norm - 0.5 * maha
+    
+    def pdf(self, x, c):
+        """The (unweighted) density of component ``c``"""
+        x, scalar = self._points(x)
+        diff = x - self.means[c]
+        maha = np.einsum('ni,ij,nj->n', diff, self.precisions[c], diff)
+        ret = np.exp(self.log_norm[c] - 0.5 * maha)
+        return ret[0] if scalar else ret
+        
+    def __call__(self, x):
+        x, scalar = self._points(x)
+        
+        # one component at a time, so big grids don't need (points x 
+        # components x dimensions) of memory
+        ret = np.zeros(len(x))
+        for c in range(len(self.means)):
+            ret += self.weights[c] * self.pdf(x, c)
+        return ret[0] if scalar else ret
+    
+    def gradient(self, x):
+        """The gradient of the density."""
+        x, scalar = self._points(x)
+        p = np.exp(self._log_pdfs(x))
+        ret = np.einsum('nk,ki->ni', p, self.precision_means) - \
+              np.einsum('nk,kij,nj->ni', p, self.precisions, x)
+        return ret[0] if scalar else ret
+    
+    def find_peaks(self, x0, tol = 1e-6, max_iter = 1000):
+        """
+        Climb from each of the points in ``x0`` to a local maximum of the
+        density, all at once.  Each step is the fixed-point (mean-shift)
+        iteration for gaussian mixtures, from Carreira-Perpinan (2000), 
+        *Mode-finding for mixtures of Gaussian distributions*:
+        
+            x <- (sum_c p_c(x) S_c^-1)^-1 (sum_c p_c(x) S_c^-1 mu_c)
+            
+        where ``p_c(x)`` is the posterior probability of component ``c``.
+        The step is halved until the density doesn't decrease.
+        
+        Returns the peaks, and whether each one converged (moved less than
+        ``tol``) within ``max_iter`` steps.
+        """
+        x = np.array(x0, dtype = np.float64).reshape(-1, self.means.shape[1])
+        log_f = self._log_density(x)
+        active = np.arange(len(x))
+        
+        for _ in range(max_iter):
+            if len(active) == 0:
+                break
+            
+            xa = x[active]
+            log_p = self._log_pdfs(xa)
+            p = np.exp(log_p - log_p.max(axis = 1, keepdims = True))
+            
+            a = np.einsum('nk,kij->nij', p, self.precisions)
+            b = np.einsum('nk,ki->ni', p, self.precision_means)
+            step = np.linalg.solve(a, b[:, :, np.newaxis])[:, :, 0] - xa
+            
+            # make sure we're going uphill
+            for _ in range(30):
+                new_log_f = self._log_density(xa + step)
+                downhill = new_log_f < log_f[active]
+                if not downhill.any():
+                    break
+                step[downhill] /= 2.0
+            else:
+                new_log_f = np.maximum(new_log_f, log_f[active])
+                step[downhill] = 0.0
+            
+            x[active] = xa + step
+            log_f[active] = new_log_f
+            active = active[np.linalg.norm(step, axis = 1) >= tol]
+            
+        converged = np.ones(len(x), dtype = np.bool_)
+        converged[active] = False
+        return x, converged
+    
+    def _log_density(self, x):
+        log_p = self._log_pdfs(x)
+        log_max = log_p.max(axis = 1)
+        return log_max + np.log(np.exp(log_p - log_max[:, np.newaxis]).sum(axis = 1))
+    
 @provides(IView)
 class FlowPeaks1DView(By1DView, AnnotatingView, HistogramView):
     """
@@ -1189,6 +1288,8 @@ class FlowPeaks2DDensityView(By2DView, AnnotatingView, NullView):
             y = self.op._scale[self.xchannel].inverse(peak[1])
             plt.plot(x, y, 'o', color = "magenta")   
 
+util.expand_class_attributes(FlowPeaksOp)
+
 util.expand_class_attributes(FlowPeaks1DView)
 util.expand_method_parameters(FlowPeaks1DView, FlowPeaks1DView.plot)
 
@@ -39,6 +39,7 @@ from traits.api import (HasStrictTraits, Str, List, Constant, provides,
 import cytoflow.utility as util
 
 from .i_operation import IOperation
+from .channel_stat import _statistic
 
 @provides(IOperation)
 class FrameStatisticOp(HasStrictTraits):
@@ -159,52 +160,47 @@ class FrameStatisticOp(HasStrictTraits):
                                            "Aggregation metadata {} not found, "
                                            " must be one of {}"
                                            .format(b, experiment.conditions))
-            unique = experiment.data[b].unique()
                 
-            if len(unique) == 1:
+        idx = experiment.statistic_index(self.by)
+        
+        for b in self.by:
+            if len(idx.unique(level = b)) == 1:
                 warn("Only one category for {}".format(b), util.CytoflowOpWarning)
                 
-        groupby = experiment.data.groupby(self.by)
-                        
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
-                warn("Group {} had no data"
-                     .format(group), 
-                     util.CytoflowOpWarning)
+        groups = experiment.group_index(self.by)
+        locs = idx.get_indexer(groups.keys)
+        
+        # the combinations of conditions with no events get `fill`
+        for group in idx.delete(locs):
+            warn("Group {} had no data"
+                 .format(group), 
+                 util.CytoflowOpWarning)
         
-        # this shouldn't be necessary, but see pandas bug #38053
-        if len(self.by) == 1:
-            idx = pd.Index(experiment[self.by[0]].unique(), name = self.by[0])
+        if self.function is len:
+            # the size of each group is already known
+            values = groups.counts
         else:
-            idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by], 
-                                             names = self.by)
+            values = np.empty(len(groups), dtype = np.dtype(object))
+            for i, (group, group_idx) in enumerate(groups):
+                data_subset = experiment.data.iloc[group_idx]
 
-        stat = pd.Series(data = self.fill,
-                         index = idx, 
-                         name = "{} : {}".format(stat_name[0], stat_name[1]),
-                         dtype = np.dtype(object)).sort_index()
-        
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
-                continue
-            
-            try:
-                v = self.function(data_subset)
-                
-                stat.at[group] = v
+                try:
+                    v = self.function(data_subset)
 
-            except Exception as e:
-                raise util.CytoflowOpError('function',
-                                           "Your function threw an error in group {}"
-                                           .format(group)) from e    
-                            
-            # check for, and warn about, NaNs.
-            if pd.Series(stat.loc[group]).isna().any():
-                warn("Category {} returned {}".format(group, stat.loc[group]), 
-                     util.CytoflowOpWarning)
-                    
-        # try to convert to numeric, but if there are non-numeric bits ignore
-        stat = pd.to_numeric(stat, errors = 'ignore')
+                    values[i] = v
+
+                except Exception as e:
+                    raise util.CytoflowOpError('function',
+                                               "Your function threw an error in group {}"
+                                               .format(group)) from e
+
+                # check for, and warn about, NaNs.
+                if pd.Series(v).isna().any():
+                    warn("Category {} returned {}".format(group, v),
+                         util.CytoflowOpWarning)
+
+        stat = _statistic(idx, locs, values, self.fill,
+                          name = "{} : {}".format(stat_name[0], stat_name[1]))
 
         new_experiment.history.append(self.clone_traits(transient = lambda t: True))
         new_experiment.statistics[stat_name] = stat
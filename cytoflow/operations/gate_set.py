@@ -0,0 +1,259 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.operations.gate_set
+----------------------------
+
+Applies several gates to an `Experiment` at once.  `gate_set` has one class:
+
+`GateSetOp` -- applies a list of `ThresholdOp`, `RangeOp`, `Range2DOp`,
+`QuadOp` and `PolygonOp` gates in one pass over the data.
+
+It also has the machinery that those gates use to apply themselves:
+
+`GateFunction` -- which columns a gate reads, and how to compute it from them.
+
+`evaluate_gates` -- compute several gates in one (chunked) pass over the 
+columns they read.
+"""
+
+from traits.api import HasStrictTraits, Str, List, Instance, Constant, provides
+
+import numpy as np
+import pandas as pd
+
+import cytoflow.utility as util
+
+from .i_operation import IOperation
+
+# how many events to gate at once.  small enough that a chunk of each of
+# the columns stays in the cache while every gate reads it.
+_CHUNK_SIZE = 1 << 16
+
+class GateFunction(object):
+    """
+    How to compute a gate.
+    
+    Parameters
+    ----------
+    name : Str
+        The name of the condition the gate makes.
+        
+    columns : list of (Str, IScale)
+        The columns the gate reads, and the scale to read each one with (or
+        ``None`` to read the unscaled data.)
+        
+    fn : callable
+        Computes the gate from chunks of the (scaled) columns, one argument
+        per column.  Must return an array with one value per event.
+        
+    labels : list of Str (default = None)
+        If set, ``fn`` returns the index of each event's label in ``labels``
+        (or -1 if it doesn't have one), and the gate is a ``category`` 
+        condition.  Otherwise, ``fn`` returns a ``bool`` for each event,
+        and the gate is a ``bitmask`` condition.
+    """
+    
+    def __init__(self, name, columns, fn, labels = None):
+        self.name = name
+        self.columns = columns
+        self.fn = fn
+        self.labels = labels
+        
+    @property
+    def dtype(self):
+        return np.bool_ if self.labels is None else np.int8
+        
+    def add_condition(self, experiment, values):
+        """Add the values computed by `evaluate_gates` to ``experiment``."""
+        
+        if self.labels is None:
+            experiment.add_condition(self.name, "bitmask", values)
+            return
+        
+        # only keep the labels that were used, in sorted order
+        codes = values.astype(np.int64)
+        codes[codes < 0] = len(self.labels)
+        used = np.flatnonzero(np.bincount(codes, minlength = len(self.labels) + 1)[:-1])
+        used = sorted(used, key = lambda c: self.labels[c])
+        recode = np.full(len(self.labels) + 1, -1, dtype = np.int64)
+        recode[used] = np.arange(len(used))
+        
+        categories = pd.Categorical.from_codes(recode[codes], 
+                                               [self.labels[c] for c in used])
+        experiment.add_condition(self.name, "category", pd.Series(categories))
+        
+        
+def evaluate_gates(experiment, gates):
+    """
+    Compute several gates in one pass over ``experiment``'s events.
+    
+    Each column the gates read is read (and scaled, with 
+    `Experiment.scaled <cytoflow.experiment.Experiment.scaled>`) once, no 
+    matter how many gates read it.  Then the gates are computed a chunk of
+    events at a time, so each chunk of the columns is still in the cache 
+    for the next gate.
+    
+    Parameters
+    ----------
+    experiment : `Experiment`
+        The experiment to gate.
+        
+    gates : list of `GateFunction`
+        The gates to compute.
+        
+    Returns
+    -------
+    list of numpy.ndarray
+        Each gate's values, one per event.
+    """
+    
+    columns = {}
+    for gate in gates:
+        for key in gate.columns:
+            if key in columns:
+                continue
+            
+            column, scale = key
+            if scale is None:
+                columns[key] = experiment.data[column].values
+            else:
+                columns[key] = experiment.scaled(column, scale).values
+            
+    ret = [np.empty(len(experiment), dtype = gate.dtype) for gate in gates]
+    
+    for start in range(0, len(experiment), _CHUNK_SIZE):
+        chunk = slice(start, start + _CHUNK_SIZE)
+        for gate, values in zip(gates, ret):
+            values[chunk] = gate.fn(*[columns[key][chunk] for key in gate.columns])
+            
+    return ret
+
+
+@provides(IOperation)
+class GateSetOp(HasStrictTraits):
+    """
+    Apply several gates at once.  The new `Experiment` has the same 
+    conditions as applying each of the gates in turn, but the data is
+    only read once (and each channel is only scaled once), and the 
+    `Experiment` is only copied once.
+    
+    Attributes
+    ----------
+    name : Str
+        The operation name.  Not used: each gate's condition is named for
+        the gate.
+        
+    gates : List(IOperation)
+        The gates to apply.  Each one must be a `ThresholdOp`, `RangeOp`, 
+        `Range2DOp`, `QuadOp` or `PolygonOp`, and they must have different
+        names.
+        
+    Examples
+    --------
+    
+    Make a little data set.
+    
+    >>> import cytoflow as flow
+    >>> import_op = flow.ImportOp()
+    >>> import_op.tubes = [flow.Tube(file = "Plate01/RFP_Well_A3.fcs",
+    ...                              conditions = {'Dox' : 10.0}),
+    ...                    flow.Tube(file = "Plate01/CFP_Well_A4.fcs",
+    ...                              conditions = {'Dox' : 1.0})]
+    >>> import_op.conditions = {'Dox' : 'float'}
+    >>> ex = import_op.apply()
+    
+    Apply two gates.
+    
+    >>> gates_op = flow.GateSetOp(
+    ...     gates = [flow.ThresholdOp(name = 'Threshold',
+    ...                               channel = 'Y2-A',
+    ...                               threshold = 2000),
+    ...              flow.RangeOp(name = 'Range',
+    ...                           channel = 'V2-A',
+    ...                           low = 100,
+    ...                           high = 1000)])
+    >>> ex2 = gates_op.apply(ex)
+    >>> ex2.data.groupby(['Threshold', 'Range']).size()
+    Threshold  Range
+    False      False    8442
+               True     7344
+    True       False    1772
+               True     2442
+    dtype: int64
+    """
+    
+    id = Constant('edu.mit.synbio.cytoflow.operations.gate_set')
+    friendly_id = Constant("Gate Set")
+    
+    name = Str
+    gates = List(Instance(IOperation))
+    
+    def apply(self, experiment):
+        """
+        Applies the gates to an experiment.
+        
+        Parameters
+        ----------
+        experiment : `Experiment`
+            the `Experiment` to which the gates are applied
+            
+        Returns
+        -------
+        Experiment
+            a new `Experiment`, with one new condition for each gate (named
+            for the gate), the same as applying the gates one at a time.
+        """
+        
+        if experiment is None:
+            raise util.CytoflowOpError('experiment', "No experiment specified")
+        
+        if not self.gates:
+            raise util.CytoflowOpError('gates', "Must specify at least one gate")
+        
+        for gate in self.gates:
+            if not hasattr(gate, '_gate_function'):
+                raise util.CytoflowOpError('gates',
+                                           "{} can't be in a gate set"
+                                           .format(type(gate).__name__))
+        
+        names = [gate.name for gate in self.gates]
+        for name in names:
+            if names.count(name) > 1:
+                raise util.CytoflowOpError('gates',
+                                           "More than one gate is named {}"
+                                           .format(name))
+                
+        gate_functions = []
+        for gate in self.gates:
+            try:
+                gate_functions.append(gate._gate_function(experiment))
+            except util.CytoflowOpError as e:
+                raise util.CytoflowOpError('gates',
+                                           "Gate {}: {}".format(gate.name, e.args[-1])) from e
+            
+        values = evaluate_gates(experiment, gate_functions)
+        
+        new_experiment = experiment.clone(deep = False)
+        for gate, gate_values in zip(gate_functions, values):
+            gate.add_condition(new_experiment, gate_values)
+            
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        return new_experiment
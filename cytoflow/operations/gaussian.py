@@ -36,6 +36,7 @@ using a scatter plot).
 """
 import re
 from warnings import warn
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon, Rectangle
@@ -54,10 +55,11 @@ from cytoflow.views import IView, HistogramView, ScatterplotView
 import cytoflow.utility as util
 
 from .i_operation import IOperation
+from .base_estimate import StratifiedSubsampleOp
 from .base_op_views import By1DView, By2DView, AnnotatingView
 
 @provides(IOperation)
-class GaussianMixtureOp(HasStrictTraits):
+class GaussianMixtureOp(StratifiedSubsampleOp):
     """
     This module fits a Gaussian mixture model with a specified number of
     components to one or more channels.
@@ -131,6 +133,12 @@ class GaussianMixtureOp(HasStrictTraits):
         posterior probability that the event is in component ``i``.  Useful for 
         filtering out low-probability events.
         
+    workers : Int (default = 1)
+        How many processes to use to fit the models.  If greater than 1, 
+        each group in `by` is fit in a process pool.  The result is the same
+        as fitting the groups one at a time.  `apply` also uses this many
+        threads to assign large groups' events to components.
+        
     Notes
     -----
     
@@ -223,6 +231,11 @@ class GaussianMixtureOp(HasStrictTraits):
     
     posteriors = Bool(False)
     
+    # how many processes to fit the groups' models with (and threads to
+    # apply them with)?
+    workers = util.PositiveInt(1, allow_zero = False)
+    
+    
     # the key is either a single value or a tuple
     _gmms = Dict(Any, Instance(sklearn.mixture.GaussianMixture), transient = True)
     _scale = Dict(Str, Instance(util.IScale), transient = True)
@@ -286,12 +299,9 @@ class GaussianMixtureOp(HasStrictTraits):
                                              "Subset string '{0}' returned no events"
                                              .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        strata = self._strata(experiment)
+                 
+        groups = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -302,27 +312,28 @@ class GaussianMixtureOp(HasStrictTraits):
             else:
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
         
-        gmms = {}
-            
-        for group, data_subset in groupby:
+        group_data = []
+        for group, group_idx in groups:
+            group_idx = self._subsample(group_idx, strata = strata)
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError(None,
                                            "Group {} had no data"
                                            .format(group))
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
             
             # drop data that isn't in the scale range
             for c in self.channels:
                 x = x[~(np.isnan(x[c]))]
             x = x.values
             
-            gmm = sklearn.mixture.GaussianMixture(n_components = self.num_components,
-                                                  covariance_type = "full",
-                                                  random_state = 1)
-            gmm.fit(x)
+            group_data.append((group, (x, self.num_components)))
             
+        gmms = util.map_groups(_fit_gmm, group_data, workers = self.workers)
+            
+        for group, gmm in gmms.items():
             if not gmm.converged_:
                 raise util.CytoflowOpError(None,
                                            "Estimator didn't converge"
@@ -345,9 +356,6 @@ class GaussianMixtureOp(HasStrictTraits):
             gmm.covariances_ = gmm.covariances_[sort_idx]
             gmm.precisions_ = gmm.precisions_[sort_idx]
             gmm.precisions_cholesky_ = gmm.precisions_cholesky_[sort_idx]
-
-            
-            gmms[group] = gmm
             
         self._gmms = gmms
      
@@ -454,111 +462,69 @@ class GaussianMixtureOp(HasStrictTraits):
 #             raise util.CytoflowOpError('posteriors',
 #                                        "If num_components == 1, all posteriors will be 1.")
          
+        # -1 is "{name}_None"
         if self.num_components > 1:
-            event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
+            event_assignments = np.full(len(experiment), -1, dtype = np.int64)
  
         if self.sigma is not None:
-            event_gate = {i : pd.Series([False] * len(experiment), dtype = "double")
-                           for i in range(self.num_components)}
+            event_gate = np.zeros((len(experiment), self.num_components), dtype = np.bool_)
+            
+            # come up with a threshold based on sigma.  you'll note we
+            # don't sqrt the distance: that's because for a multivariate 
+            # Gaussian, the square of the Mahalanobis distance is
+            # chi-square distributed
+            p = (scipy.stats.norm.cdf(self.sigma) - 0.5) * 2
+            thresh = scipy.stats.chi2.ppf(p, 1)
+        else:
+            thresh = None
  
         if self.posteriors:
-            event_posteriors = {i : pd.Series([0.0] * len(experiment), dtype = "double")
-                                for i in range(self.num_components)}
+            event_posteriors = np.zeros((len(experiment), self.num_components))
 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that
-            # contains all the events
-            groupby = experiment.data.groupby(lambda _: True)   
+        groups = experiment.group_index(self.by)
 
         # make the statistics       
         components = [x + 1 for x in range(self.num_components)]
-         
-        prop_idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by] + [components], 
-                                         names = list(self.by) + ["Component"])
-        prop_stat = pd.Series(name = "{} : {}".format(self.name, "proportion"),
-                              index = prop_idx, 
-                              dtype = np.dtype(object)).sort_index()
-                  
-        mean_idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by] + [components] + [self.channels], 
-                                              names = list(self.by) + ["Component"] + ["Channel"])
-        mean_stat = pd.Series(name = "{} : {}".format(self.name, "mean"),
-                              index = mean_idx, 
-                              dtype = np.dtype(object)).sort_index()
-        sigma_stat = pd.Series(name = "{} : {}".format(self.name, "sigma"),
-                               index = mean_idx,
-                               dtype = np.dtype(object)).sort_index()
-        interval_stat = pd.Series(name = "{} : {}".format(self.name, "interval"),
-                                  index = mean_idx, 
-                                  dtype = np.dtype(object)).sort_index()
-
-        corr_idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by] + [components] + [self.channels] + [self.channels], 
-                                              names = list(self.by) + ["Component"] + ["Channel_1"] + ["Channel_2"])
-        corr_stat = pd.Series(name = "{} : {}".format(self.name, "correlation"),
-                              index = corr_idx, 
-                              dtype = np.dtype(object)).sort_index()  
+        
+        prop_idx = experiment.statistic_index(self.by, Component = components)
+        mean_idx = experiment.statistic_index(self.by, 
+                                              Component = components,
+                                              Channel = self.channels)
+        corr_idx = experiment.statistic_index(self.by,
+                                              Component = components,
+                                              Channel_1 = self.channels,
+                                              Channel_2 = self.channels)
+        
+        # the groups' values, in the order of their keys
+        prop_keys, prop_values = [], []
+        mean_keys, mean_values, sigma_values, interval_values = [], [], [], []
+        corr_keys, corr_values = [], []
+        diagonal_keys = []
                  
-        for group, data_subset in groupby:
+        for group, group_idx in groups:
             if group not in self._gmms:
                 # there weren't any events in this group, so we didn't get
                 # a gmm.
                 continue
              
             gmm = self._gmms[group]
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
-                
-            # which values are missing?
-
-            x_na = pd.Series([False] * len(x))
-            for c in self.channels:
-                x_na[np.isnan(x[c]).values] = True
-                        
-            x = x.values
-            x_na = x_na.values
-            group_idx = groupby.groups[group]
+            x = np.column_stack([experiment.scaled(c, self._scale[c]).values[group_idx]
+                                 for c in self.channels])
+            
+            predicted, gate, proba = _apply_gmm(gmm, x,
+                                                predict = self.num_components > 1,
+                                                thresh = thresh,
+                                                posteriors = self.posteriors,
+                                                workers = self.workers)
  
             if self.num_components > 1:
-                predicted = np.full(len(x), -1, "int")
-                predicted[~x_na] = gmm.predict(x[~x_na])
-                
-                predicted_str = pd.Series(["(none)"] * len(predicted))
-                for c in range(0, self.num_components):
-                    predicted_str[predicted == c] = "{0}_{1}".format(self.name, c + 1)
-                predicted_str[predicted == -1] = "{0}_None".format(self.name)
-                predicted_str.index = group_idx
-     
-                event_assignments.iloc[group_idx] = predicted_str
+                event_assignments[group_idx] = predicted
                 
-            # if we're doing sigma-based gating, for each component check
-            # to see if the event is in the sigma gate.
             if self.sigma is not None:
-                for c in range(self.num_components):
-                    s = np.linalg.pinv(gmm.covariances_[c])
-                    mu = gmm.means_[c]
-                    
-                    # compute the Mahalanobis distance
-
-                    f = lambda x, mu, s: np.dot(np.dot((x - mu).T, s), (x - mu))
-                    dist = np.apply_along_axis(f, 1, x, mu, s)
-
-                    # come up with a threshold based on sigma.  you'll note we
-                    # didn't sqrt dist: that's because for a multivariate 
-                    # Gaussian, the square of the Mahalanobis distance is
-                    # chi-square distributed
-                    
-                    p = (scipy.stats.norm.cdf(self.sigma) - 0.5) * 2
-                    thresh = scipy.stats.chi2.ppf(p, 1)
-                    
-                    event_gate[c].iloc[group_idx] = np.less_equal(dist, thresh)
+                event_gate[group_idx] = gate
                     
             if self.posteriors:  
-                p = np.full((len(x), self.num_components), 0.0)
-                p[~x_na] = gmm.predict_proba(x[~x_na])
-                for c in range(self.num_components):
-                    event_posteriors[c].iloc[group_idx] = p[:, c]
+                event_posteriors[group_idx] = proba
                     
             for c in range(self.num_components):
                 if len(self.by) == 0:
@@ -568,45 +534,79 @@ class GaussianMixtureOp(HasStrictTraits):
                 else:
                     g = tuple([group] + [c + 1])
 
-                prop_stat.at[g] = gmm.weights_[c]
+                prop_keys.append(g)
+                prop_values.append(gmm.weights_[c])
+                
+                s, corr = util.cov2corr(gmm.covariances_[c])
                 
                 for cidx1, channel1 in enumerate(self.channels):
-                    g2 = tuple(list(g) + [channel1])
-                    mean_stat.at[g2] = self._scale[channel1].inverse(gmm.means_[c, cidx1])
-                    
-                    s, corr = util.cov2corr(gmm.covariances_[c])
-                    sigma_stat[g2] = (self._scale[channel1].inverse(s[cidx1]))
-                    interval_stat.at[g2] = (self._scale[channel1].inverse(gmm.means_[c, cidx1] - s[cidx1]),
-                                             self._scale[channel1].inverse(gmm.means_[c, cidx1] + s[cidx1]))
+                    g2 = g + (channel1,)
+                    mean_keys.append(g2)
+                    mean_values.append(self._scale[channel1].inverse(gmm.means_[c, cidx1]))
+                    sigma_values.append(self._scale[channel1].inverse(s[cidx1]))
+                    interval_values.append((self._scale[channel1].inverse(gmm.means_[c, cidx1] - s[cidx1]),
+                                            self._scale[channel1].inverse(gmm.means_[c, cidx1] + s[cidx1])))
             
                     for cidx2, channel2 in enumerate(self.channels):
-                        g3 = tuple(list(g2) + [channel2])
-                        corr_stat[g3] = corr[cidx1, cidx2]
+                        corr_keys.append(g2 + (channel2,))
+                        corr_values.append(corr[cidx1, cidx2])
                         
-                    corr_stat.drop(tuple(list(g2) + [channel1]), inplace = True)
+                    diagonal_keys.append(g2 + (channel1,))
+                    
+        prop_stat = _float_statistic(prop_idx, prop_keys, prop_values,
+                                     "{} : {}".format(self.name, "proportion"))
+        mean_stat = _float_statistic(mean_idx, mean_keys, mean_values,
+                                     "{} : {}".format(self.name, "mean"))
+        sigma_stat = _float_statistic(mean_idx, mean_keys, sigma_values,
+                                      "{} : {}".format(self.name, "sigma"))
+
+        interval = np.full(len(mean_idx), np.nan, dtype = np.dtype(object))
+        if mean_keys:
+            interval[mean_idx.get_indexer(mean_keys)] = \
+                pd.Series(interval_values, dtype = np.dtype(object)).values
+        interval_stat = pd.Series(interval, 
+                                  index = mean_idx, 
+                                  name = "{} : {}".format(self.name, "interval"))
+
+        corr_stat = _float_statistic(corr_idx, corr_keys, corr_values,
+                                     "{} : {}".format(self.name, "correlation"))
+        if diagonal_keys:
+            corr_stat = corr_stat.drop(diagonal_keys)
 
         new_experiment = experiment.clone(deep = False)
           
         if self.num_components > 1:
-            new_experiment.add_condition(self.name, "category", event_assignments)
+            labels = ["{}_{}".format(self.name, c + 1) for c in range(self.num_components)]
+            labels.append("{}_None".format(self.name))
+            event_assignments[event_assignments < 0] = self.num_components
+            
+            # only keep the labels that were used, in sorted order
+            used = np.flatnonzero(np.bincount(event_assignments, 
+                                              minlength = len(labels)))
+            used = sorted(used, key = lambda c: labels[c])
+            recode = np.zeros(len(labels), dtype = np.int64)
+            recode[used] = np.arange(len(used))
+            assignments = pd.Categorical.from_codes(recode[event_assignments],
+                                                    [labels[c] for c in used])
+            new_experiment.add_condition(self.name, "category", pd.Series(assignments))
             
         if self.sigma is not None:
             for c in range(self.num_components):
                 gate_name = "{}_{}".format(self.name, c + 1)
-                new_experiment.add_condition(gate_name, "bool", event_gate[c])              
+                new_experiment.add_condition(gate_name, "bitmask", event_gate[:, c])              
                 
         if self.posteriors:
             for c in range(self.num_components):
                 post_name = "{}_{}_posterior".format(self.name, c + 1)
-                new_experiment.add_condition(post_name, "double", event_posteriors[c])
+                new_experiment.add_condition(post_name, "double", event_posteriors[:, c])
                 
-        new_experiment.statistics[(self.name, "mean")] = pd.to_numeric(mean_stat)
+        new_experiment.statistics[(self.name, "mean")] = mean_stat
         new_experiment.statistics[(self.name, "sigma")] = sigma_stat
         new_experiment.statistics[(self.name, "interval")] = interval_stat
         if len(corr_stat) > 0:
-            new_experiment.statistics[(self.name, "correlation")] = pd.to_numeric(corr_stat)
+            new_experiment.statistics[(self.name, "correlation")] = corr_stat
         if self.num_components > 1:
-            new_experiment.statistics[(self.name, "proportion")] = pd.to_numeric(prop_stat)
+            new_experiment.statistics[(self.name, "proportion")] = prop_stat
 
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
@@ -664,6 +664,113 @@ class GaussianMixtureOp(HasStrictTraits):
             raise util.CytoflowViewError('channels',
                                          "Can't specify more than two channels for a default view")
 
+def _fit_gmm(x, num_components):
+    """Fit one group's model.  Module-level so it can run in a process pool."""
+    gmm = sklearn.mixture.GaussianMixture(n_components = num_components,
+                                          covariance_type = "full",
+                                          random_state = 1)
+    gmm.fit(x)
+    return gmm
+
+# how many events to assign at once
+_CHUNK_SIZE = 1 << 16
+
+def _apply_gmm(gmm, x, predict, thresh, posteriors, workers):
+    """
+    Assign one group's events to its model's components, a chunk of events
+    at a time (in a thread pool, if ``workers > 1``.)  Returns the predicted
+    component for each event (-1 if the event has a missing value), whether 
+    it's within the squared Mahalanobis distance ``thresh`` of each component's 
+    mean, and its posterior probability for each component.  Anything that 
+    wasn't asked for is ``None``.
+    """
+    
+    num_events = len(x)
+    k = gmm.n_components
+    
+    predicted = np.full(num_events, -1, dtype = np.int64) if predict else None
+    gate = np.zeros((num_events, k), dtype = np.bool_) if thresh is not None else None
+    proba = np.zeros((num_events, k)) if posteriors else None
+    
+    if predict or posteriors:
+        # the same log-likelihood that sklearn computes, up to a constant
+        prec = list(gmm.precisions_cholesky_)
+        log_prior = (np.log(gmm.weights_) + 
+                     np.array([np.log(np.diag(p)).sum() for p in prec]))
+        prec_w, prec_mu_w = _stack_whitening(gmm.means_, prec)
+    
+    if thresh is not None:
+        # the gates use the pseudo-inverse of the covariance, which is 
+        # defined even if the covariance is singular
+        gate_w = []
+        for c in range(k):
+            evals, evecs = np.linalg.eigh(np.linalg.pinv(gmm.covariances_[c]))
+            gate_w.append(evecs * np.sqrt(np.clip(evals, 0, None)))
+        gate_w, gate_mu_w = _stack_whitening(gmm.means_, gate_w)
+    
+    def assign(start):
+        stop = min(start + _CHUNK_SIZE, num_events)
+        x_chunk = x[start:stop]
+        x_ok = ~np.isnan(x_chunk).any(axis = 1)
+        
+        if predict or posteriors:
+            log_p = log_prior - 0.5 * _sq_distances(x_chunk[x_ok], prec_w, prec_mu_w)
+            if predict:
+                predicted[start:stop][x_ok] = log_p.argmax(axis = 1)
+            if posteriors:
+                log_p -= log_p.max(axis = 1, keepdims = True)
+                p = np.exp(log_p)
+                p /= p.sum(axis = 1, keepdims = True)
+                proba[start:stop][x_ok] = p
+            
+        if thresh is not None:
+            # events with missing values have a distance of NaN, so they're
+            # never in the gate
+            gate[start:stop] = _sq_distances(x_chunk, gate_w, gate_mu_w) <= thresh
+
+    starts = range(0, num_events, _CHUNK_SIZE)
+    if workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            list(executor.map(assign, starts))
+    else:
+        for start in starts:
+            assign(start)
+        
+    return predicted, gate, proba
+
+def _stack_whitening(means, w):
+    """
+    (x - mu)^T S^-1 (x - mu) = |x W - mu W|^2, where S^-1 = W W^T.  Stack
+    the components' W side-by-side (so one matrix product transforms every 
+    event for every component) and precompute mu W.
+    """
+    mu_w = np.concatenate([mu @ w_c for mu, w_c in zip(means, w)])
+    return np.concatenate(w, axis = 1), mu_w
+
+def _sq_distances(x, w, mu_w):
+    """The squared distance from each event to each component's mean."""
+    y = x @ w
+    y -= mu_w
+    y *= y
+    
+    # y's columns are grouped by component; sum each component's
+    d = x.shape[1]
+    dist = y[:, 0::d].copy()
+    for i in range(1, d):
+        dist += y[:, i::d]
+    return dist
+
+def _float_statistic(index, keys, values, name):
+    """
+    Make a ``float64`` statistic with ``values`` at ``keys`` in ``index`` 
+    and ``NaN`` everywhere else.
+    """
+    
+    data = np.full(len(index), np.nan)
+    if keys:
+        data[index.get_indexer(keys)] = values
+    return pd.Series(data, index = index, name = name)
+    
 @provides(IView)
 class GaussianMixture1DView(By1DView, AnnotatingView, HistogramView):
     """
@@ -942,6 +1049,8 @@ def _plot_ellipse(ax, xscale, yscale, center, width, height, angle, **kwargs):
     ax.add_patch(scaled_patch)
             
             
+util.expand_class_attributes(GaussianMixtureOp)
+
 util.expand_class_attributes(GaussianMixture1DView)
 util.expand_method_parameters(GaussianMixture1DView, GaussianMixture1DView.plot)
 
@@ -38,12 +38,15 @@ There are a few utility functions as well:
   - `autodetect_name_metadata` -- see if ``$PnN`` or ``$PnS`` has the channel names
 '''
 
-import warnings, math
+import warnings, math, contextlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from traits.api import (HasTraits, HasStrictTraits, provides, Str, List, Any,
                         Dict, File, Constant, Enum, Int)
 
 from fcsparser import fcsparser
 import numpy as np
+import pandas as pd
 from pathlib import Path
 
 import cytoflow.utility as util
@@ -136,7 +139,10 @@ class ImportOp(HasStrictTraits):
         If not None, import only a random subset of events of size `events`. 
         Presumably the analysis will go faster but less precisely; good for
         interactive data exploration.  Then, unset `events` and re-run
-        the analysis non-interactively.
+        the analysis non-interactively.  The subset is chosen before the
+        data is read, so (for most FCS files) only those events are read 
+        from disk.  Use `numpy.random.seed` to choose the same subset
+        each time.
         
     name_metadata : {None, "$PnN", "$PnS"} (default = None)
         Which FCS metadata is the channel name?  If ``None``, attempt to  
@@ -151,6 +157,25 @@ class ImportOp(HasStrictTraits):
         would like to use.  This will be used for *all FCS files imported by
         this operation.*
             
+    workers : Int (default = 1)
+        How many processes to use to parse the FCS files.  If greater than
+        1, the tubes are parsed (and subsampled, if `events` is set) in a
+        process pool, then added to the new `Experiment` in the same order 
+        as `tubes`.  The result is the same as parsing the tubes one at a 
+        time.
+        
+        .. note::
+        
+            The worker processes are started with ``forkserver`` (or with
+            ``spawn`` on Windows), not ``fork``, so a script that sets
+            `workers` must guard its top-level code with
+            ``if __name__ == '__main__':``.
+            
+        To skip parsing the same FCS files over and over -- for example,
+        the controls that `AutofluorescenceOp`, `BleedthroughLinearOp` and
+        `BeadCalibrationOp` import -- turn on the on-disk tube cache with
+        `util.set_tube_cache <cytoflow.utility.tube_cache.set_tube_cache>`.
+            
     ignore_v : List(Str)
         `cytoflow` is designed to operate on an `Experiment` containing
         tubes that were all collected under the same instrument settings.
@@ -197,6 +222,9 @@ class ImportOp(HasStrictTraits):
 
     # are we subsetting?
     events = Int(None)
+    
+    # how many processes to parse the tubes with?
+    workers = util.PositiveInt(1, allow_zero = False)
         
     # DON'T DO THIS
     ignore_v = List(Str)
@@ -283,6 +311,9 @@ class ImportOp(HasStrictTraits):
             experiment.add_condition(condition, dtype)
             experiment.metadata[condition]['experiment'] = True
 
+        # this only reads the HEADER and TEXT segments, so there's nothing
+        # to gain from util.read_fcs -- and we want fcsparser's table of
+        # per-channel keywords (_channels_)
         try:
             # silence warnings about duplicate channels;
             # we'll figure that out below
@@ -339,66 +370,84 @@ class ImportOp(HasStrictTraits):
                 
                                 
         experiment.metadata['fcs_metadata'] = {}
-        for tube in self.tubes:
-            if metadata_only:
-                try:
-                    tube_meta, tube_data = parse_tube(tube.file,
-                                                      experiment,
-                                                      data_set = self.data_set,
-                                                      metadata_only = True)
-                except Exception as e:
-                    raise util.CytoflowOpError('tubes',
-                                               "FCS reader threw an error reading metadata "
-                                               "for tube {}: {}"
-                                               .format(self.tubes[0].file, str(e))) from e
-            else:
+        
+        # choose each tube's random seed up front, so the subsampling is the
+        # same whether or not the tubes are parsed in parallel.  (they come
+        # from the global RNG so that `numpy.random.seed` chooses the same
+        # subset each time, as documented; without `events`, leave it alone.)
+        if self.events:
+            seeds = np.random.randint(np.iinfo(np.int32).max, size = len(self.tubes))
+        else:
+            seeds = [None] * len(self.tubes)
+        
+        # pass the tube cache along explicitly, so the process pool sees it
+        cache = util.get_tube_cache()
+        
+        loaders = [partial(_load_tube,
+                           tube.file, 
+                           experiment, 
+                           channels,
+                           data_set = self.data_set,
+                           events = self.events,
+                           seed = seed,
+                           metadata_only = metadata_only,
+                           cache = cache)
+                   for tube, seed in zip(self.tubes, seeds)]
+        
+        if self.workers > 1 and len(self.tubes) > 1:
+            pool = ProcessPoolExecutor(max_workers = self.workers,
+                                       mp_context = util.mp_context())
+        else:
+            pool = contextlib.nullcontext()
+        
+        with pool as executor:
+            if executor is not None:
+                # submit all the tubes now; collect them in order below
+                loaders = [executor.submit(load).result for load in loaders]
+        
+            for tube, load in zip(self.tubes, loaders):
                 try:
-                    tube_meta, tube_data = parse_tube(tube.file, 
-                                                      experiment, 
-                                                      data_set = self.data_set)
+                    tube_meta, tube_data = load()
                 except Exception as e:
                     raise util.CytoflowOpError('tubes',
-                                               "FCS reader threw an error reading data "
+                                               "FCS reader threw an error reading {} "
                                                "for tube {}: {}"
-                                               .format(self.tubes[0].file, str(e))) from e
-                
-    
-                if self.events is not None:
-                    if self.events <= len(tube_data):
-                        tube_data = tube_data.loc[np.random.choice(tube_data.index,
-                                                                   self.events,
-                                                                   replace = False)]
-                    else:
+                                               .format("metadata" if metadata_only else "data",
+                                                       tube.file, 
+                                                       str(e))) from e
+                    
+                if not metadata_only:
+                    if self.events is not None and len(tube_data) < self.events:
                         warnings.warn("Only {0} events in tube {1}"
                                       .format(len(tube_data), tube.file),
                                       util.CytoflowWarning)
-    
-                experiment.add_events(tube_data[channels], tube.conditions)
-                        
-            # extract the row and column from wells collected on a 
-            # BD HTS
-            if 'WELL ID' in tube_meta:               
-                pos = tube_meta['WELL ID']
-                tube_meta['CF_Row'] = pos[0]
-                tube_meta['CF_Col'] = int(pos[1:3])
+        
+                    experiment.add_events(tube_data, tube.conditions)
+                            
+                # extract the row and column from wells collected on a 
+                # BD HTS
+                if 'WELL ID' in tube_meta:               
+                    pos = tube_meta['WELL ID']
+                    tube_meta['CF_Row'] = pos[0]
+                    tube_meta['CF_Col'] = int(pos[1:3])
                 
-            for i, channel in enumerate(channels):
-                # remove the PnV tube metadata
+                for i, channel in enumerate(channels):
+                    # remove the PnV tube metadata
 
-                if '$P{}V'.format(i+1) in tube_meta:
-                    del tube_meta['$P{}V'.format(i+1)]
+                    if '$P{}V'.format(i+1) in tube_meta:
+                        del tube_meta['$P{}V'.format(i+1)]
                     
-                # work around a bug where the PnR is sometimes not the detector range
-                # but the data range.
-                pnr = '$P{}R'.format(i+1)
-                if pnr in tube_meta and float(tube_meta[pnr]) > experiment.metadata[channel]['range']:
-                    experiment.metadata[channel]['range'] = float(tube_meta[pnr])
+                    # work around a bug where the PnR is sometimes not the detector range
+                    # but the data range.
+                    pnr = '$P{}R'.format(i+1)
+                    if pnr in tube_meta and float(tube_meta[pnr]) > experiment.metadata[channel]['range']:
+                        experiment.metadata[channel]['range'] = float(tube_meta[pnr])
             
                 
-            tube_meta['CF_File'] = Path(tube.file).stem
+                tube_meta['CF_File'] = Path(tube.file).stem
                              
-            experiment.metadata['fcs_metadata'][tube.file] = tube_meta
-            
+                experiment.metadata['fcs_metadata'][tube.file] = tube_meta
+
         # take care of strange encodings
         for channel in channels:
             # this catches an odd corner case where some instruments store
@@ -417,7 +466,7 @@ class ImportOp(HasStrictTraits):
                     for _ in range(1, range_bits):
                         mask = mask << 1 | 1
 
-                    experiment.data[channel] = experiment.data[channel].values.astype('int') & mask
+                    experiment[channel] = experiment.data[channel].values.astype('int') & mask
                 
             # re-scale the data to linear if if's recorded as log-scaled with
             # integer channels
@@ -435,7 +484,7 @@ class ImportOp(HasStrictTraits):
                 warnings.warn('Converting channel {} from logarithmic to linear'
                               .format(channel),
                               util.CytoflowWarning)
-                experiment.data[channel] = 10 ** (f1 * experiment.data[channel] / data_range) * f2
+                experiment[channel] = 10 ** (f1 * experiment.data[channel] / data_range) * f2
 
 
         # rename channels if necessary                     
@@ -483,6 +532,7 @@ def check_tube(filename, experiment, data_set = 0):
     
     ignore_v = experiment.metadata['ignore_v']
     
+    # only the HEADER and TEXT segments; see ImportOp.apply
     try:
         tube_meta = fcsparser.parse( filename, 
                                      channel_naming = experiment.metadata["name_metadata"],
@@ -540,6 +590,7 @@ def autodetect_name_metadata(filename, data_set = 0):
     either "$PnN" or "$PnS"
     
     """
+    # only the HEADER and TEXT segments; see ImportOp.apply
     try:
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
@@ -584,9 +635,15 @@ def autodetect_name_metadata(filename, data_set = 0):
     
 
 # module-level, so we can reuse it in other modules
-def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False):   
+def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False,
+               channels = None, events = None, seed = None, cache = None):   
     """
-    Parses an FCS file.  A thin wrapper over ``fcsparser.parse``.
+    Parses an FCS file.  If the DATA segment can be memory-mapped, uses
+    `util.read_fcs <cytoflow.utility.fcsread.read_fcs>`; otherwise, 
+    falls back to ``fcsparser.parse``.  If there is a tube cache (see
+    `util.set_tube_cache <cytoflow.utility.tube_cache.set_tube_cache>`),
+    a tube that is already in the cache isn't parsed at all, and a tube
+    that isn't is parsed in full and stored there.
     
     Parameters
     ----------
@@ -604,6 +661,24 @@ def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False)
         If ``True``, only parse the metadata.  Because this is at the beginning
         of the FCS file, this happens much faster than parsing the entire file.
         
+    channels : list of string (optional, default: None)
+        If provided, only return these channels.  When the file can be 
+        memory-mapped, the other channels are never read.
+        
+    events : int (optional, default: None)
+        If provided, and the file has more than ``events`` events, only
+        return a random subset of ``events`` events.  When the file can be
+        memory-mapped, the other events are never read.
+        
+    seed : int (optional, default: None)
+        The seed for choosing the random subset of events.  The subset is
+        the same whether or not the file can be memory-mapped, and whether
+        or not it came from the cache.
+        
+    cache : `util.TubeCache <cytoflow.utility.tube_cache.TubeCache>` (optional, default: None)
+        The cache to use.  If ``None``, use the one from
+        `util.get_tube_cache <cytoflow.utility.tube_cache.get_tube_cache>`.
+        
     Returns
     -------
     tube_metadata : dict
@@ -621,6 +696,78 @@ def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False)
     else:
         name_metadata = '$PnS'
         
+    if cache is None:
+        cache = util.get_tube_cache()
+        
+    if cache is not None:
+        key = cache.key(filename, data_set, name_metadata)
+        hit = cache.get(key, metadata_only = metadata_only)
+        if hit is not None:
+            tube_meta, tube_data = hit
+            if not metadata_only:
+                tube_data = _select_events(tube_data, channels, events, seed)
+            return tube_meta, tube_data
+        
+        if not metadata_only:
+            # parse (and cache) the whole tube, then choose from it
+            tube_meta, tube_data = _parse_tube(filename, name_metadata, data_set)
+            cache.put(key, tube_meta, tube_data)
+            return tube_meta, _select_events(tube_data, channels, events, seed)
+    
+    return _parse_tube(filename, name_metadata, data_set, metadata_only, 
+                       channels, events, seed)
+
+
+def _parse_tube(filename, name_metadata, data_set, metadata_only = False,
+                channels = None, events = None, seed = None):
+    """
+    Parses an FCS file with `util.read_fcs <cytoflow.utility.fcsread.read_fcs>`,
+    falling back to ``fcsparser.parse``.
+    """
+        
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            tube_meta, tube_data = util.read_fcs(filename,
+                                                 channels = channels,
+                                                 name_metadata = name_metadata,
+                                                 data_set = data_set,
+                                                 metadata_only = metadata_only,
+                                                 events = events,
+                                                 seed = seed)
+            
+    except util.FCSLayoutError:
+        # read_fcs can't memory-map this layout, but fcsparser can read it
+        tube_meta, tube_data = _parse_tube_fcsparser(filename, 
+                                                     name_metadata,
+                                                     data_set, 
+                                                     metadata_only, 
+                                                     channels,
+                                                     events,
+                                                     seed)
+        
+    except util.CytoflowError as e:
+        raise util.CytoflowError("FCS reader threw an error reading data for tube {}"
+                                 .format(filename)) from e
+        
+    else:
+        if not metadata_only:
+            # fcsparser returns float32s, so we do too
+            tube_data = pd.DataFrame({c : x.astype("float32") 
+                                      for c, x in tube_data.items()},
+                                     columns = list(tube_data.keys()))
+            
+    del tube_meta['__header__']
+            
+    return tube_meta, tube_data
+
+
+def _parse_tube_fcsparser(filename, name_metadata, data_set, metadata_only, 
+                          channels, events, seed):
+    """
+    Parses an FCS file with ``fcsparser.parse``, for files that 
+    `util.read_fcs <cytoflow.utility.fcsread.read_fcs>` can't memory-map.
+    """
          
     try:
         if metadata_only:
@@ -640,12 +787,58 @@ def parse_tube(filename, experiment = None, data_set = 0, metadata_only = False)
                                         meta_data_only = metadata_only,
                                         data_set = data_set,
                                         channel_naming = name_metadata)
+                
+            tube_data = _select_events(tube_data, channels, events, seed)
     except Exception as e:
         raise util.CytoflowError("FCS reader threw an error reading data for tube {}"
                                  .format(filename)) from e
-            
-    del tube_meta['__header__']
-            
+                                 
     return tube_meta, tube_data
 
 
+def _select_events(data, channels, events, seed):
+    """
+    Choose ``channels`` and a random subset of ``events`` events from a
+    parsed tube -- the same events that `util.read_fcs 
+    <cytoflow.utility.fcsread.read_fcs>` would have chosen.  ``data`` can 
+    be a `pandas.DataFrame` or a dict mapping channel names to arrays.
+    """
+    
+    if channels is None:
+        channels = list(data.keys())
+        
+    num_events = len(data[channels[0]]) if channels else 0
+        
+    if events is not None and events < num_events:
+        rows = np.random.default_rng(seed).choice(num_events,
+                                                  events,
+                                                  replace = False)
+    else:
+        rows = slice(None)
+        
+    return pd.DataFrame({c : np.asarray(data[c])[rows] for c in channels},
+                        columns = list(channels))
+
+
+# module-level, so a process pool can pickle it
+def _load_tube(filename, experiment, channels, data_set = 0, events = None, 
+               seed = None, metadata_only = False, cache = None):
+    """
+    Parse one tube for `ImportOp.apply`: check it against ``experiment``,
+    read a random subset of ``events`` events (if it has that many) chosen
+    with ``seed``, and convert ``channels`` to ``float64``.
+    """
+    
+    tube_meta, tube_data = parse_tube(filename, 
+                                      experiment, 
+                                      data_set = data_set, 
+                                      metadata_only = metadata_only,
+                                      channels = channels,
+                                      events = events,
+                                      seed = seed,
+                                      cache = cache)
+    
+    if metadata_only:
+        return tube_meta, tube_data
+    
+    return tube_meta, tube_data.astype("float64")
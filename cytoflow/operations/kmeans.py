@@ -44,10 +44,11 @@ from cytoflow.views import IView, HistogramView, ScatterplotView
 import cytoflow.utility as util
 
 from .i_operation import IOperation
+from .base_estimate import StratifiedSubsampleOp
 from .base_op_views import By1DView, By2DView, AnnotatingView
 
 @provides(IOperation)
-class KMeansOp(HasStrictTraits):
+class KMeansOp(StratifiedSubsampleOp):
     """
     Use a K-means clustering algorithm to cluster events.  
     
@@ -90,6 +91,11 @@ class KMeansOp(HasStrictTraits):
         ``Time`` and ``Dox``, setting `by` to ``["Time", "Dox"]`` will 
         fit the model separately to each subset of the data with a unique 
         combination of ``Time`` and ``Dox``.
+        
+    workers : Int (default = 1)
+        How many processes to use to fit the models.  If greater than 1, 
+        each group in `by` is fit in a process pool.  The result is the same
+        as fitting the groups one at a time.
   
     
     Examples
@@ -158,6 +164,10 @@ class KMeansOp(HasStrictTraits):
     num_clusters = util.PositiveInt(allow_zero = False)
     by = List(Str)
     
+    # how many processes to fit the groups' models with?
+    workers = util.PositiveInt(1, allow_zero = False)
+    
+    
     _kmeans = Dict(Any, Instance(sklearn.cluster.MiniBatchKMeans), transient = True)
     _scale = Dict(Str, Instance(util.IScale), transient = True)
     
@@ -224,12 +234,9 @@ class KMeansOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        strata = self._strata(experiment)
+                 
+        groups = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -242,26 +249,26 @@ class KMeansOp(HasStrictTraits):
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                     
                     
-        kmeans = {}
-        for group, data_subset in groupby:
+        group_data = []
+        for group, group_idx in groups:
+            group_idx = self._subsample(group_idx, strata = strata)
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
             
             # drop data that isn't in the scale range
             for c in self.channels:
                 x = x[~(np.isnan(x[c]))]
             x = x.values
             
-            kmeans[group] = k = \
-                sklearn.cluster.MiniBatchKMeans(n_clusters = self.num_clusters,
-                                                random_state = 0)
+            group_data.append((group, (x, self.num_clusters)))
             
-            k.fit(x)
+        kmeans = util.map_groups(_fit_kmeans, group_data, workers = self.workers)
             
         # do this so the UI can pick up that the estimate changed
         self._kmeans = kmeans                       
@@ -333,23 +340,20 @@ class KMeansOp(HasStrictTraits):
                                            .format(b, experiment.conditions))
         
                  
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groups = experiment.group_index(self.by)
                  
         event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
          
         # make the statistics       
         clusters = [x + 1 for x in range(self.num_clusters)]
           
-        idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by] + [clusters] + [self.channels], 
-                                         names = list(self.by) + ["Cluster"] + ["Channel"])
-        centers_stat = pd.Series(index = idx, dtype = np.dtype(object)).sort_index()
+        idx = experiment.statistic_index(self.by, 
+                                         Cluster = clusters, 
+                                         Channel = self.channels)
+        centers = np.full(len(idx), np.nan)
                      
-        for group, data_subset in groupby:
+        for group, group_idx in groups:
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
@@ -363,7 +367,7 @@ class KMeansOp(HasStrictTraits):
             
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
                  
             # which values are missing?
  
@@ -373,7 +377,6 @@ class KMeansOp(HasStrictTraits):
                          
             x = x.values
             x_na = x_na.values
-            group_idx = groupby.groups[group]
             
             kmeans = self._kmeans[group]
   
@@ -398,12 +401,12 @@ class KMeansOp(HasStrictTraits):
                 
                 for cidx1, channel1 in enumerate(self.channels):
                     g2 = tuple(list(g) + [channel1])
-                    centers_stat.loc[g2] = self._scale[channel1].inverse(kmeans.cluster_centers_[c, cidx1])
+                    centers[idx.get_loc(g2)] = self._scale[channel1].inverse(kmeans.cluster_centers_[c, cidx1])
          
         new_experiment = experiment.clone(deep = False)          
         new_experiment.add_condition(self.name, "category", event_assignments)
         
-        new_experiment.statistics[(self.name, "centers")] = pd.to_numeric(centers_stat)
+        new_experiment.statistics[(self.name, "centers")] = pd.Series(centers, index = idx)
  
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
@@ -459,6 +462,13 @@ class KMeansOp(HasStrictTraits):
                                          "Can't specify more than two channels for a default view")
     
 
+def _fit_kmeans(x, num_clusters):
+    """Fit one group's model.  Module-level so it can run in a process pool."""
+    k = sklearn.cluster.MiniBatchKMeans(n_clusters = num_clusters,
+                                        random_state = 0)
+    k.fit(x)
+    return k
+    
 @provides(IView)
 class KMeans1DView(By1DView, AnnotatingView, HistogramView):
     """
@@ -594,6 +604,8 @@ class KMeans2DView(By2DView, AnnotatingView, ScatterplotView):
             
             axes.plot(x, y, '*', color = 'blue')
 
+util.expand_class_attributes(KMeansOp)
+
 util.expand_class_attributes(KMeans1DView)
 util.expand_method_parameters(KMeans1DView, KMeans1DView.plot)
 
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.operations.multi_stat
+------------------------------
+
+Creates several statistics at once.  `multi_stat` has one class:
+
+`MultiStatisticOp` -- applies several functions to several channels, 
+grouping the data only once, and adds a statistic for each (channel, 
+function) pair to the `Experiment`.
+"""
+
+from warnings import warn
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+from traits.api import (HasStrictTraits, Str, List, Constant, provides, 
+                        Callable, Any)
+
+import cytoflow.utility as util
+
+from .i_operation import IOperation
+from .channel_stat import _statistic
+
+@provides(IOperation)
+class MultiStatisticOp(HasStrictTraits):
+    """
+    Apply several functions to several channels, and add a statistic for 
+    each (channel, function) pair to the experiment.
+    
+    The result is the same as a `ChannelStatisticOp` for each pair, but 
+    the data is only grouped (and subset) once, and the functions that
+    `ChannelStatisticOp` computes for every group in one pass (`len`, 
+    `numpy.mean`, `geom_mean`, quantiles made with `util.quantile 
+    <cytoflow.utility.reducers.quantile>`, etc.) share the work they have 
+    in common for each channel.
+    
+    Attributes
+    ----------
+    name : Str
+        The operation name.  Becomes the first element in the
+        `Experiment.statistics` key tuples.
+    
+    channels : List(Str)
+        The channels to apply the functions to.
+        
+    functions : List(Callable)
+        The functions used to compute the statistics.  Each is applied to 
+        each channel in `channels`, the same way as 
+        `ChannelStatisticOp.function`.  The second element in each 
+        statistic's `Experiment.statistics` key tuple is 
+        ``<channel>_<function name>``.
+        
+    by : List(Str)
+        A list of metadata attributes to aggregate the data before applying 
+        the functions.  
+        
+    subset : Str
+        A Python expression sent to `Experiment.query` to subset the 
+        data before computing the statistics.
+        
+    fill : Any (default = 0)
+        The value to use in the statistics if a slice of the data is empty.
+        
+    workers : Int (default = 1)
+        How many threads to use.  If greater than 1, the channels' 
+        statistics are computed in a thread pool.
+   
+    Examples
+    --------
+    
+    Make a little data set.
+    
+    >>> import cytoflow as flow
+    >>> import_op = flow.ImportOp()
+    >>> import_op.tubes = [flow.Tube(file = "Plate01/RFP_Well_A3.fcs",
+    ...                              conditions = {'Dox' : 10.0}),
+    ...                    flow.Tube(file = "Plate01/CFP_Well_A4.fcs",
+    ...                              conditions = {'Dox' : 1.0})]
+    >>> import_op.conditions = {'Dox' : 'float'}
+    >>> ex = import_op.apply()
+    
+    Create and parameterize the operation.
+    
+    >>> stats_op = flow.MultiStatisticOp(name = 'ByDox',
+    ...                                  channels = ['V2-A', 'Y2-A'],
+    ...                                  functions = [len, flow.geom_mean],
+    ...                                  by = ['Dox'])
+    >>> ex2 = stats_op.apply(ex)
+        
+    View the new statistics
+    
+    >>> print(ex2.statistics.keys())
+    dict_keys([('ByDox', 'V2-A_len'), ('ByDox', 'V2-A_geom_mean'), ('ByDox', 'Y2-A_len'), ('ByDox', 'Y2-A_geom_mean')])
+
+    >>> print(ex2.statistics[('ByDox', 'Y2-A_geom_mean')])
+    Dox
+    1.0      19.805601
+    10.0    446.981927
+    Name: ByDox : Y2-A_geom_mean, dtype: float64
+    """
+    
+    id = Constant('edu.mit.synbio.cytoflow.operations.multi_statistic')
+    friendly_id = Constant("Multiple Statistics")
+    
+    name = Str
+    channels = List(Str)
+    functions = List(Callable)
+    by = List(Str)
+    subset = Str
+    fill = Any(0)
+    workers = util.PositiveInt(1, allow_zero = False)
+    
+    def apply(self, experiment):
+        """
+        Apply the operation to an `Experiment`.
+        
+        Parameters
+        ----------
+        experiment
+            The `Experiment` to apply this operation to.
+            
+        Returns
+        -------
+        Experiment
+            A new `Experiment`, containing a new entry in 
+            `Experiment.statistics` for each (channel, function) pair.  The 
+            keys are tuples ``(name, <channel>_<function name>)``.
+        """
+        
+        if experiment is None:
+            raise util.CytoflowOpError('experiment', "Must specify an experiment")
+
+        if not self.name:
+            raise util.CytoflowOpError('name', "Must specify a name")
+        
+        if self.name != util.sanitize_identifier(self.name):
+            raise util.CytoflowOpError('name',
+                                       "Name can only contain letters, numbers and underscores.")  
+        
+        if not self.channels:
+            raise util.CytoflowOpError('channels', "Must specify some channels")
+        
+        for channel in self.channels:
+            if channel not in experiment.data:
+                raise util.CytoflowOpError('channels',
+                                           "Channel {0} not found in the experiment"
+                                           .format(channel))
+                
+        if len(set(self.channels)) != len(self.channels):
+            raise util.CytoflowOpError('channels', "Channels must be unique")
+
+        if not self.functions:
+            raise util.CytoflowOpError('functions', "Must specify some functions")
+            
+        if not self.by:
+            raise util.CytoflowOpError('by',
+                                       "Must specify some grouping conditions "
+                                       "in 'by'")
+            
+        stat_names = {}
+        for channel in self.channels:
+            for function in self.functions:
+                stat_name = (self.name, "{}_{}".format(channel, function.__name__))
+                
+                if stat_name in stat_names.values():
+                    raise util.CytoflowOpError('functions',
+                                               "More than one function is named {}"
+                                               .format(function.__name__))
+                
+                if stat_name in experiment.statistics:
+                    raise util.CytoflowOpError('name',
+                                               "{} is already in the experiment's statistics"
+                                               .format(stat_name))
+                    
+                stat_names[(channel, function)] = stat_name
+
+        new_experiment = experiment.clone(deep = False)
+        if self.subset:
+            try:
+                experiment = experiment.query(self.subset)
+            except Exception as exc:
+                raise util.CytoflowOpError('subset',
+                                           "Subset string '{0}' isn't valid"
+                                           .format(self.subset)) from exc
+                
+            if len(experiment) == 0:
+                raise util.CytoflowOpError('subset',
+                                           "Subset string '{0}' returned no events"
+                                           .format(self.subset))
+       
+        for b in self.by:
+            if b not in experiment.conditions:
+                raise util.CytoflowOpError('by',
+                                           "Aggregation metadata {} not found, "
+                                           "must be one of {}"
+                                           .format(b, experiment.conditions))
+
+        # the same index as ChannelStatisticOp's
+        idx = experiment.statistic_index(self.by)
+
+        for b in self.by:
+            if len(idx.unique(level = b)) == 1:
+                warn("Only one category for {}".format(b), util.CytoflowOpWarning)
+
+        groups = experiment.group_index(self.by)
+        
+        # where each group goes in the statistics
+        locs = idx.get_indexer(groups.keys)
+        
+        def channel_stats(channel):
+            """Each function's value for each group, for one channel."""
+            column = experiment.data[channel]
+            
+            all_values = util.group_reduce_all(self.functions, column.values, groups)
+            
+            for fi, function in enumerate(self.functions):
+                if all_values[fi] is not None:
+                    continue
+                
+                # call the function once per group
+                values = np.empty(len(groups), dtype = np.dtype(object))
+                for gi, (group, group_idx) in enumerate(groups):
+                    try:
+                        values[gi] = function(column.iloc[group_idx])
+                    except Exception as e:
+                        raise util.CytoflowOpError('functions',
+                                                   "Function {} threw an error on "
+                                                   "channel {} in group {}"
+                                                   .format(function.__name__, 
+                                                           channel, group)) from e
+                                                   
+                all_values[fi] = values
+                
+            return all_values
+                
+        if self.workers > 1 and len(self.channels) > 1:
+            with ThreadPoolExecutor(max_workers = self.workers) as executor:
+                channel_values = list(executor.map(channel_stats, self.channels))
+        else:
+            channel_values = [channel_stats(channel) for channel in self.channels]
+                                   
+        for channel, all_values in zip(self.channels, channel_values):
+            for function, values in zip(self.functions, all_values):
+                stat_name = stat_names[(channel, function)]
+                
+                # check for, and warn about, NaNs.
+                if values.dtype.kind == 'f':
+                    nan_groups = np.flatnonzero(np.isnan(values))
+                elif values.dtype.kind == 'O':
+                    nan_groups = [gi for gi, v in enumerate(values)
+                                  if pd.Series(v).isna().any()]
+                else:
+                    nan_groups = []
+
+                for gi in nan_groups:
+                    v = values[gi]
+                    group = groups.keys[gi]
+                    if not isinstance(group, tuple):
+                        group = (group,)
+
+                    warn("Found NaN in category {} returned {} for {}"
+                         .format(group, v, stat_name),
+                         util.CytoflowOpWarning)
+
+                new_experiment.statistics[stat_name] = \
+                    _statistic(idx, locs, values, self.fill,
+                               name = "{} : {}".format(stat_name[0], stat_name[1]))
+        
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        
+        return new_experiment
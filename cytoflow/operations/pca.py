@@ -38,9 +38,10 @@ import sklearn.decomposition
 
 import cytoflow.utility as util
 from .i_operation import IOperation
+from .base_estimate import StratifiedSubsampleOp
 
 @provides(IOperation)
-class PCAOp(HasStrictTraits):
+class PCAOp(StratifiedSubsampleOp):
     """
     Use principal components analysis (PCA) to decompose a multivariate data
     set into orthogonal components that explain a maximum amount of variance.
@@ -82,6 +83,11 @@ class PCAOp(HasStrictTraits):
     whiten : Bool (default = False)
         Scale each component to unit variance?  May be useful if you will
         be using unsupervized clustering (such as K-means).
+        
+    workers : Int (default = 1)
+        How many processes to use to fit the models.  If greater than 1, 
+        each group in `by` is fit in a process pool.  The result is the same
+        as fitting the groups one at a time.
 
     Examples
     --------
@@ -168,6 +174,10 @@ class PCAOp(HasStrictTraits):
     whiten = Bool(False)
     by = List(Str)
     
+    # how many processes to fit the groups' models with?
+    workers = util.PositiveInt(1, allow_zero = False)
+    
+    
     _pca = Dict(Any, Any, transient = True)
     _scale = Dict(Str, Instance(util.IScale), transient = True)
     
@@ -236,12 +246,9 @@ class PCAOp(HasStrictTraits):
                                            "Subset string '{0}' returned no events"
                                            .format(subset))
                 
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        strata = self._strata(experiment)
+                 
+        groups = experiment.group_index(self.by)
             
         # get the scale. estimate the scale params for the ENTIRE data set,
         # not subsets we get from groupby().  And we need to save it so that
@@ -252,29 +259,28 @@ class PCAOp(HasStrictTraits):
             else:
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                     
-        pca = {}
-        for group, data_subset in groupby:
+        group_data = []
+        for group, group_idx in groups:
+            group_idx = self._subsample(group_idx, strata = strata)
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
             
             # drop data that isn't in the scale range
             for c in self.channels:
                 x = x[~(np.isnan(x[c]))]
-             
-            pca[group] = \
-                sklearn.decomposition.PCA(n_components = self.num_components,
-                                          whiten = self.whiten,
-                                          random_state = 0)
-            
-            pca[group].fit(x)
-        
+
+            group_data.append((group, (x, self.num_components, self.whiten)))
+
+        pca = util.map_groups(_fit_pca, group_data, workers = self.workers)
+
         # set this atomically to support GUI
-        self._pca = pca                      
+        self._pca = pca
          
     def apply(self, experiment):
         """
@@ -331,15 +337,12 @@ class PCAOp(HasStrictTraits):
                                            "must be one of {}"
                                            .format(b, experiment.conditions))
                                  
-        if self.by:
-            groupby = experiment.data.groupby(self.by)
-        else:
-            # use a lambda expression to return a group that contains
-            # all the events
-            groupby = experiment.data.groupby(lambda _: True)
+        groups = experiment.group_index(self.by)
             
-        # need deep = True because of the data.dropna below
-        new_experiment = experiment.clone(deep = True)       
+        # a shallow clone is enough: the new channels are the only columns
+        # written to, and the data.dropna below replaces the clone's frame's 
+        # rows without touching the columns it shares with `experiment`
+        new_experiment = experiment.clone(deep = False)       
         new_channels = []   
         for i in range(self.num_components):
             cname = "{}_{}".format(self.name, i + 1)
@@ -351,14 +354,15 @@ class PCAOp(HasStrictTraits):
             new_experiment.add_channel(cname, pd.Series(index = experiment.data.index))
             new_channels.append(cname)            
                    
-        for group, data_subset in groupby:
+        for group, group_idx in groups:
+            data_subset = experiment.data.iloc[group_idx]
             if len(data_subset) == 0:
                 raise util.CytoflowOpError('by',
                                            "Group {} had no data"
                                            .format(group))
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
-                x[c] = self._scale[c](x[c])
+                x[c] = experiment.scaled(c, self._scale[c]).values[group_idx]
                  
             # which values are missing?
    
@@ -368,7 +372,6 @@ class PCAOp(HasStrictTraits):
             x_na = x_na.values
             x[x_na] = 0
             
-            group_idx = groupby.groups[group]
             
             pca = self._pca[group]
             x_tf = pca.transform(x)
@@ -382,3 +385,13 @@ class PCAOp(HasStrictTraits):
 
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
+    
+def _fit_pca(x, num_components, whiten):
+    """Fit one group's model.  Module-level so it can run in a process pool."""
+    pca = sklearn.decomposition.PCA(n_components = num_components,
+                                    whiten = whiten,
+                                    random_state = 0)
+    pca.fit(x)
+    return pca
+
+util.expand_class_attributes(PCAOp)
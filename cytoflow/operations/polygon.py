@@ -46,6 +46,7 @@ import cytoflow.utility as util
 from cytoflow.views import ISelectionView, ScatterplotView, DensityView
 
 from .i_operation import IOperation
+from .gate_set import GateFunction, evaluate_gates
 from .base_op_views import Op2DView
 
 @provides(IOperation)
@@ -199,6 +200,20 @@ class PolygonOp(HasStrictTraits):
             experiment. The reason is in the ``args`` attribute.
         """
         
+        gate = self._gate_function(experiment)
+        values, = evaluate_gates(experiment, [gate])
+        
+        new_experiment = experiment.clone(deep = False)
+        gate.add_condition(new_experiment, values)
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        return new_experiment
+    
+    def _gate_function(self, experiment):
+        """
+        Check the gate's parameters against ``experiment``, and return a
+        `GateFunction` that computes it.  `GateSetOp` uses this too.
+        """
+        
         if experiment is None:
             raise util.CytoflowOpError('experiment',
                                        "No experiment specified")
@@ -242,9 +257,9 @@ class PolygonOp(HasStrictTraits):
                                        "Must have at least 3 vertices")
        
         if any([len(x) != 2 for x in self.vertices]):
-            return util.CytoflowOpError('vertices',
-                                        "All vertices must be lists or tuples "
-                                        "of length = 2") 
+            raise util.CytoflowOpError('vertices',
+                                       "All vertices must be lists or tuples "
+                                       "of length = 2") 
             
         # there's a bit of a subtlety here: if the vertices were 
         # selected with an interactive plot, and that plot had scaled
@@ -258,23 +273,16 @@ class PolygonOp(HasStrictTraits):
         
         vertices = [(xscale(x), yscale(y)) for (x, y) in self.vertices]
         vertices.append(vertices[0])
-        data = experiment.data[[self.xchannel, self.ychannel]].copy()
-        data[self.xchannel] = xscale(data[self.xchannel])
-        data[self.ychannel] = yscale(data[self.ychannel])
         
         # use an extremely fast parallel algorithm to test polygon membership.
         # this function is better defined for edge cases than matplotlib's
         # path.contains_points.  and it's faster.
         # see https://stackoverflow.com/questions/36399381/whats-the-fastest-way-of-checking-if-a-point-is-inside-a-polygon-in-python
         # for a deep dive
-        xy_data = data[[self.xchannel, self.ychannel]].values
-        in_polygon = util.polygon_contains(xy_data, np.array(vertices))
-        
-        new_experiment = experiment.clone(deep = False)        
-        new_experiment.add_condition(self.name, "bool", in_polygon)
-        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
-            
-        return new_experiment
+        return GateFunction(self.name,
+                            [(self.xchannel, xscale), (self.ychannel, yscale)],
+                            lambda x, y, vertices = np.array(vertices): 
+                                util.polygon_contains(np.column_stack((x, y)), vertices))
     
     def default_view(self, **kwargs):
         """
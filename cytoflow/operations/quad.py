@@ -40,12 +40,12 @@ from matplotlib.lines import Line2D
 from matplotlib.widgets import Cursor
 
 import numpy as np
-import pandas as pd
 
 import cytoflow.utility as util
 from cytoflow.views import ISelectionView, ScatterplotView, DensityView
 
 from .i_operation import IOperation
+from .gate_set import GateFunction, evaluate_gates
 from .base_op_views import Op2DView
 
 
@@ -186,6 +186,20 @@ class QuadOp(HasStrictTraits):
         # Add some (generalizable??) way to rename these populations?  
         # It's an Enum; should be pretty easy.
         
+        gate = self._gate_function(experiment)
+        values, = evaluate_gates(experiment, [gate])
+        
+        new_experiment = experiment.clone(deep = False)
+        gate.add_condition(new_experiment, values)
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        return new_experiment
+    
+    def _gate_function(self, experiment):
+        """
+        Check the gate's parameters against ``experiment``, and return a
+        `GateFunction` that computes it.  `GateSetOp` uses this too.
+        """
+        
         if experiment is None:
             raise util.CytoflowOpError('experiment',
                                        "No experiment specified")
@@ -227,36 +241,26 @@ class QuadOp(HasStrictTraits):
         if self.ythreshold is None:
             raise util.CytoflowOpError('ythreshold', 'ythreshold must be set!')
 
-        gate = pd.Series([None] * len(experiment))
-        
-        # perhaps there's some more pythonic way to do this?
-        
         # these gate names match FACSDiva.  They are ARBITRARY.
-
-        # lower-left
-        ll = np.logical_and(experiment[self.xchannel] < self.xthreshold,
-                            experiment[self.ychannel] < self.ythreshold)
-        gate.loc[ll] = self.name + '_3'
-        
-        # upper-left
-        ul = np.logical_and(experiment[self.xchannel] < self.xthreshold,
-                            experiment[self.ychannel] > self.ythreshold)
-        gate.loc[ul] = self.name + '_1'
-
-        # upper-right
-        ur = np.logical_and(experiment[self.xchannel] > self.xthreshold,
-                            experiment[self.ychannel] > self.ythreshold)
-        gate.loc[ur] = self.name + '_2'
-        
-        # lower-right
-        lr = np.logical_and(experiment[self.xchannel] > self.xthreshold,
-                            experiment[self.ychannel] < self.ythreshold)
-        gate.loc[lr] = self.name + '_4'
-
-        new_experiment = experiment.clone(deep = False)
-        new_experiment.add_condition(self.name, "category", gate)
-        new_experiment.history.append(self.clone_traits(transient = lambda t: True))
-        return new_experiment
+        labels = [self.name + '_1',   # upper-left
+                  self.name + '_2',   # upper-right
+                  self.name + '_3',   # lower-left
+                  self.name + '_4']   # lower-right
+        
+        def gate(x, y, xthreshold = self.xthreshold, ythreshold = self.ythreshold):
+            # events on a threshold (or with a missing value) aren't in
+            # any quadrant
+            codes = np.full(len(x), -1, dtype = np.int8)
+            codes[(x < xthreshold) & (y > ythreshold)] = 0
+            codes[(x > xthreshold) & (y > ythreshold)] = 1
+            codes[(x < xthreshold) & (y < ythreshold)] = 2
+            codes[(x > xthreshold) & (y < ythreshold)] = 3
+            return codes
+        
+        return GateFunction(self.name,
+                            [(self.xchannel, None), (self.ychannel, None)],
+                            gate,
+                            labels = labels)
     
     def default_view(self, **kwargs):
         """
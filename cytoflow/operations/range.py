@@ -40,6 +40,7 @@ import cytoflow.utility as util
 from cytoflow.views import HistogramView, ISelectionView
 
 from .i_operation import IOperation
+from .gate_set import GateFunction, evaluate_gates
 from .base_op_views import Op1DView
 
 @provides(IOperation)
@@ -152,6 +153,20 @@ class RangeOp(HasStrictTraits):
             otherwise.
         """
 
+        gate = self._gate_function(experiment)
+        values, = evaluate_gates(experiment, [gate])
+        
+        new_experiment = experiment.clone(deep = False)
+        gate.add_condition(new_experiment, values)
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        return new_experiment
+    
+    def _gate_function(self, experiment):
+        """
+        Check the gate's parameters against ``experiment``, and return a
+        `GateFunction` that computes it.  `GateSetOp` uses this too.
+        """
+        
         if experiment is None:
             raise util.CytoflowOpError('experiment', "No experiment specified")
         
@@ -200,12 +215,9 @@ class RangeOp(HasStrictTraits):
                                        "range low must be < {0}"
                                        .format(experiment[self.channel].max()))
         
-        gate = experiment[self.channel].between(self.low, self.high)
-        new_experiment = experiment.clone(deep = False)
-        new_experiment.add_condition(self.name, "bool", gate)
-        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
-            
-        return new_experiment
+        return GateFunction(self.name,
+                            [(self.channel, None)],
+                            lambda x, low = self.low, high = self.high: (x >= low) & (x <= high))
     
     def default_view(self, **kwargs):
         self._selection_view = RangeSelection(op = self)
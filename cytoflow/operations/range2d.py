@@ -33,7 +33,6 @@ range and/or interactively set the thresholds on a scatterplot.
 range and/or interactively set the thresholds on a scatterplot.
 '''
 
-import pandas as pd
 
 from traits.api import HasStrictTraits, Float, Str, Bool, Instance, \
     provides, observe, Any, Constant, Dict
@@ -46,6 +45,7 @@ import cytoflow.utility as util
 from cytoflow.views import ScatterplotView, DensityView, ISelectionView
 
 from .i_operation import IOperation
+from .gate_set import GateFunction, evaluate_gates
 from .base_op_views import Op2DView
 
 @provides(IOperation)
@@ -182,6 +182,20 @@ class Range2DOp(HasStrictTraits):
             `yhigh`; it is ``False`` otherwise.
         """
         
+        gate = self._gate_function(experiment)
+        values, = evaluate_gates(experiment, [gate])
+        
+        new_experiment = experiment.clone(deep = False)
+        gate.add_condition(new_experiment, values)
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        return new_experiment
+    
+    def _gate_function(self, experiment):
+        """
+        Check the gate's parameters against ``experiment``, and return a
+        `GateFunction` that computes it.  `GateSetOp` uses this too.
+        """
+        
         if experiment is None:
             raise util.CytoflowOpError('experiment',
                                        "No experiment specified")
@@ -253,14 +267,13 @@ class Range2DOp(HasStrictTraits):
                                        "y channel range low must be < {0}"
                                        .format(experiment[self.ychannel].max()))
         
-        x = experiment[self.xchannel].between(self.xlow, self.xhigh)
-        y = experiment[self.ychannel].between(self.ylow, self.yhigh)
-        gate = pd.Series(x & y)
+        def gate(x, y, xlow = self.xlow, xhigh = self.xhigh, 
+                 ylow = self.ylow, yhigh = self.yhigh):
+            return (x >= xlow) & (x <= xhigh) & (y >= ylow) & (y <= yhigh)
         
-        new_experiment = experiment.clone(deep = False) 
-        new_experiment.add_condition(self.name, "bool", gate)   
-        new_experiment.history.append(self.clone_traits(transient = lambda t: True))    
-        return new_experiment
+        return GateFunction(self.name,
+                            [(self.xchannel, None), (self.ychannel, None)],
+                            gate)
     
     def default_view(self, **kwargs):
         """
@@ -33,7 +33,6 @@ from traits.api import (HasStrictTraits, Float, Str, Instance,
                         Bool, observe, provides, Any, Dict,
                         Constant)
     
-import pandas as pd
 
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
@@ -43,6 +42,7 @@ import cytoflow.utility as util
 from cytoflow.views import ISelectionView, HistogramView
 
 from .i_operation import IOperation
+from .gate_set import GateFunction, evaluate_gates
 from .base_op_views import Op1DView
 
 @provides(IOperation)
@@ -149,6 +149,20 @@ class ThresholdOp(HasStrictTraits):
             it is ``False`` otherwise.
         """
         
+        gate = self._gate_function(experiment)
+        values, = evaluate_gates(experiment, [gate])
+        
+        new_experiment = experiment.clone(deep = False)
+        gate.add_condition(new_experiment, values)
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+        return new_experiment
+    
+    def _gate_function(self, experiment):
+        """
+        Check the gate's parameters against ``experiment``, and return a
+        `GateFunction` that computes it.  `GateSetOp` uses this too.
+        """
+        
         if experiment is None:
             raise util.CytoflowOpError('experiment', "No experiment specified")
         
@@ -178,12 +192,9 @@ class ThresholdOp(HasStrictTraits):
             raise util.CytoflowOpError('threshold',
                                        "must set 'threshold'")
 
-        gate = pd.Series(experiment[self.channel] > self.threshold)
-
-        new_experiment = experiment.clone(deep = False)
-        new_experiment.add_condition(self.name, "bool", gate)
-        new_experiment.history.append(self.clone_traits(transient = lambda t: True))
-        return new_experiment
+        return GateFunction(self.name, 
+                            [(self.channel, None)],
+                            lambda x, threshold = self.threshold: x > threshold)
     
     def default_view(self, **kwargs):
         self._selection_view = ThresholdSelection(op = self)
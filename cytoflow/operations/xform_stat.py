@@ -36,6 +36,7 @@ from traits.api import (HasStrictTraits, Str, List, Constant, provides,
 import cytoflow.utility as util
 
 from .i_operation import IOperation
+from .channel_stat import _statistic
 
 @provides(IOperation)
 class TransformStatisticOp(HasStrictTraits):
@@ -66,9 +67,14 @@ class TransformStatisticOp(HasStrictTraits):
         take a `pandas.Series` as its only parameter.  The return type is 
         arbitrary, but to work with the rest of `cytoflow` it should 
         probably be a numeric type or an iterable of numeric types..  If 
-        `statistic_name` is unset, the name of the function becomes the 
+        `statistic_name` is unset, the name of the function becomes the
         second in element in the `Experiment.statistics` key tuple.
-        
+
+        If `by` is set, `function` is called once for each group.
+        Common statistics (`len`, `numpy.sum`, `numpy.mean`, `geom_mean`,
+        etc. -- see `cytoflow.utility.reducers`) are computed for every
+        group in one pass instead.
+
     statistic_name : Str
         The name of the function; if present, becomes the second element in
         the `Experiment.statistics` key tuple.
@@ -168,38 +174,56 @@ class TransformStatisticOp(HasStrictTraits):
                                            " must be one of {}"
                                            .format(b, stat.index.names))
                 
-        data = stat.reset_index()
-                
         if self.by:
-            idx = pd.MultiIndex.from_product([data[x].unique() for x in self.by], 
+            # group the statistic's rows (not every row -- each group once)
+            groups = util.GroupIndex(stat.index.to_frame(index = False), self.by)
+            
+            keys = [k if isinstance(k, tuple) else (k,) for k in groups.keys]
+            idx = pd.MultiIndex.from_product([stat.index.unique(level = x) for x in self.by], 
                                              names = self.by)
-        else:
-            idx = stat.index.copy()
-                    
-        new_stat = pd.Series(data = self.fill,
-                             index = idx, 
-                             dtype = np.dtype(object)).sort_index()
-                    
-        if self.by:                         
-            for group in data[self.by].itertuples(index = False, name = None):                
-                if isinstance(stat.index, pd.MultiIndex):
-                    s = stat.xs(group, level = self.by, drop_level = False)
-                else:
-                    s = stat.loc[list(group)]
-                                    
-                if len(s) == 0:
-                    continue
-    
-                try:
-                    new_stat[group] = self.function(s)
-                except Exception as e:
-                    raise util.CytoflowOpError('function',
-                                               "Your function threw an error in group {}".format(group)) from e
-                                        
-                # check for, and warn about, NaNs.
-                if np.any(np.isnan(new_stat.loc[group])):
-                    warn("Category {} returned {}".format(group, new_stat.loc[group]), 
+            idx = pd.Series(index = idx, dtype = np.dtype(object)).sort_index().index
+            
+            # common functions (len, np.mean, geom_mean, ...) are computed 
+            # for all the groups at once
+            values = util.group_reduce(self.function, stat.values, groups)
+            
+            # if the function returns a series with the same index that it 
+            # was passed, it's a transformation
+            transformed = False
+            
+            if values is not None:
+                for i in np.flatnonzero(np.isnan(values)):
+                    warn("Category {} returned {}".format(keys[i], values[i]), 
                          util.CytoflowOpWarning)
+            else:
+                values = np.empty(len(groups), dtype = np.dtype(object))
+                transformed = len(groups) > 0
+                for i, (_, group_idx) in enumerate(groups):
+                    group = keys[i]
+                    s = stat.iloc[group_idx]
+        
+                    try:
+                        v = self.function(s)
+                    except Exception as e:
+                        raise util.CytoflowOpError('function',
+                                                   "Your function threw an error in group {}".format(group)) from e
+                                                   
+                    values[i] = v
+                    transformed = transformed and isinstance(v, pd.Series) and \
+                                  (v.index is s.index or v.index.equals(s.index))
+                                            
+                    # check for, and warn about, NaNs.
+                    if np.any(pd.isna(v)):
+                        warn("Category {} returned {}".format(group, v), 
+                             util.CytoflowOpWarning)
+                        
+            if transformed:
+                # put the pieces back together
+                new_stat = pd.Series(np.concatenate([np.asarray(v) for v in values]),
+                                     index = stat.index[groups.order])
+            else:
+                new_stat = _statistic(idx, idx.get_indexer(keys), values, self.fill,
+                                      name = None)
                     
         else:
             new_stat = self.function(stat)
@@ -211,23 +235,6 @@ class TransformStatisticOp(HasStrictTraits):
                                            .format(self.function))
                 
         new_stat.name = "{} : {}".format(stat_name[0], stat_name[1])
-                                                    
-        matched_series = True
-        for group in data[self.by].itertuples(index = False, name = None):
-            if isinstance(stat.index, pd.MultiIndex):
-                s = stat.xs(group, level = self.by, drop_level = False)
-            else:
-                s = stat.loc[list(group)]
-
-            if isinstance(new_stat.loc[group], pd.Series) and \
-                s.index.equals(new_stat.loc[group].index):
-                pass
-            else:
-                matched_series = False
-                break
-            
-        if matched_series and len(self.by) > 0:
-            new_stat = pd.concat(new_stat.values)
             
         # try to convert to numeric, but if there are non-numeric bits ignore
         new_stat = pd.to_numeric(new_stat, errors = 'ignore')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+
+import cytoflow.utility as util
+from cytoflow.utility.algorithms import bootstrap
+
+class TestBootstrap(unittest.TestCase):
+
+    def setUp(self):
+        self.x = np.random.default_rng(1).lognormal(3, 1, size = 1000)
+
+    def testReproducible(self):
+        b1 = bootstrap(self.x, func = np.mean, n_boot = 500, random_seed = 2)
+        b2 = bootstrap(self.x, func = np.mean, n_boot = 500, random_seed = 2)
+        np.testing.assert_array_equal(b1, b2)
+        self.assertEqual(b1.shape, (500,))
+        
+        b3 = bootstrap(self.x, func = np.mean, n_boot = 500, random_seed = 3)
+        self.assertFalse(np.array_equal(b1, b3))
+
+    def testVectorized(self):
+        # np.median is computed for a chunk of resamples at once; the lambda 
+        # is called on each resample.  the resamples are the same, no matter
+        # the chunk size or how many threads there are.
+        from cytoflow.utility import algorithms
+        chunk_size = algorithms._BOOTSTRAP_CHUNK_SIZE
+        algorithms._BOOTSTRAP_CHUNK_SIZE = 100 * len(self.x)
+        try:
+            vectorized = bootstrap(self.x, func = np.median, n_boot = 1000, 
+                                   random_seed = 2, workers = 3)
+            per_sample = bootstrap(self.x, func = lambda a: np.median(a), 
+                                   n_boot = 1000, random_seed = 2)
+        finally:
+            algorithms._BOOTSTRAP_CHUNK_SIZE = chunk_size
+            
+        np.testing.assert_allclose(vectorized, per_sample, rtol = 1e-12)
+
+    def testMultipleArrays(self):
+        y = self.x * 2 + 1
+        b = bootstrap(self.x, y, func = lambda a, b: np.mean(b - 2 * a), 
+                      n_boot = 100, random_seed = 2)
+        np.testing.assert_allclose(b, 1.0)
+        
+    def testCI(self):
+        lo, hi = util.ci(self.x, util.geom_mean, boots = 1000, random_seed = 2)
+        self.assertLess(lo, util.geom_mean(self.x))
+        self.assertGreater(hi, util.geom_mean(self.x))
+        self.assertEqual((lo, hi), 
+                         util.ci(self.x, util.geom_mean, boots = 1000, 
+                                 random_seed = 2, workers = 2))
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestBootstrap.testVectorized']
+    unittest.main()
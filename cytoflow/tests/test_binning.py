@@ -53,6 +53,24 @@ class Test(ClosePlotsWhenDoneTest):
         
         self.assertIsInstance(ex2.data.index, pd.RangeIndex)
         
+    def testBinCount(self):
+        op = flow.BinningOp(name = "Bin",
+                            channel = "PE-Tx-Red-YG-A",
+                            bin_width = 0.1,
+                            scale = "log",
+                            bin_count_name = "Bin_Count")
+        ex2 = op.apply(self.ex)
+        
+        counts = ex2.data.groupby("Bin").size()
+        stat = ex2.statistics[("Bin", "count")]
+        self.assertEqual(stat.sum(), len(ex2))
+        pd.testing.assert_series_equal(stat[stat > 0], counts, 
+                                       check_names = False)
+        
+        pd.testing.assert_series_equal(ex2["Bin_Count"], 
+                                       ex2["Bin"].map(counts),
+                                       check_names = False)
+        
     def testView(self):
         """Just run default_view().plot(); don't actually test functionality"""
                                  
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+from .test_base import ImportedDataSmallTest
+
+class TestBitMaskArray(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+
+        # not a multiple of 8, to exercise the padding bits
+        self.a = rng.random(1003) < 0.3
+        self.b = rng.random(1003) < 0.6
+
+    def testRoundTrip(self):
+        x = util.BitMaskArray(self.a)
+        self.assertEqual(len(x), len(self.a))
+        self.assertEqual(x.nbytes, 126)
+        np.testing.assert_array_equal(x.to_bool(), self.a)
+        np.testing.assert_array_equal(np.asarray(x), self.a)
+        self.assertEqual(x[7], self.a[7])
+        self.assertEqual(x[-1], self.a[-1])
+        np.testing.assert_array_equal(x[10:20].to_bool(), self.a[10:20])
+
+    def testLogic(self):
+        x = util.BitMaskArray(self.a)
+        y = util.BitMaskArray(self.b)
+
+        np.testing.assert_array_equal((x & y).to_bool(), self.a & self.b)
+        np.testing.assert_array_equal((x | y).to_bool(), self.a | self.b)
+        np.testing.assert_array_equal((x ^ y).to_bool(), self.a ^ self.b)
+        np.testing.assert_array_equal((x & self.b).to_bool(), self.a & self.b)
+        np.testing.assert_array_equal((~x).to_bool(), ~self.a)
+        np.testing.assert_array_equal((x == y).to_bool(), self.a == self.b)
+        np.testing.assert_array_equal((x == True).to_bool(), self.a)
+
+    def testCount(self):
+        x = util.BitMaskArray(self.a)
+        self.assertEqual(x.count(), self.a.sum())
+        self.assertEqual((~x).count(), (~self.a).sum())
+        self.assertEqual(pd.Series(x).sum(), self.a.sum())
+        self.assertFalse(x.all())
+        self.assertTrue((x | ~x).all())
+        
+    def testUnique(self):
+        for a in [self.a, ~self.a, np.zeros(10, dtype = np.bool_), 
+                  np.ones(10, dtype = np.bool_), np.zeros(0, dtype = np.bool_)]:
+            x = util.BitMaskArray(a)
+            self.assertIsInstance(x.unique(), util.BitMaskArray)
+            self.assertEqual(list(x.unique()), list(pd.unique(a)))
+            
+        s = pd.Series(self.a).astype("bitmask")
+        self.assertEqual(list(s.unique()), list(pd.unique(self.a)))
+        
+    def testMean(self):
+        x = util.BitMaskArray(self.a)
+        self.assertAlmostEqual(pd.Series(x).mean(), self.a.mean())
+        
+        empty = util.BitMaskArray(np.zeros(0, dtype = np.bool_))
+        self.assertTrue(np.isnan(empty._reduce("mean")))
+        self.assertTrue(np.isnan(pd.Series(empty).mean()))
+
+    def testSeries(self):
+        s = pd.Series(self.a).astype("bitmask")
+        self.assertEqual(s.dtype.name, "bitmask")
+        self.assertEqual(s.memory_usage(index = False), 126)
+
+        t = pd.Series(self.b).astype("bitmask")
+        np.testing.assert_array_equal((s & t).values.to_bool(), self.a & self.b)
+        np.testing.assert_array_equal((~s).values.to_bool(), ~self.a)
+
+        df = pd.DataFrame({"x" : np.arange(len(self.a)), "g" : s})
+        np.testing.assert_array_equal(df[df["g"]]["x"], np.flatnonzero(self.a))
+        self.assertEqual(df.groupby("g").size()[True], self.a.sum())
+
+        df2 = pd.concat([df, df])
+        self.assertEqual(df2["g"].dtype.name, "bitmask")
+        self.assertEqual(df2["g"].sum(), 2 * self.a.sum())
+
+
+class TestBitMaskCondition(ImportedDataSmallTest):
+
+    def setUp(self):
+        super().setUp()
+        self.ex2 = flow.ThresholdOp(name = "Threshold",
+                                    channel = "Y2-A",
+                                    threshold = 500).apply(self.ex)
+
+    def testMetadata(self):
+        self.assertEqual(self.ex2.data["Threshold"].dtype.name, "bitmask")
+        self.assertEqual(self.ex2.metadata["Threshold"]["values_type"], "boolean")
+        self.assertEqual(self.ex2.metadata["Threshold"]["values"], [False, True])
+
+    def testSubset(self):
+        ex3 = flow.ThresholdOp(name = "T2",
+                               channel = "V2-A",
+                               threshold = 500).apply(self.ex2)
+        
+        self.assertEqual(len(ex3.subset(["Threshold", "T2"], (True, True))),
+                         len(ex3.query("Threshold and T2")))
+
+    def testQuery(self):
+        self.assertEqual(len(self.ex2.query("Threshold")), 4446)
+        self.assertEqual(len(self.ex2.query("Threshold == True")), 4446)
+        self.assertEqual(len(self.ex2.query("~Threshold")), len(self.ex2) - 4446)
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestBitMaskArray.testLogic']
+    unittest.main()
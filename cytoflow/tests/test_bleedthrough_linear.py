@@ -23,6 +23,7 @@ Created on Nov 16, 2015
 @author: brian
 '''
 import unittest
+import numpy as np
 import pandas as pd
 import cytoflow as flow
 from .test_base import ClosePlotsWhenDoneTest
@@ -53,6 +54,38 @@ class TestBleedthroughLinear(ClosePlotsWhenDoneTest):
         self.assertAlmostEqual(self.op.spillover[('PE-Tx-Red-YG-A', 'Pacific Blue-A')], 0.0007656573951714137, places = 3)
         self.assertAlmostEqual(self.op.spillover[('PE-Tx-Red-YG-A', 'FITC-A')], 0.0014315458081464413, places = 3)
 
+    def testEstimateWorkers(self):
+        spillover = self.op.spillover
+        self.op.workers = 2
+        self.op.estimate(self.ex)
+        self.assertEqual(self.op.spillover, spillover)
+        
+    def testEstimateRobust(self):
+        spillover = self.op.spillover
+        for regression in ["huber", "trimmed"]:
+            self.op.regression = regression
+            self.op.estimate(self.ex)
+            self.assertEqual(self.op.spillover.keys(), spillover.keys())
+            for k, v in spillover.items():
+                self.assertAlmostEqual(self.op.spillover[k], v, places = 2)
+                
+    def testFitSpillover(self):
+        from cytoflow.operations.bleedthrough_linear import _fit_spillover
+        
+        rng = np.random.default_rng(1)
+        x = rng.uniform(0, 1000, size = 10000)
+        y = np.outer(x, [0.01, 0.5]) + rng.normal(0, 1, size = (10000, 2))
+        
+        # a few outliers pull the least-squares fit, but not the robust ones
+        y[:200, 0] += 1000
+        
+        k = _fit_spillover(x, y, "least_squares")
+        self.assertGreater(k[0], 0.02)
+        self.assertAlmostEqual(k[1], 0.5, places = 3)
+        for regression in ["huber", "trimmed"]:
+            k = _fit_spillover(x, y, regression)
+            np.testing.assert_allclose(k, [0.01, 0.5], atol = 1e-3)
+
     def testApply(self):
         ex2 = self.op.apply(self.ex)
         
@@ -62,6 +95,27 @@ class TestBleedthroughLinear(ClosePlotsWhenDoneTest):
             pd.testing.assert_frame_equal(self.ex.data, ex2.data)
             
         self.assertIsInstance(ex2.data.index, pd.RangeIndex)
+        
+    def testApplyChunks(self):
+        from cytoflow.operations import bleedthrough_linear
+        
+        ex2 = self.op.apply(self.ex)
+        
+        # a chunk size that doesn't divide the number of events
+        chunk_size = bleedthrough_linear._COMPENSATE_CHUNK_SIZE
+        bleedthrough_linear._COMPENSATE_CHUNK_SIZE = 1000
+        try:
+            ex3 = self.op.apply(self.ex)
+        finally:
+            bleedthrough_linear._COMPENSATE_CHUNK_SIZE = chunk_size
+        
+        pd.testing.assert_frame_equal(ex2.data, ex3.data)
+        
+        # the same as correcting each event with bleedthrough_fn
+        channels = ex2.metadata['FITC-A']['bleedthrough_channels']
+        fn = ex2.metadata['FITC-A']['bleedthrough_fn']
+        np.testing.assert_allclose(ex2.data[channels].values,
+                                   fn(self.ex.data[channels].values))
             
     def testApplyDoesntAlterOriginal(self):
         ex_data_copy = self.ex.data.copy(deep = True)
@@ -26,6 +26,7 @@ Created on Dec 1, 2015
 import unittest
 
 import cytoflow as flow
+import numpy as np
 import pandas as pd
 import cytoflow.utility as util
 from .test_base import ImportedDataSmallTest
@@ -69,6 +70,29 @@ class TestChannelStats(ImportedDataSmallTest):
                          type(ex2.statistics[('ByDox', 'geom_sd_range')].iloc[0]))
                              
         
+    def testVectorized(self):
+        # the vectorized statistics are the same as calling the function
+        # on each group
+        for fn in [len, np.mean, np.median, flow.geom_mean, flow.geom_sd, 
+                   util.quantile(0.1)]:
+            ex1 = flow.ChannelStatisticOp(name = "ByDox",
+                                          by = ['Dox', 'T'],
+                                          channel = "Y2-A",
+                                          function = fn).apply(self.ex)
+                                          
+            ex2 = flow.ChannelStatisticOp(name = "ByDox",
+                                          by = ['Dox', 'T'],
+                                          channel = "Y2-A",
+                                          function = lambda x: fn(x),
+                                          statistic_name = fn.__name__).apply(self.ex)
+                                          
+            stat1 = ex1.statistics[("ByDox", fn.__name__)]
+            stat2 = ex2.statistics[("ByDox", fn.__name__)]
+            
+            self.assertTrue(stat1.index.equals(stat2.index))
+            self.assertEqual(stat1.dtype, stat2.dtype)
+            np.testing.assert_allclose(stat1, stat2, rtol = 1e-12)
+        
     def testSubset(self):
         ex = flow.ChannelStatisticOp(name = "ByDox",
                                      by = ['T'],
@@ -82,6 +106,21 @@ class TestChannelStats(ImportedDataSmallTest):
         self.assertEqual(stat.loc[False], 5601)
         self.assertEqual(stat.loc[True], 4399)
         
+    def testEmptyGroup(self):
+        self.ex.add_condition("High", "bool", self.ex["Dox"] > 1)
+        op = flow.ChannelStatisticOp(name = "ByDox",
+                                     by = ['Dox', 'High'],
+                                     channel = "Y2-A",
+                                     function = len,
+                                     fill = 0)
+        
+        with self.assertWarnsRegex(util.CytoflowOpWarning, "had no data"):
+            ex = op.apply(self.ex)
+            
+        stat = ex.statistics[("ByDox", "len")]
+        self.assertEqual(stat.loc[1.0, True], 0)
+        self.assertEqual(stat.loc[10.0, False], 0)
+        
     def testBadFunction(self):
         
         op = flow.ChannelStatisticOp(name = "ByDox",
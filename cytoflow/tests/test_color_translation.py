@@ -53,6 +53,15 @@ class Test(unittest.TestCase):
             
         self.assertIsInstance(ex2.data.index, pd.RangeIndex)
     
+    def test_estimate_events(self):
+        coeffs = dict(self.op._coefficients)
+        self.op.estimate_events = 2000
+        self.op.estimate(self.ex)
+        
+        # a subset of the control gives about the same translation
+        for k, v in coeffs.items():
+            self.assertAlmostEqual(self.op._coefficients[k][0], v[0], delta = 0.1)
+    
     def test_plot(self):
         self.op.default_view().plot(self.ex)
         
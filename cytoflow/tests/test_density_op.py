@@ -76,6 +76,19 @@ class TestDensityGate(ImportedDataSmallTest):
         self.assertAlmostEqual(ex2.data.groupby(["Dox", "D"]).size().loc[10.0, True], 8141)
  
     
+    def testApplyBins(self):
+        self.gate.bins = 200
+        self.gate.keep = 0.9
+        self.gate.estimate(self.ex)
+        ex2 = self.gate.apply(self.ex)
+        
+        # the same events as checking each event's bins against the kept bins
+        cX = pd.cut(self.ex["V2-A"], self.gate._xbins, include_lowest = True, labels = False)
+        cY = pd.cut(self.ex["Y2-A"], self.gate._ybins, include_lowest = True, labels = False)
+        kept = set(zip(self.gate._keep_xbins[True], self.gate._keep_ybins[True]))
+        expected = [(x, y) in kept for x, y in zip(cX, cY)]
+        self.assertEqual(list(ex2["D"]), expected)
+        
     def testPlot(self):
         self.gate.estimate(self.ex)
         self.gate.default_view().plot(self.ex)
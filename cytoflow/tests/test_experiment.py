@@ -22,9 +22,12 @@ Created on Dec 1, 2015
 
 @author: brian
 '''
-import unittest
+import unittest, pickle
+import cytoflow as flow
 from cytoflow import utility as util
+import numpy as np
 import pandas as pd
+from natsort import natsorted
 from .test_base import ImportedDataTest
 
 
@@ -48,6 +51,19 @@ class TestExperiment(ImportedDataTest):
         self.ex.add_condition('in_gate', 'bool', pd.Series([True] * len(self.ex)))
         self.assertEqual(len(self.ex.conditions), 4)
 
+    def testAddConditionValues(self):
+        # numbers are sorted the same way natsort sorts them, NaNs first
+        x = pd.Series(np.tile([3.0, np.nan, -1.0, 2.5, -0.0, np.inf, -np.inf, 10.0],
+                              len(self.ex) // 8 + 1)[:len(self.ex)])
+        self.ex.add_condition('x', 'float', x)
+        self.assertEqual(self.ex.metadata['x']['values'][1:], 
+                         natsorted(x.unique())[1:])
+        self.assertTrue(np.isnan(self.ex.metadata['x']['values'][0]))
+        
+        i = pd.Series(np.arange(len(self.ex)) % 7 - 3)
+        self.ex.add_condition('i', 'int', i)
+        self.assertEqual(self.ex.metadata['i']['values'], natsorted(i.unique()))
+        
     def testAddConflictingNameCondition(self):
         self.assertEqual(len(self.ex.conditions), 3)
         with self.assertRaises(util.CytoflowError):
@@ -77,12 +93,237 @@ class TestExperiment(ImportedDataTest):
         self.assertEqual(len(self.ex['Well'].unique()), 4)
         self.assertEqual(len(self.ex), len(ex2) + old_len)
         
+        
+    def testAddManyEvents(self):
+        ex2 = self.ex.subset(['Dox', 'Well'], (100.0, 'C'))
+        old_len = len(self.ex)
+        
+        for i in range(200):
+            self.ex.add_events(ex2.data[ex2.channels], {'Dox' : float(i), 
+                                                        'Well' : 'W{}'.format(i),
+                                                        'bucket' : 1})
+            
+        # the new events are pending until someone looks at the data
+        self.assertEqual(len(self.ex), len(ex2) * 200 + old_len)
+        self.assertEqual(len(self.ex.metadata['Well']['values']), 203)
+        
+        self.assertEqual(len(self.ex.data), len(ex2) * 200 + old_len)
+        self.assertEqual(len(self.ex['Well'].cat.categories), 203)
+        self.assertEqual(len(self.ex.data.query('Well == "W150"')), len(ex2))
+        self.assertTrue((self.ex.data[self.ex.channels].iloc[-len(ex2):].values ==
+                         ex2.data[ex2.channels].values).all())
     
     def testCloneIsShallow(self):
         ex2 = self.ex.clone(deep = False)
+        self.assertTrue(np.shares_memory(self.ex['B1-A'].values, 
+                                         ex2['B1-A'].values))
+        
+        # shared columns are read-only
+        self.assertNotEqual(self.ex['B1-A'].at[100], 100.0)
+        with self.assertRaises(ValueError):
+            ex2['B1-A'].values[100] = 100.0
         self.assertNotEqual(self.ex['B1-A'].at[100], 100.0)
-        ex2['B1-A'].at[100] = 100.0
-        self.assertEqual(self.ex['B1-A'].at[100], 100.0)
+        
+    def testCloneIsReadOnly(self):
+        ex2 = self.ex.clone(deep = False)
+        data = self.ex.data.copy()
+        
+        # writing to a shared column in place raises, in the clone and in
+        # the original, instead of changing the other one
+        for ex in [ex2, self.ex]:
+            with self.assertRaises(ValueError):
+                ex.data.loc[100, 'B1-A'] = 100.0
+            with self.assertRaises(ValueError):
+                ex.data.at[100, 'Y2-A'] = 100.0
+            with self.assertRaises(ValueError):
+                ex.data.iloc[100, 0] = 100.0
+            with self.assertRaises(ValueError):
+                ex.data.loc[100, 'Dox'] = 1.0
+            with self.assertRaises(ValueError):
+                ex.data.at[100, 'Well'] = 'A'
+                
+        pd.testing.assert_frame_equal(self.ex.data, data)
+        pd.testing.assert_frame_equal(ex2.data, data)
+        
+    def testCloneCopyOnWrite(self):
+        ex2 = self.ex.clone(deep = False)
+        columns = list(self.ex.data.columns)
+        
+        ex2['B1-A'] = pd.Series([100.0] * len(self.ex))
+        self.assertEqual(ex2['B1-A'].at[100], 100.0)
+        self.assertNotEqual(self.ex['B1-A'].at[100], 100.0)
+        self.assertEqual(list(ex2.data.columns), columns)
+        
+        # only the replaced column was copied
+        self.assertFalse(np.shares_memory(self.ex['B1-A'].values, 
+                                          ex2['B1-A'].values))
+        self.assertTrue(np.shares_memory(self.ex['Y2-A'].values, 
+                                         ex2['Y2-A'].values))
+        
+        # and the new column is writable
+        ex2['B1-A'].values[100] = 50.0
+        self.assertEqual(ex2['B1-A'].at[100], 50.0)
+         
+    def testGroupIndex(self):
+        groups = self.ex.group_index(['Dox', 'Well'])
+        groupby = self.ex.data.groupby(['Dox', 'Well'])
+        
+        self.assertEqual(groups.keys, list(groupby.groups.keys()))
+        for group, group_idx in groups:
+            np.testing.assert_array_equal(group_idx, groupby.indices[group])
+            
+        # memoized, and shared with shallow clones
+        self.assertIs(self.ex.group_index(['Dox', 'Well']), groups)
+        ex2 = self.ex.clone(deep = False)
+        ex2.add_condition('Foo', 'int', pd.Series([1] * len(self.ex)))
+        self.assertIs(ex2.group_index(['Dox', 'Well']), groups)
+        
+        # replacing one of the conditions invalidates it
+        ex2['Dox'] = ex2['Dox'] * 2
+        self.assertIsNot(ex2.group_index(['Dox', 'Well']), groups)
+        self.assertIs(self.ex.group_index(['Dox', 'Well']), groups)
+        
+        # and so does changing the events
+        ex3 = self.ex.query('Dox > 1')
+        self.assertIsNot(ex3.group_index(['Dox', 'Well']), groups)
+        self.assertEqual(len(ex3.group_index(['Dox', 'Well'])), 
+                         len(ex3.data.groupby(['Dox', 'Well']).size()))
+        
+    def testGroupIndexCloneFirst(self):
+        # a shallow clone made before the groups were computed doesn't see
+        # them, and vice versa
+        ex2 = self.ex.clone(deep = False)
+        groups = self.ex.group_index(['Dox'])
+        self.assertIsNot(ex2.group_index(['Dox']), groups)
+
+        ex3 = self.ex.clone(deep = False)
+        groups = ex3.group_index(['Well'])
+        self.assertIsNot(self.ex.group_index(['Well']), groups)
+        
+    def testSiblingClonesSameCondition(self):
+        # two clones add different conditions with the same name
+        ex_lo = self.ex.clone(deep = False)
+        ex_lo.add_condition('T', 'bool', self.ex['Y2-A'] > 100)
+        ex_hi = self.ex.clone(deep = False)
+        ex_hi.add_condition('T', 'bool', self.ex['Y2-A'] > 1000)
+        
+        groups_lo = ex_lo.group_index(['T'])
+        groups_hi = ex_hi.group_index(['T'])
+        np.testing.assert_array_equal(groups_lo.counts,
+                                      ex_lo.data.groupby('T').size().values)
+        np.testing.assert_array_equal(groups_hi.counts,
+                                      ex_hi.data.groupby('T').size().values)
+        
+        self.assertEqual(ex_lo.statistic_index(['T', 'Dox']).names, ['T', 'Dox'])
+        ex_hi['T'] = self.ex['Y2-A'] > 10000
+        np.testing.assert_array_equal(ex_hi.group_index(['T']).counts,
+                                      ex_hi.data.groupby('T').size().values)
+        np.testing.assert_array_equal(ex_lo.group_index(['T']).counts,
+                                      ex_lo.data.groupby('T').size().values)
+
+    def testStatisticIndex(self):
+        idx = self.ex.statistic_index(['Dox'])
+        self.assertEqual(idx.name, 'Dox')
+        self.assertEqual(list(idx), sorted(self.ex['Dox'].unique()))
+
+        idx2 = self.ex.statistic_index(['Dox', 'Well'], Channel = ['Y2-A', 'B1-A'])
+        self.assertEqual(list(idx2.names), ['Dox', 'Well', 'Channel'])
+        self.assertEqual(len(idx2), len(self.ex['Dox'].unique()) * len(self.ex['Well'].unique()) * 2)
+        self.assertTrue(idx2.is_monotonic_increasing)
+
+        # memoized, and shared with shallow clones
+        self.assertIs(self.ex.statistic_index(['Dox']), idx)
+        ex2 = self.ex.clone(deep = False)
+        self.assertIs(ex2.statistic_index(['Dox', 'Well'], Channel = ['Y2-A', 'B1-A']), idx2)
+
+        # replacing one of the conditions invalidates it
+        ex2['Dox'] = ex2['Dox'] * 2
+        self.assertEqual(list(ex2.statistic_index(['Dox'])),
+                         sorted(ex2['Dox'].unique()))
+        self.assertIs(self.ex.statistic_index(['Dox']), idx)
+
+    def testCloneSharesStatistics(self):
+        stat = pd.Series([1.0, 2.0],
+                         index = pd.Index(['a', 'b'], name = 'Foo'))
+        self.ex.statistics[('Test', 'stat')] = stat
+
+        ex2 = self.ex.clone(deep = False)
+        stat2 = ex2.statistics[('Test', 'stat')]
+        self.assertIsNot(stat2, stat)
+        self.assertTrue(np.shares_memory(stat2.values, stat.values))
+
+        # the shared values are read-only
+        with self.assertRaises(ValueError):
+            stat2.values[0] = 100.0
+        self.assertEqual(stat.iat[0], 1.0)
+
+        # but the clone's statistic can be replaced, or its index changed
+        ex2.statistics[('Test', 'stat')] = stat2 * 2
+        stat2.sort_index(ascending = False, inplace = True)
+        pd.testing.assert_series_equal(self.ex.statistics[('Test', 'stat')], stat)
+
+    def testPickle(self):
+        # a grouped operation fills the memos, which have weakrefs in them
+        ex2 = flow.ThresholdOp(name = "T",
+                               channel = "Y2-A",
+                               threshold = 500).apply(self.ex)
+        ex3 = flow.ChannelStatisticOp(name = "ByT",
+                                      channel = "Y2-A",
+                                      by = ["T", "Dox"],
+                                      function = len).apply(ex2)
+        ex2.scaled('Y2-A', util.scale_factory('logicle', ex2, channel = 'Y2-A'))
+        
+        for ex in [ex2, ex2.clone(), ex2.clone(deep = False), ex3]:
+            ex_copy = pickle.loads(pickle.dumps(ex))
+            pd.testing.assert_frame_equal(ex_copy.data, ex.data)
+            self.assertEqual(ex_copy.statistics.keys(), ex.statistics.keys())
+            
+            # and the memos are rebuilt after unpickling
+            groups = ex_copy.group_index(["T", "Dox"])
+            self.assertEqual(groups.keys, ex.group_index(["T", "Dox"]).keys)
+            
+    def testGroupIndexAll(self):
+        groups = self.ex.group_index([])
+        self.assertEqual(groups.keys, [True])
+        np.testing.assert_array_equal(groups.indices(True), 
+                                      np.arange(len(self.ex)))
+         
+    def testScaled(self):
+        scale = util.scale_factory('logicle', self.ex, channel = 'Y2-A')
+        
+        # the scale and the scaled column are memoized ...
+        self.assertIs(util.scale_factory('logicle', self.ex, channel = 'Y2-A'), scale)
+        scaled = self.ex.scaled('Y2-A', scale)
+        pd.testing.assert_series_equal(scaled, scale(self.ex['Y2-A']))
+        self.assertFalse(scaled.values.flags.writeable)
+        self.assertTrue(np.shares_memory(self.ex.scaled('Y2-A', scale).values, 
+                                         scaled.values))
+        
+        # ... and shared with shallow clones
+        ex2 = self.ex.clone(deep = False)
+        self.assertIs(util.scale_factory('logicle', ex2, channel = 'Y2-A'), scale)
+        self.assertTrue(np.shares_memory(ex2.scaled('Y2-A', scale).values, 
+                                         scaled.values))
+        
+        # replacing the column invalidates both
+        ex2['Y2-A'] = ex2['Y2-A'] * 2
+        self.assertIsNot(util.scale_factory('logicle', ex2, channel = 'Y2-A'), scale)
+        pd.testing.assert_series_equal(ex2.scaled('Y2-A', scale), scale(ex2['Y2-A']))
+        self.assertTrue(np.shares_memory(self.ex.scaled('Y2-A', scale).values, 
+                                         scaled.values))
+
+    def testScaledCacheSize(self):
+        scale = util.scale_factory('logicle', self.ex, channel = 'Y2-A')
+        scaled = self.ex.scaled('Y2-A', scale)
+        
+        # only room for one column
+        util.set_scale_cache_size(scaled.values.nbytes)
+        try:
+            self.ex.scaled('B1-A', util.scale_factory('logicle', self.ex, channel = 'B1-A'))
+            self.assertFalse(np.shares_memory(self.ex.scaled('Y2-A', scale).values, 
+                                              scaled.values))
+        finally:
+            util.set_scale_cache_size(2 ** 30)
          
     def testReplaceColumn(self):
         # clone self.ex; replace column B1-A with [100.0] * len(self.ex) in clone;
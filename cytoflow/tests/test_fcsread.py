@@ -0,0 +1,136 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest, os, tempfile, warnings
+
+import numpy as np
+from fcsparser import fcsparser
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+class TestFCSRead(unittest.TestCase):
+    
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__)) + "/data/"
+        
+    def assertSameAsFcsparser(self, filename, **kwargs):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            meta1, data1 = fcsparser.parse(filename, **kwargs)
+            meta2, data2 = util.read_fcs(filename, 
+                                         name_metadata = kwargs.get("channel_naming", "$PnS"),
+                                         data_set = kwargs.get("data_set", 0))
+        
+        del meta1['__header__']
+        del meta2['__header__']
+        self.assertEqual(meta1, meta2)
+        
+        self.assertEqual(list(data1.columns), list(data2.keys()))
+        for c in data1:
+            np.testing.assert_array_equal(data1[c].values, data2[c].astype("float32"))
+        
+    def testFloat(self):
+        self.assertSameAsFcsparser(self.cwd + "Plate01/RFP_Well_A3.fcs")
+        self.assertSameAsFcsparser(self.cwd + "Plate01/RFP_Well_A3.fcs", 
+                                   channel_naming = "$PnN")
+        
+    def testInt(self):
+        self.assertSameAsFcsparser(self.cwd + "instruments/Accuri - C6.fcs")
+        
+    def testDataSet(self):
+        self.assertSameAsFcsparser(self.cwd + "instruments/Beckman Coulter - Gallios.LMD",
+                                   data_set = 1)
+        
+    def testChannels(self):
+        meta, data = util.read_fcs(self.cwd + "Plate01/RFP_Well_A3.fcs", 
+                                   channels = ["Y2-A", "B1-A"])
+        self.assertEqual(list(data.keys()), ["Y2-A", "B1-A"])
+        self.assertEqual(len(data["Y2-A"]), meta["$TOT"])
+        
+        # float channels are views into the memory-mapped file
+        self.assertIsInstance(data["Y2-A"].base, np.memmap)
+        
+        with self.assertRaises(util.CytoflowError):
+            util.read_fcs(self.cwd + "Plate01/RFP_Well_A3.fcs", 
+                          channels = ["Y2-B"])
+            
+    def testEvents(self):
+        filename = self.cwd + "instruments/Accuri - C6.fcs"
+        meta, data = util.read_fcs(filename)
+        _, subset = util.read_fcs(filename, events = 500, seed = 1)
+        
+        rows = np.random.default_rng(1).choice(meta["$TOT"], 500, replace = False)
+        for c in data:
+            np.testing.assert_array_equal(subset[c], data[c][rows])
+            
+        # asking for more events than there are returns all of them
+        _, subset = util.read_fcs(filename, events = meta["$TOT"] + 1, seed = 1)
+        for c in data:
+            np.testing.assert_array_equal(subset[c], data[c])
+            
+    def testRoundTrip(self):
+        data = np.random.default_rng(0).normal(size = (100, 3))
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "test.fcs")
+            util.write_fcs(filename, 
+                           ["A", "B", "C"], 
+                           {"A" : 1, "B" : 1, "C" : 1},
+                           data,
+                           compat_percent = False,
+                           compat_negative = False)
+            _, ret = util.read_fcs(filename, channels = ["C", "A"])
+            np.testing.assert_array_equal(ret["A"], data[:, 0].astype("float32"))
+            np.testing.assert_array_equal(ret["C"], data[:, 2].astype("float32"))
+            del ret
+            
+    def testUnsupported(self):
+        # 24-bit integers can't be memory-mapped
+        with self.assertRaises(util.FCSLayoutError):
+            util.read_fcs(self.cwd + "instruments/Cytek xP5.fcs")
+            
+        # ... so parse_tube falls back to fcsparser
+        _, data = flow.operations.import_op.parse_tube(self.cwd + "instruments/Cytek xP5.fcs")
+        self.assertGreater(len(data), 0)
+
+    def testBadKeywords(self):
+        with open(self.cwd + "instruments/Accuri - C6.fcs", "rb") as f:
+            raw = f.read()
+            
+        # same-length edits to the TEXT segment
+        for old, new in [(b"$P1R/16777216/", b"$P1R/00000000/"),
+                         (b"$P1R/16777216/", b"$P1X/16777216/"),
+                         (b"$P1B/32/", b"$P1B/* /")]:
+            with tempfile.TemporaryDirectory() as path:
+                filename = os.path.join(path, "test.fcs")
+                with open(filename, "wb") as f:
+                    f.write(raw.replace(old, new, 1))
+                    
+                with self.assertRaises(util.CytoflowError):
+                    util.read_fcs(filename)
+                    
+                # a corrupt file isn't an unsupported layout, so parse_tube
+                # raises read_fcs's error instead of falling back to fcsparser
+                with self.assertRaises(util.CytoflowError) as cm:
+                    flow.operations.import_op.parse_tube(filename)
+                self.assertIsInstance(cm.exception.__cause__, util.CytoflowError)
+                self.assertNotIsInstance(cm.exception.__cause__, util.FCSLayoutError)
+
+if __name__ == "__main__":
+    unittest.main()
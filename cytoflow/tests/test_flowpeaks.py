@@ -23,8 +23,11 @@ Created on Dec 1, 2015
 @author: brian
 '''
 import unittest
-import cytoflow as flow
+import numpy as np
 import pandas as pd
+import scipy.stats
+
+import cytoflow as flow
 from .test_base import ImportedDataSmallTest
 
 
@@ -52,7 +55,40 @@ class TestFlowpeaks(ImportedDataSmallTest):
         
         ex2 = self.op.apply(self.ex)
         self.assertEqual(len(ex2['FP'].unique()), 2)
+        
+    def testWorkers(self):
+        self.op.by = ["Dox"]
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        # fitting the groups in parallel gives the same models
+        self.op.workers = 2
+        self.op.estimate(self.ex)
+        ex3 = self.op.apply(self.ex)
+        pd.testing.assert_series_equal(ex2['FP'], ex3['FP'])
 
+    def testDensity(self):
+        self.op.estimate(self.ex)
+        
+        density = self.op._density[True]
+        x = np.random.default_rng(0).uniform(0, 1, size = (100, 2))
+        covs = np.linalg.inv(density.precisions)
+        expected = np.sum([w * scipy.stats.multivariate_normal(mean = mu, cov = s).pdf(x)
+                           for w, mu, s in zip(density.weights, density.means, covs)],
+                          axis = 0)
+        np.testing.assert_allclose(density(x), expected)
+        self.assertTrue(np.isscalar(density(x[0])))
+        
+        # the gradient matches a finite difference, and is 0 at the peaks
+        eps = 1e-6
+        for i, e in enumerate(np.eye(2)):
+            np.testing.assert_allclose(density.gradient(x)[:, i],
+                                       (density(x + eps * e) - density(x - eps * e)) / (2 * eps),
+                                       rtol = 1e-4, atol = 1e-6)
+            
+        grad = density.gradient(np.array(self.op._peaks[True]))
+        np.testing.assert_allclose(grad, 0, atol = 1e-3)
+        
     def testPlot(self):
         self.op.estimate(self.ex)
         self.op.default_view().plot(self.ex)
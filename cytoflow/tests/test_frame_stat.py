@@ -62,6 +62,20 @@ class Test(ImportedDataSmallTest):
         self.assertEqual(stat.loc[False], 5601)
         self.assertEqual(stat.loc[True], 4399)
         
+    def testEmptyGroup(self):
+        self.ex.add_condition("High", "bool", self.ex["Dox"] > 1)
+        op = flow.FrameStatisticOp(name = "ByDox",
+                                   by = ['Dox', 'High'],
+                                   function = len,
+                                   fill = 0)
+        
+        with self.assertWarnsRegex(util.CytoflowOpWarning, "had no data"):
+            ex = op.apply(self.ex)
+            
+        stat = ex.statistics[("ByDox", "len")]
+        self.assertEqual(stat.loc[1.0, True], 0)
+        self.assertEqual(stat.loc[10.0, False], 0)
+        
     def testBadFunction(self):
         
         op = flow.FrameStatisticOp(name = "ByDox",
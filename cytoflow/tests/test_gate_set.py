@@ -0,0 +1,107 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+from cytoflow.operations import gate_set
+from .test_base import ImportedDataSmallTest
+
+class TestGateSet(ImportedDataSmallTest):
+
+    def setUp(self):
+        super().setUp()
+        self.gates = [flow.ThresholdOp(name = "T",
+                                       channel = "Y2-A",
+                                       threshold = 500),
+                      flow.RangeOp(name = "R",
+                                   channel = "V2-A",
+                                   low = 100,
+                                   high = 1000),
+                      flow.Range2DOp(name = "R2",
+                                     xchannel = "V2-A",
+                                     xlow = 100,
+                                     xhigh = 1000,
+                                     ychannel = "Y2-A",
+                                     ylow = 50,
+                                     yhigh = 5000),
+                      flow.QuadOp(name = "Q",
+                                  xchannel = "V2-A",
+                                  xthreshold = 216,
+                                  ychannel = "Y2-A",
+                                  ythreshold = 2144),
+                      flow.PolygonOp(name = "P",
+                                     xchannel = "V2-A",
+                                     xscale = "log",
+                                     ychannel = "Y2-A",
+                                     yscale = "logicle",
+                                     vertices = [(10, 10), (1000, 100), 
+                                                 (1000, 10000), (50, 5000)])]
+        self.op = flow.GateSetOp(gates = self.gates)
+
+    def testApply(self):
+        ex2 = self.op.apply(self.ex)
+        
+        # the same as applying the gates one at a time
+        for gate in self.gates:
+            ex3 = gate.apply(self.ex)
+            pd.testing.assert_series_equal(ex2[gate.name], ex3[gate.name])
+            self.assertEqual(ex2.metadata[gate.name], ex3.metadata[gate.name])
+            
+        self.assertEqual(ex2.data["T"].dtype.name, "bitmask")
+        self.assertEqual(ex2.data["Q"].dtype.name, "category")
+        self.assertEqual(len(ex2.history), len(self.ex.history) + 1)
+        
+    def testChunks(self):
+        ex2 = self.op.apply(self.ex)
+        
+        chunk_size = gate_set._CHUNK_SIZE
+        gate_set._CHUNK_SIZE = 1000
+        try:
+            ex3 = self.op.apply(self.ex)
+        finally:
+            gate_set._CHUNK_SIZE = chunk_size
+            
+        pd.testing.assert_frame_equal(ex2.data, ex3.data)
+        
+    def testBadGates(self):
+        with self.assertRaises(util.CytoflowOpError):
+            flow.GateSetOp().apply(self.ex)
+            
+        self.gates[1].name = "T"
+        with self.assertRaises(util.CytoflowOpError):
+            self.op.apply(self.ex)
+        
+        self.gates[1].name = "R"
+        self.gates[0].channel = "FSC"
+        with self.assertRaises(util.CytoflowOpError) as cm:
+            self.op.apply(self.ex)
+        self.assertEqual(cm.exception.args[0], 'gates')
+        
+        self.op.gates = [flow.RatioOp(name = "Ratio")]
+        with self.assertRaises(util.CytoflowOpError):
+            self.op.apply(self.ex)
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestGateSet.testApply']
+    unittest.main()
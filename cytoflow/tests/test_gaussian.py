@@ -23,8 +23,14 @@ Created on Feb 4, 2018
 @author: brian
 '''
 import unittest
-import cytoflow as flow
+import numpy as np
 import pandas as pd
+import scipy.stats
+from traits.api import TraitError
+
+import cytoflow as flow
+import cytoflow.utility as util
+from cytoflow.operations import gaussian
 from .test_base import ImportedDataTest  # @UnresolvedImport
 
 class TestGaussian(ImportedDataTest):
@@ -59,6 +65,73 @@ class TestGaussian(ImportedDataTest):
         ex2 = self.op.apply(self.ex)
         self.assertEqual(len(ex2['GM'].unique()), 2)
         
+    def testEstimateEvents(self):
+        self.op.by = ["Dox"]
+        self.op.estimate_events = 2000
+        self.op.estimate_strata = ["Well"]
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        # every event is still assigned to a component
+        self.assertEqual(len(ex2['GM'].unique()), 2)
+        self.assertFalse(ex2['GM'].isna().any())
+        
+        # the subset is repeatable
+        means = {g : gmm.means_ for g, gmm in self.op._gmms.items()}
+        self.op.estimate(self.ex)
+        for g, gmm in self.op._gmms.items():
+            np.testing.assert_array_equal(gmm.means_, means[g])
+            
+        # an out-of-range fraction is rejected when it's set
+        with self.assertRaises(TraitError):
+            self.op.estimate_fraction = 1.5
+            
+        self.op.estimate_strata = ["Bad"]
+        with self.assertRaises(util.CytoflowOpError):
+            self.op.estimate(self.ex)
+        
+    def testWorkers(self):
+        self.op.by = ["Well"]
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        # fitting the groups in parallel gives the same models
+        self.op.workers = 2
+        self.op.estimate(self.ex)
+        ex3 = self.op.apply(self.ex)
+        pd.testing.assert_series_equal(ex2['GM'], ex3['GM'])
+        
+    def testSigma(self):
+        self.op.sigma = 1.5
+        self.op.posteriors = True
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        # compare to the Mahalanobis distance, one event at a time
+        gmm = self.op._gmms[True]
+        x = np.column_stack([self.ex.scaled(c, self.op._scale[c]).values
+                             for c in self.op.channels])
+        thresh = scipy.stats.chi2.ppf((scipy.stats.norm.cdf(1.5) - 0.5) * 2, 1)
+        for c in range(2):
+            s = np.linalg.pinv(gmm.covariances_[c])
+            d = x - gmm.means_[c]
+            dist = np.array([np.dot(np.dot(e, s), e) for e in d])
+            np.testing.assert_array_equal(ex2["GM_{}".format(c + 1)].values.to_bool(),
+                                          dist <= thresh)
+            
+        np.testing.assert_allclose(ex2["GM_1_posterior"] + ex2["GM_2_posterior"], 1.0)
+        self.assertEqual(ex2["GM"].dtype.name, "category")
+        
+        # threads give the same answer
+        self.op.workers = 2
+        chunk_size = gaussian._CHUNK_SIZE
+        gaussian._CHUNK_SIZE = 100
+        try:
+            ex3 = self.op.apply(self.ex)
+        finally:
+            gaussian._CHUNK_SIZE = chunk_size
+        pd.testing.assert_frame_equal(ex2.data, ex3.data)
+        
     def testPlot(self):
         self.op.estimate(self.ex)
         self.op.default_view().plot(self.ex)
@@ -84,6 +84,27 @@ class Test(unittest.TestCase):
         d = ((hlpos_large - tlpos_large) / hlpos_large)
         assert_almost_equal(d, np.zeros(len(d)), decimal=2)
         
+    def test_hlog_table(self):
+        # the table-driven hlog matches a root-finder to within 1e-10 * r
+        import scipy.optimize
+        from cytoflow.utility.hlog_scale import hlog_inv
+        
+        x = np.r_[-np.logspace(-3, 5, 500), 0.0, np.logspace(-3, _l_mmax, 500)]
+        for b, r in [(200, 1.0), (10, _display_max)]:
+            expected = [scipy.optimize.brentq(lambda y: hlog_inv(y, b, r, _l_mmax) - xi,
+                                              -2 * r, 2 * r) for xi in x]
+            np.testing.assert_allclose(cf_hlog(x, b, r, _l_mmax), expected, 
+                                       rtol = 0, atol = 1e-10 * r)
+            
+        # ... and hlog_inv undoes it
+        scale = util.scale_factory("hlog", self.ex, channel = "Pacific Blue-A")
+        data = self.ex["Pacific Blue-A"]
+        np.testing.assert_allclose(scale.inverse(scale(data)), data, 
+                                   rtol = 1e-9, atol = 1e-6)
+        
+        # values outside the domain become NaN
+        self.assertTrue(np.isnan(cf_hlog(np.array([np.nan, 1e30]), 200, 1.0, _l_mmax)).all())
+        
         
 
 _machine_max = 2**18
@@ -25,6 +25,8 @@ Created on Dec 1, 2015
 
 import unittest
 import os
+import numpy as np
+import pandas as pd
 import cytoflow as flow
 
 class TestImport(unittest.TestCase):
@@ -75,6 +77,51 @@ class TestImport(unittest.TestCase):
                           tubes = [tube1],
                           channels = {'Y2-B' : "Blue"}).apply()
                           
+    def testWorkers(self):
+        tubes = [flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs', conditions = {"Dox" : 10.0}),
+                 flow.Tube(file = self.cwd + '/data/Plate01/CFP_Well_A4.fcs', conditions = {"Dox" : 1.0}),
+                 flow.Tube(file = self.cwd + '/data/Plate01/YFP_Well_A7.fcs', conditions = {"Dox" : 100.0})]
+        
+        np.random.seed(0)
+        ex1 = flow.ImportOp(conditions = {"Dox" : "float"},
+                            tubes = tubes,
+                            events = 1000).apply()
+                            
+        np.random.seed(0)
+        ex2 = flow.ImportOp(conditions = {"Dox" : "float"},
+                            tubes = tubes,
+                            events = 1000,
+                            workers = 2).apply()
+                            
+        pd.testing.assert_frame_equal(ex1.data, ex2.data)
+        self.assertEqual(ex1.metadata['fcs_metadata'].keys(), 
+                         ex2.metadata['fcs_metadata'].keys())
+        for c in ex1.channels:
+            self.assertEqual(ex1.metadata[c], ex2.metadata[c])
+                          
+    def testEvents(self):
+        # one file that can be memory-mapped, and one that can't
+        for file in ['/data/Plate01/RFP_Well_A3.fcs', '/data/instruments/Cytek xP5.fcs']:
+            tube = flow.Tube(file = self.cwd + file)
+            ex = flow.ImportOp(tubes = [tube], events = 500).apply()
+            self.assertEqual(len(ex), 500)
+            
+            np.random.seed(1)
+            ex1 = flow.ImportOp(tubes = [tube], events = 500).apply()
+            np.random.seed(1)
+            ex2 = flow.ImportOp(tubes = [tube], events = 500).apply()
+            pd.testing.assert_frame_equal(ex1.data, ex2.data)
+            
+    def testGlobalRandomState(self):
+        # importing every event doesn't touch numpy's global RNG
+        tube = flow.Tube(file = self.cwd + '/data/Plate01/RFP_Well_A3.fcs')
+        np.random.seed(2)
+        flow.ImportOp(tubes = [tube]).apply()
+        x = np.random.random()
+        
+        np.random.seed(2)
+        self.assertEqual(np.random.random(), x)
+            
     def testManufacturers(self):
         files = ['Accuri - C6.fcs',
                  'Applied Biosystems - Attune.fcs',
@@ -59,6 +59,15 @@ class TestKMeans(ImportedDataTest):
         ex2 = self.op.apply(self.ex)
         self.assertEqual(len(ex2['KM'].unique()), 2)
         
+    def testEstimateFraction(self):
+        self.op.by = ["Dox"]
+        self.op.estimate_fraction = 0.1
+        self.op.estimate(self.ex)
+        
+        ex2 = self.op.apply(self.ex)
+        self.assertEqual(len(ex2['KM'].unique()), 2)
+        self.assertEqual(len(ex2), len(self.ex))
+        
     def testPlot(self):
         self.op.estimate(self.ex)
         self.op.default_view().plot(self.ex)
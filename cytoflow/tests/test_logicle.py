@@ -19,6 +19,7 @@
 
 import unittest
 
+import numpy as np
 import pandas as pd
 
 import cytoflow as flow
@@ -64,6 +65,32 @@ class TestLogicle(unittest.TestCase):
         x = scale(pd.Series([20]))
         self.assertTrue(isinstance(x, pd.Series))
         
+    def test_logicle_array(self):
+        """
+        The whole-array transform gives the same answer as the scalar one
+        """
+        
+        from cytoflow.utility.logicle_ext.arrays import scale_array, inverse_array
+
+        scale = util.scale_factory("logicle", self.ex, channel = "Y2-A")
+        data = scale.clip(self.ex["Y2-A"].values)
+        
+        scalar = np.array([scale._logicle.scale(x) for x in data])
+        np.testing.assert_array_equal(scale(data), scalar)
+        np.testing.assert_array_equal(scale(self.ex["Y2-A"]).values, scalar)
+        np.testing.assert_array_equal(scale_array(scale._logicle, data, workers = 3), 
+                                      scalar)
+        
+        inverse = np.array([scale._logicle.inverse(x) for x in scalar])
+        np.testing.assert_array_equal(scale.inverse(scalar), inverse)
+        np.testing.assert_array_equal(inverse_array(scale._logicle, scalar, workers = 3),
+                                      inverse)
+        
+        # out of range values (and NaNs) become NaN
+        x = scale_array(scale._logicle, [np.nan, -1e10, 1e10, 10.0])
+        self.assertTrue(np.isnan(x[:3]).all())
+        self.assertEqual(x[3], scale._logicle.scale(10.0))
+
     ### TODO - test the apply function error checking
     
 if __name__ == "__main__":
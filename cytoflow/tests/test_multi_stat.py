@@ -0,0 +1,101 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+
+import cytoflow as flow
+import cytoflow.utility as util
+from .test_base import ImportedDataSmallTest
+
+class TestMultiStats(ImportedDataSmallTest):
+
+    def setUp(self):
+        super().setUp()
+        self.ex = flow.ThresholdOp(name = "T",
+                                   channel = "Y2-A",
+                                   threshold = 500).apply(self.ex)
+        
+        self.channels = ["B1-A", "V2-A", "Y2-A"]
+        self.functions = [len, np.mean, flow.geom_mean, flow.geom_sd_range,
+                          util.quantile(0.9), lambda x: x.max()]
+        self.functions[-1].__name__ = "max"
+        
+    def testApply(self):
+        # the same as a ChannelStatisticOp for each pair
+        for workers in [1, 2]:
+            ex = flow.MultiStatisticOp(name = "Stats",
+                                       channels = self.channels,
+                                       functions = self.functions,
+                                       by = ['Dox', 'T'],
+                                       workers = workers).apply(self.ex)
+                                       
+            self.assertEqual(len(ex.statistics), 
+                             len(self.channels) * len(self.functions))
+            
+            for channel in self.channels:
+                for fn in self.functions:
+                    expected = flow.ChannelStatisticOp(name = "Stats",
+                                                       channel = channel,
+                                                       function = fn,
+                                                       by = ['Dox', 'T']).apply(self.ex)
+                    expected = expected.statistics[("Stats", fn.__name__)]
+                    
+                    stat = ex.statistics[("Stats", "{}_{}".format(channel, fn.__name__))]
+                    
+                    self.assertTrue(stat.index.equals(expected.index))
+                    self.assertEqual(stat.dtype, expected.dtype)
+                    if stat.dtype == np.dtype(object):
+                        self.assertEqual(list(stat), list(expected))
+                    else:
+                        np.testing.assert_allclose(stat, expected, rtol = 1e-12)
+                        
+    def testSubset(self):
+        ex = flow.MultiStatisticOp(name = "Stats",
+                                   channels = self.channels,
+                                   functions = [len],
+                                   by = ['T'],
+                                   subset = "Dox == 10.0").apply(self.ex)
+        stat = ex.statistics[("Stats", "Y2-A_len")]
+        self.assertEqual(stat.loc[False], 5601)
+        self.assertEqual(stat.loc[True], 4399)
+        
+    def testBadFunctions(self):
+        op = flow.MultiStatisticOp(name = "Stats",
+                                   channels = self.channels,
+                                   functions = [np.mean, np.mean],
+                                   by = ['T'])
+        
+        with self.assertRaises(util.CytoflowOpError):
+            op.apply(self.ex)
+            
+        op.functions = [lambda x: len(x) / 0.0]
+        with self.assertRaises(util.CytoflowOpError):
+            op.apply(self.ex)
+            
+        op.functions = [len]
+        op.channels = ["B1-A", "B1-A"]
+        with self.assertRaises(util.CytoflowOpError):
+            op.apply(self.ex)
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestMultiStats.testApply']
+    unittest.main()
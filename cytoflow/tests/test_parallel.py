@@ -0,0 +1,63 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import cytoflow.utility as util
+
+def _check(x):
+    if x < 0:
+        raise ValueError("negative")
+    elif x == 0:
+        raise util.CytoflowOpError(None, "zero")
+    return x * 2
+
+class TestMapGroups(unittest.TestCase):
+
+    def testMap(self):
+        group_args = [("b", (2,)), ("a", (1,)), ("c", (3,))]
+        for workers in [1, 2]:
+            ret = util.map_groups(_check, group_args, workers = workers)
+            self.assertEqual(list(ret.items()), [("b", 4), ("a", 2), ("c", 6)])
+
+    def testErrors(self):
+        # a single CytoflowError is passed through
+        with self.assertRaises(util.CytoflowOpError) as cm:
+            util.map_groups(_check, [("a", (1,)), ("b", (0,))])
+        self.assertEqual(cm.exception.args, (None, "zero"))
+            
+        # otherwise, every group that failed is reported
+        for workers in [1, 2]:
+            with self.assertRaisesRegex(util.CytoflowOpError, 
+                                        "2 group.*Group b: zero.*Group c: negative"):
+                util.map_groups(_check, [("a", (1,)), ("b", (0,)), ("c", (-1,))],
+                                workers = workers)
+
+    def testStartMethod(self):
+        # never fork: the parent may be running threads
+        import multiprocessing
+        method = util.mp_context().get_start_method()
+        self.assertNotEqual(method, "fork")
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.assertEqual(method, "forkserver")
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestMapGroups.testErrors']
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import cytoflow.utility as util
+from cytoflow.utility import reducers
+
+class TestGroupReduce(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        n = 5000
+        
+        self.data = pd.DataFrame({"a" : rng.integers(0, 5, size = n),
+                                  "b" : rng.integers(0, 3, size = n)})
+        
+        # positive, negative and zero values
+        self.x = rng.lognormal(3, 1, size = n)
+        self.x[rng.random(n) < 0.2] *= -1
+        self.x[:10] = 0
+        
+        self.groups = util.GroupIndex(self.data, ["a", "b"])
+
+    def testReducers(self):
+        for fn in [len, np.sum, np.min, np.max, np.mean, np.median, np.std,
+                   util.geom_mean, util.geom_sd, util.geom_sem,
+                   util.quantile(0), util.quantile(0.25), util.quantile(0.9),
+                   util.quantile(1)]:
+            values = util.group_reduce(fn, self.x, self.groups)
+            expected = [fn(pd.Series(self.x[idx])) for _, idx in self.groups]
+            np.testing.assert_allclose(values, expected, rtol = 1e-12,
+                                       err_msg = fn.__name__)
+            
+    def testManyGroups(self):
+        # lots of little groups are sorted differently
+        groups = util.GroupIndex(self.data.assign(c = np.arange(len(self.data)) % 400), 
+                                 ["a", "b", "c"])
+        fns = [len, np.median, util.geom_sd, util.quantile(0.3)]
+        
+        for fn, values in zip(fns, util.group_reduce_all(fns, self.x, groups)):
+            expected = [fn(pd.Series(self.x[idx])) for _, idx in groups]
+            np.testing.assert_allclose(values, expected, rtol = 1e-12,
+                                       err_msg = fn.__name__)
+            
+    def testEqualGroups(self):
+        # groups that are all the same size are reduced row by row
+        groups = util.GroupIndex(pd.DataFrame({"a" : np.arange(len(self.x)) % 10}), ["a"])
+        fns = [np.median, util.quantile(0.3), util.geom_mean, util.geom_sd]
+        
+        for fn, values in zip(fns, util.group_reduce_all(fns, self.x, groups)):
+            expected = [fn(pd.Series(self.x[idx])) for _, idx in groups]
+            np.testing.assert_allclose(values, expected, rtol = 1e-12,
+                                       err_msg = fn.__name__)
+            
+    def testGeomMeanNoPositives(self):
+        groups = util.GroupIndex(pd.DataFrame({"a" : [0, 0, 1, 1, 1]}), ["a"])
+        x = np.array([-1.0, -2.0, 3.0, 4.0, -5.0])
+        
+        values = util.group_reduce(util.geom_mean, x, groups)
+        self.assertTrue(np.isnan(values[0]))
+        self.assertAlmostEqual(values[1], util.geom_mean(x[2:]))
+        
+    def testFallback(self):
+        # functions without a vectorized version, NaNs and non-numeric data
+        self.assertIsNone(util.group_reduce(lambda x: np.mean(x), self.x, self.groups))
+        
+        x = self.x.copy()
+        x[100] = np.nan
+        self.assertIsNone(util.group_reduce(np.mean, x, self.groups))
+        
+        self.assertIsNone(util.group_reduce(len, x.astype(str), self.groups))
+        
+    def testQuantileName(self):
+        self.assertEqual(util.quantile(0.25).__name__, "quantile_0.25")
+        with self.assertRaises(ValueError):
+            util.quantile(25)
+            
+    def testQuantileCached(self):
+        # making the same quantile again doesn't register another reducer
+        fn = util.quantile(0.35)
+        num_reducers = len(reducers._REDUCERS)
+        self.assertIs(util.quantile(0.35), fn)
+        self.assertEqual(len(reducers._REDUCERS), num_reducers)
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestGroupReduce.testReducers']
+    unittest.main()
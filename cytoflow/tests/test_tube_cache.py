@@ -0,0 +1,119 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest, os, shutil, tempfile
+
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+from cytoflow.operations.import_op import parse_tube
+
+class TestTubeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__)) + "/data/"
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = util.TubeCache(self.cache_dir, 2 ** 30)
+
+    def tearDown(self):
+        util.set_tube_cache(None)
+        shutil.rmtree(self.cache_dir, ignore_errors = True)
+
+    def testParseTube(self):
+        filename = self.cwd + "Plate01/RFP_Well_A3.fcs"
+        meta1, data1 = parse_tube(filename)
+
+        # the first parse fills the cache; the second reads from it
+        for _ in range(2):
+            meta2, data2 = parse_tube(filename, cache = self.cache)
+            self.assertEqual(meta1, meta2)
+            pd.testing.assert_frame_equal(data1, data2)
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        meta2, _ = parse_tube(filename, metadata_only = True, cache = self.cache)
+        self.assertEqual(meta1, meta2)
+
+    def testSubset(self):
+        filename = self.cwd + "Plate01/RFP_Well_A3.fcs"
+        _, data1 = parse_tube(filename, channels = ["V2-A", "Y2-A"],
+                              events = 100, seed = 1)
+
+        # the subset is the same whether or not it came from the cache
+        for _ in range(2):
+            _, data2 = parse_tube(filename, channels = ["V2-A", "Y2-A"],
+                                  events = 100, seed = 1, cache = self.cache)
+            pd.testing.assert_frame_equal(data1, data2)
+
+    def testModified(self):
+        filename = os.path.join(self.cache_dir, "tube.fcs")
+        shutil.copy(self.cwd + "Plate01/RFP_Well_A3.fcs", filename)
+
+        key = self.cache.key(filename, 0, "$PnS")
+        parse_tube(filename, cache = self.cache)
+        self.assertIsNotNone(self.cache.get(key))
+
+        os.utime(filename, ns = (0, 0))
+        self.assertNotEqual(self.cache.key(filename, 0, "$PnS"), key)
+        self.assertNotEqual(self.cache.key(filename, 1, "$PnS"), key)
+
+    def testEvict(self):
+        # each entry is about 600 kB, so only one fits
+        cache = util.TubeCache(self.cache_dir, 2 ** 20)
+
+        parse_tube(self.cwd + "Plate01/RFP_Well_A3.fcs", cache = cache)
+        parse_tube(self.cwd + "Plate01/CFP_Well_A4.fcs", cache = cache)
+
+        self.assertIsNone(cache.get(cache.key(self.cwd + "Plate01/RFP_Well_A3.fcs", 0, "$PnS")))
+        self.assertIsNotNone(cache.get(cache.key(self.cwd + "Plate01/CFP_Well_A4.fcs", 0, "$PnS")))
+
+        cache.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def testDamaged(self):
+        filename = self.cwd + "Plate01/RFP_Well_A3.fcs"
+        key = self.cache.key(filename, 0, "$PnS")
+        parse_tube(filename, cache = self.cache)
+
+        os.remove(os.path.join(self.cache_dir, key, "0.npy"))
+        self.assertIsNone(self.cache.get(key))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, key)))
+
+    def testImport(self):
+        tubes = [flow.Tube(file = self.cwd + "Plate01/RFP_Well_A3.fcs",
+                           conditions = {"Dox" : 10.0}),
+                 flow.Tube(file = self.cwd + "Plate01/CFP_Well_A4.fcs",
+                           conditions = {"Dox" : 1.0})]
+
+        ex1 = flow.ImportOp(conditions = {"Dox" : "float"},
+                            tubes = tubes).apply()
+
+        util.set_tube_cache(self.cache_dir)
+        for _ in range(2):
+            ex2 = flow.ImportOp(conditions = {"Dox" : "float"},
+                                tubes = tubes).apply()
+            pd.testing.assert_frame_equal(ex1.data, ex2.data)
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+if __name__ == "__main__":
+    import sys;sys.argv = ['', 'TestTubeCache.testImport']
+    unittest.main()
@@ -24,6 +24,7 @@ Created on Dec 1, 2015
 '''
 
 import unittest
+import numpy as np
 import pandas as pd
 
 import cytoflow as flow
@@ -83,6 +84,29 @@ class Test(ImportedDataSmallTest):
         self.assertIsInstance(stat, pd.Series)
         self.assertIsNot(type(stat.iloc[0]), pd.Series)
 
+        # same index as the original statistic, and each Dox sums to 1
+        orig = self.ex.statistics[("ByDox", "len")]
+        self.assertTrue(stat.index.equals(orig.index))
+        pd.testing.assert_series_equal(stat.groupby(level = 'Dox').sum(),
+                                       pd.Series(1.0, index = orig.index.unique(level = 'Dox')),
+                                       check_names = False)
+
+    def testVectorized(self):
+        # np.sum is computed for all the groups at once; the lambda isn't
+        ex_vector = flow.TransformStatisticOp(name = "ByDox",
+                                              by = ['Dox'],
+                                              statistic = ("ByDox", "len"),
+                                              function = np.sum).apply(self.ex)
+        ex_group = flow.TransformStatisticOp(name = "ByDox",
+                                             by = ['Dox'],
+                                             statistic = ("ByDox", "len"),
+                                             function = lambda x: x.sum(),
+                                             statistic_name = "sum").apply(self.ex)
+
+        pd.testing.assert_series_equal(ex_vector.statistics[("ByDox", "sum")],
+                                       ex_group.statistics[("ByDox", "sum")],
+                                       check_dtype = False)
+
 
 if __name__ == "__main__":
 #     import sys;sys.argv = ['', 'Test.testApply']
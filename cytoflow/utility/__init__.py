@@ -31,15 +31,23 @@ from .util_functions import (cartesian, iqr, geom_mean, geom_sd, geom_sd_range,
                              geom_sem, geom_sem_range, num_hist_bins, sanitize_identifier, 
                              random_string, is_numeric, cov2corr)
 
-from .algorithms import ci, polygon_contains
+from .algorithms import ci, polygon_contains, subsample
 from .cytoflow_errors import CytoflowError, CytoflowOpError, CytoflowViewError
 from .cytoflow_errors import CytoflowWarning, CytoflowOpWarning, CytoflowViewWarning
 
-from .scale import scale_factory, IScale, set_default_scale, get_default_scale
+from .scale import (scale_factory, IScale, set_default_scale, get_default_scale,
+                    set_scale_cache_size, get_scale_cache_size)
 from .custom_traits import (PositiveInt, PositiveCInt, PositiveFloat, 
-                            PositiveCFloat, ScaleEnum, Deprecated, Removed,
+                            PositiveCFloat, UnitFloat, ScaleEnum, Deprecated, Removed,
                             FloatOrNone, CFloatOrNone, IntOrNone, CIntOrNone)
 
 from .docstring import expand_class_attributes, expand_method_parameters
 
-from .fcswrite import write_fcs
\ No newline at end of file
+from .fcswrite import write_fcs
+from .fcsread import read_fcs, FCSLayoutError
+from .tube_cache import TubeCache, set_tube_cache, get_tube_cache
+from .bitmask import BitMaskDtype, BitMaskArray
+from .group_index import GroupIndex
+from .parallel import map_groups, mp_context
+from .reducers import (group_reduce, group_reduce_all, register_reducer, quantile,
+                       GroupedValues)
@@ -28,12 +28,21 @@ Useful algorithms.
 `percentiles` -- find percentiles in an array.
 
 `bootstrap` -- resample (with replacement) and store aggregate values.
+
+`subsample` -- choose a (possibly stratified) random subset of events.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from scipy import stats
 
-def ci(data, func, which=95, boots=1000):
+from .reducers import group_reduce
+
+# about how many values each chunk of bootstrap resamples holds
+_BOOTSTRAP_CHUNK_SIZE = 2 ** 22
+
+def ci(data, func, which=95, boots=1000, workers=1, random_seed=None):
     """
     Determine the confidence interval of a function applied to a data set by
     bootstrapping.
@@ -52,16 +61,84 @@ def ci(data, func, which=95, boots=1000):
     boots : int (default = 1000):
         How many times to bootstrap
         
+    workers : int (default = 1)
+        How many threads to resample in.
+        
+    random_seed : int | None (default = None)
+        Seed for the random number generator, for a reproducible 
+        confidence interval.
+        
     Returns
     -------
     (float, float)
         The confidence interval.
         
     """
-    boots = bootstrap(data, func = func, n_boot = boots)
+    boots = bootstrap(data, func = func, n_boot = boots, 
+                      workers = workers, random_seed = random_seed)
     p = 50 - which / 2, 50 + which / 2
     return tuple(percentiles(boots, p))
     
+def subsample(positions, events = None, fraction = None, seed = 0, strata = None):
+    """
+    Choose a random subset of events, without replacement.
+    
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        The row positions of the events to choose from (for example, one
+        group from `Experiment.group_index 
+        <cytoflow.experiment.Experiment.group_index>`.)
+        
+    events : Int (default = None)
+        Choose at most this many events.
+        
+    fraction : Float (default = None)
+        Choose this fraction of the events, between 0 and 1.  If both 
+        ``events`` and ``fraction`` are set, whichever chooses fewer events
+        wins.  If neither is set, all of ``positions`` is returned.
+        
+    seed : Int (default = 0)
+        The random seed.  The same seed chooses the same events.
+        
+    strata : numpy.ndarray (default = None)
+        If set, the stratum of *every* event (not just the ones in 
+        ``positions``) -- for example, `GroupIndex.codes 
+        <cytoflow.utility.group_index.GroupIndex>`.  Each stratum contributes
+        events in proportion to its size.
+        
+    Returns
+    -------
+    numpy.ndarray
+        The chosen positions, sorted.
+    """
+    
+    n = len(positions)
+    if events is not None:
+        n = min(n, events)
+    if fraction is not None:
+        n = min(n, max(1, int(round(len(positions) * fraction))))
+        
+    if n >= len(positions):
+        return positions
+        
+    rng = np.random.default_rng(seed)
+    
+    if strata is None:
+        return np.sort(rng.choice(positions, size = n, replace = False))
+    
+    codes, counts = np.unique(strata[positions], return_counts = True)
+    
+    # allocate the events to strata by largest remainder, so the total is n
+    quota = counts * n / len(positions)
+    alloc = np.floor(quota).astype(np.intp)
+    short = n - alloc.sum()
+    alloc[np.argsort(alloc - quota, kind = "stable")[:short]] += 1
+    
+    chosen = [rng.choice(positions[strata[positions] == code], size = k, replace = False)
+              for code, k in zip(codes, alloc)]
+    return np.sort(np.concatenate(chosen))
+
 def percentiles(a, pcts, axis=None):
     """
     Like `scipy.stats.scoreatpercentile` but can take and return array of percentiles.
@@ -135,6 +212,18 @@ def bootstrap(*args, **kwargs):
     random_seed : int | None, default None
         Seed for the random number generator; useful if you want
         reproducible resamples.
+        
+    workers : int, default 1
+        How many threads to resample in.  The resamples are the same
+        no matter how many threads there are.
+        
+    Notes
+    -----
+    Unless ``units`` or ``smooth`` is set, the resamples are drawn in 
+    chunks.  If there's one (1-D) array, no ``axis`` and ``func`` has 
+    a vectorized version (`numpy.mean`, `numpy.median`, `geom_mean`, etc. 
+    -- see `cytoflow.utility.reducers`), it is computed for a whole 
+    chunk of resamples at once.
             
     Returns
     -------
@@ -155,6 +244,7 @@ def bootstrap(*args, **kwargs):
     units = kwargs.get("units", None)
     smooth = kwargs.get("smooth", False)
     random_seed = kwargs.get("random_seed", None)
+    workers = kwargs.get("workers", 1)
     if axis is None:
         func_kwargs = dict()
     else:
@@ -176,12 +266,60 @@ def bootstrap(*args, **kwargs):
         return _structured_bootstrap(args, n_boot, units, func,
                                      func_kwargs, rs)
 
-    boot_dist = []
-    for _ in range(int(n_boot)):
-        resampler = rs.randint(0, n, n)
-        sample = [a.take(resampler, axis=0) for a in args]
-        boot_dist.append(func(*sample, **func_kwargs))
-    return np.array(boot_dist)
+    return _chunked_bootstrap(args, int(n_boot), func, func_kwargs, 
+                              random_seed, workers)
+
+
+class _Resamples(object):
+    """
+    Bootstrap resamples, in the shape of a `GroupIndex`: each resample
+    is a group, so `group_reduce` computes a statistic of every resample
+    at once.
+    """
+    
+    def __init__(self, resampler):
+        num, n = resampler.shape
+        self.order = resampler.ravel()
+        self.counts = np.full(num, n)
+        self.offsets = np.arange(num + 1) * n
+        
+    def __len__(self):
+        return len(self.counts)
+
+
+def _chunked_bootstrap(args, n_boot, func, func_kwargs, random_seed, workers):
+    """
+    Draw the resamples in chunks, and evaluate the chunks in a thread pool.
+    Each chunk has its own random number generator, spawned from 
+    ``random_seed``, so the resamples don't depend on the number of threads.
+    """
+    n = len(args[0])
+    vectorize = len(args) == 1 and args[0].ndim == 1 and not func_kwargs
+    
+    def evaluate(size, seed):
+        resampler = np.random.default_rng(seed).integers(0, n, (size, n))
+        
+        if vectorize:
+            boot_dist = group_reduce(func, args[0], _Resamples(resampler))
+            if boot_dist is not None:
+                return boot_dist
+            
+        return np.array([func(*[a.take(r, axis=0) for a in args], **func_kwargs)
+                         for r in resampler])
+        
+    chunk = max(1, _BOOTSTRAP_CHUNK_SIZE // max(n, 1))
+    sizes = [min(chunk, n_boot - i) for i in range(0, n_boot, chunk)]
+    if not sizes:
+        return np.array([])
+    
+    seeds = np.random.SeedSequence(random_seed).spawn(len(sizes))
+    
+    if workers <= 1 or len(sizes) == 1:
+        return np.concatenate([evaluate(size, seed) 
+                               for size, seed in zip(sizes, seeds)])
+    
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        return np.concatenate(list(executor.map(evaluate, sizes, seeds)))
 
 
 def _structured_bootstrap(args, n_boot, units, func, func_kwargs, rs):
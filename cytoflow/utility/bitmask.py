@@ -0,0 +1,319 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.bitmask
+------------------------
+
+A `pandas` extension type for boolean columns that stores one bit per event
+instead of one byte.
+
+`BitMaskDtype` -- the ``bitmask`` dtype.  Pass ``"bitmask"`` as the dtype
+to `Experiment.add_condition <cytoflow.experiment.Experiment.add_condition>`
+to use it.
+
+`BitMaskArray` -- a boolean array packed into bytes with `numpy.packbits`.
+``&``, ``|``, ``^`` and ``~`` work on the packed bytes directly, and ``sum``
+counts the set bits without unpacking them.  Anywhere else `pandas` or
+`numpy` needs the values (indexing, `pandas.DataFrame.groupby`,
+`pandas.DataFrame.query`), it behaves like a ``bool`` array.
+"""
+
+import numbers
+
+import numpy as np
+import pandas as pd
+
+from pandas.api.extensions import (ExtensionArray, ExtensionDtype,
+                                   register_extension_dtype, take)
+from pandas.api.types import is_bool_dtype, is_list_like
+
+# the number of bits set in each possible byte
+_POPCOUNT = np.unpackbits(np.arange(256, dtype = np.uint8)[:, None],
+                          axis = 1).sum(axis = 1).astype(np.uint8)
+
+@register_extension_dtype
+class BitMaskDtype(ExtensionDtype):
+    """
+    The ``bitmask`` dtype: a boolean that is stored one bit per value, and
+    that has no missing values.
+    """
+
+    name = "bitmask"
+    type = np.bool_
+    kind = "b"
+    na_value = False
+    _is_boolean = True
+
+    @classmethod
+    def construct_array_type(cls):
+        return BitMaskArray
+
+
+class BitMaskArray(ExtensionArray):
+    """
+    A boolean array packed eight values to a byte.
+
+    Parameters
+    ----------
+    values : array-like of bool
+        The values to pack.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype = np.bool_)
+        if values.ndim != 1:
+            raise ValueError("BitMaskArray must be 1-dimensional")
+
+        self._length = len(values)
+        self._data = np.packbits(values, bitorder = "little")
+
+    @classmethod
+    def _from_packed(cls, data, length):
+        """Wrap already-packed bytes.  The unused bits must be 0."""
+        ret = cls.__new__(cls)
+        ret._data = data
+        ret._length = length
+        return ret
+
+    def to_bool(self):
+        """Unpack to a `numpy` ``bool`` array."""
+        return np.unpackbits(self._data,
+                             count = self._length,
+                             bitorder = "little").view(np.bool_)
+
+    def count(self):
+        """Count the ``True`` values without unpacking them."""
+        return int(_POPCOUNT[self._data].sum(dtype = np.int64))
+
+    def any(self):
+        """Are any of the values ``True``?"""
+        return self.count() > 0
+
+    def all(self):
+        """Are all of the values ``True``?"""
+        return self.count() == self._length
+
+    ## the ExtensionArray interface
+
+    @classmethod
+    def _from_sequence(cls, scalars, *, dtype = None, copy = False):
+        if isinstance(scalars, BitMaskArray):
+            return scalars.copy() if copy else scalars
+
+        if isinstance(scalars, (pd.Series, pd.Index)):
+            scalars = scalars.values
+
+        # missing values are False
+        if not is_bool_dtype(getattr(scalars, "dtype", None)):
+            scalars = pd.array(scalars, dtype = "boolean").to_numpy(dtype = np.bool_,
+                                                                  na_value = False)
+
+        return cls(scalars)
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls(values)
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        return cls(np.concatenate([x.to_bool() for x in to_concat]))
+
+    @property
+    def dtype(self):
+        return BitMaskDtype()
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        if isinstance(item, numbers.Integral):
+            if item < 0:
+                item += self._length
+            if not 0 <= item < self._length:
+                raise IndexError("index {} is out of bounds for size {}"
+                                 .format(item, self._length))
+            return bool((self._data[item >> 3] >> (item & 7)) & 1)
+
+        item = pd.api.indexers.check_array_indexer(self, item)
+        return type(self)(self.to_bool()[item])
+
+    def __setitem__(self, key, value):
+        # the packed bytes are read-only if they're shared (see
+        # `Experiment.clone`)
+        if not self._data.flags.writeable:
+            raise ValueError("assignment destination is read-only")
+        
+        if isinstance(value, BitMaskArray):
+            value = value.to_bool()
+
+        values = self.to_bool()
+        values[key] = value
+        self._data = np.packbits(values, bitorder = "little")
+
+    def __iter__(self):
+        return iter(self.to_bool().tolist())
+
+    def __array__(self, dtype = None):
+        return np.asarray(self.to_bool(), dtype = dtype)
+
+    def to_numpy(self, dtype = None, copy = False, na_value = None):
+        return np.asarray(self.to_bool(), dtype = dtype)
+
+    def astype(self, dtype, copy = True):
+        if isinstance(dtype, BitMaskDtype) or dtype == "bitmask":
+            return self.copy() if copy else self
+
+        return np.asarray(self.to_bool(), dtype = dtype)
+
+    def equals(self, other):
+        if not isinstance(other, BitMaskArray):
+            return False
+        return self._length == other._length and np.array_equal(self._data, other._data)
+
+    def isna(self):
+        return np.zeros(self._length, dtype = np.bool_)
+
+    def copy(self):
+        return self._from_packed(self._data.copy(), self._length)
+
+    def take(self, indices, allow_fill = False, fill_value = None):
+        if fill_value is None:
+            fill_value = False
+
+        return type(self)(take(self.to_bool(),
+                               indices,
+                               allow_fill = allow_fill,
+                               fill_value = fill_value))
+
+    def _values_for_factorize(self):
+        return self.to_bool().view(np.uint8), 255
+
+    def _values_for_argsort(self):
+        return self.to_bool()
+
+    def unique(self):
+        # from the count of set bits, instead of unpacking every event
+        n = self.count()
+        if self._length == 0:
+            return type(self)([])
+        elif n == 0 or n == self._length:
+            return type(self)([n > 0])
+
+        # in order of first appearance
+        return type(self)([self[0], not self[0]])
+
+    def value_counts(self, dropna = True):
+        n = self.count()
+        return pd.Series([self._length - n, n], index = [False, True])
+
+    def _reduce(self, name, *, skipna = True, **kwargs):
+        if name == "sum":
+            return self.count()
+        elif name == "any":
+            return self.any()
+        elif name == "all":
+            return self.all()
+        elif name == "mean":
+            # as pandas' reducers do, the mean of nothing is NaN
+            if self._length == 0:
+                return np.nan
+            return self.count() / self._length
+
+        return getattr(self.to_bool(), name)(**kwargs)
+
+    ## vectorized logic, on the packed bytes
+
+    def _other_bytes(self, other):
+        """Get the packed bytes of ``other``, or ``None`` if we can't"""
+        if isinstance(other, (pd.Series, pd.Index, pd.DataFrame)):
+            return None
+
+        if isinstance(other, BitMaskArray):
+            packed = other._data
+        elif isinstance(other, (bool, np.bool_)):
+            packed = np.full_like(self._data, 0xff if other else 0)
+            return self._mask_padding(packed)
+        elif is_list_like(other) and is_bool_dtype(getattr(other, "dtype", None)):
+            packed = np.packbits(np.asarray(other, dtype = np.bool_),
+                                 bitorder = "little")
+        else:
+            return None
+
+        if len(other) != self._length:
+            raise ValueError("Lengths must match")
+
+        return packed
+
+    def _mask_padding(self, data):
+        """Clear the unused bits at the end of ``data``"""
+        extra = len(data) * 8 - self._length
+        if extra:
+            data[-1] &= np.uint8(0xff >> extra)
+        return data
+
+    def __and__(self, other):
+        packed = self._other_bytes(other)
+        if packed is None:
+            return NotImplemented
+        return self._from_packed(self._data & packed, self._length)
+
+    def __or__(self, other):
+        packed = self._other_bytes(other)
+        if packed is None:
+            return NotImplemented
+        return self._from_packed(self._data | packed, self._length)
+
+    def __xor__(self, other):
+        packed = self._other_bytes(other)
+        if packed is None:
+            return NotImplemented
+        return self._from_packed(self._data ^ packed, self._length)
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+    def __invert__(self):
+        return self._from_packed(self._mask_padding(~self._data), self._length)
+
+    def __eq__(self, other):
+        if isinstance(other, (pd.Series, pd.Index, pd.DataFrame)):
+            return NotImplemented
+
+        packed = self._other_bytes(other)
+        if packed is None:
+            return self.to_bool() == other
+
+        return self._from_packed(self._mask_padding(~(self._data ^ packed)),
+                                 self._length)
+
+    def __ne__(self, other):
+        if isinstance(other, (pd.Series, pd.Index, pd.DataFrame)):
+            return NotImplemented
+
+        packed = self._other_bytes(other)
+        if packed is None:
+            return self.to_bool() != other
+
+        return self._from_packed(self._data ^ packed, self._length)
@@ -29,6 +29,9 @@ positive (and optionally 0).
 `PositiveCInt`, `PositiveCFloat` -- versions of `traits.trait_types.CInt`, `traits.trait_types.CFloat` that must
 be positive (and optionally 0).
 
+`UnitFloat` -- a version of `traits.trait_types.Float` that must be between 0 and 1
+(and optionally 0).
+
 `IntOrNone`, `FloatOrNone` -- versions of `traits.trait_types.Int` and `traits.trait_types.Float` that may also
 hold the value ``None``.
 
@@ -121,6 +124,23 @@ class PositiveCFloat(BaseCFloat):
         
         self.error(obj, name, value)
         
+class UnitFloat(BaseFloat):
+    """
+    Defines a trait whose value must be a float greater than 0 and at most 1
+    """
+    
+    info_text = 'a float between 0 and 1'
+    
+    def validate(self, obj, name, value):
+        if self.allow_none and value == None:
+            return None
+        
+        value = super().validate(obj, name, value)
+        if ((value > 0.0 or (self.allow_zero and value >= 0.0)) and value <= 1.0):
+            return value 
+        
+        self.error(obj, name, value)
+        
 class FloatOrNone(BaseFloat):
     """
     Defines a trait whose value must be a float or None
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.fcsread
+------------------------
+
+Read list-mode .fcs files by memory-mapping their DATA segment.
+
+`read_fcs` parses the HEADER and TEXT segments, then maps the DATA segment
+with `numpy.memmap` and returns only the requested channels (and, 
+optionally, only a random subset of the events.)  It handles
+the common layouts -- ``$DATATYPE`` ``I``, ``F`` or ``D``, little- or
+big-endian, with each parameter 1, 2, 4 or 8 bytes wide.  Any other layout
+raises `FCSLayoutError`, and the caller should fall back to ``fcsparser``;
+a corrupt file raises `CytoflowError`.
+
+The metadata it returns is the same as ``fcsparser.parse(...,
+reformat_meta = False)``.
+"""
+
+import os, warnings
+
+import numpy as np
+
+from .cytoflow_errors import CytoflowError, CytoflowWarning
+
+class FCSLayoutError(CytoflowError):
+    """
+    The DATA segment of an FCS file isn't in a layout that `read_fcs` can
+    memory-map.  ``fcsparser`` may still be able to read it.
+    """
+
+# FCS $BYTEORD --> numpy byte order
+_BYTEORD = {"1,2,3,4" : "<",
+            "1,2" : "<",
+            "4,3,2,1" : ">",
+            "2,1" : ">"}
+
+# FCS $DATATYPE --> numpy kind
+_DATATYPE = {"I" : "u",
+             "F" : "f",
+             "D" : "f"}
+
+def read_fcs(filename,
+             channels = None,
+             name_metadata = "$PnS",
+             data_set = 0,
+             metadata_only = False,
+             events = None,
+             seed = None):
+    """
+    Read an FCS file, memory-mapping its DATA segment.
+
+    Parameters
+    ----------
+    filename : str
+        The FCS file to read.
+
+    channels : list of str (default = None)
+        The channels to return.  If ``None``, return all of them.
+
+    name_metadata : {"$PnS", "$PnN"} (default = "$PnS")
+        Which parameter keyword holds the channel names.  As with
+        ``fcsparser``, if the names aren't unique, the other one is used.
+
+    data_set : int (default = 0)
+        Which data set in the file to read.
+
+    metadata_only : bool (default = False)
+        If ``True``, only read the HEADER and TEXT segments.
+        
+    events : int (default = None)
+        If not ``None`` and the file has more than ``events`` events, 
+        return a random subset of ``events`` of them, chosen with
+        ``numpy.random.default_rng(seed).choice($TOT, events, replace = False)``.
+        Only the chosen events are read from the file.
+        
+    seed : int (default = None)
+        The seed for choosing the random subset of events.
+
+    Returns
+    -------
+    metadata : dict
+        The keywords from the TEXT segment.  ``$PAR``, ``$TOT``,
+        ``$NEXTDATA`` and ``$PnB`` are converted to ``int``, and the
+        offsets from the HEADER segment are in ``__header__``.
+
+    data : dict(str : numpy.ndarray)
+        The events, as a dictionary mapping channel names to 1D arrays,
+        in the order of ``channels``.  Where possible these are views
+        into the memory-mapped file; integer channels with unused high bits
+        are masked, which makes a copy, as does choosing a subset of 
+        ``events``.  ``None`` if ``metadata_only`` is ``True``.
+
+    Raises
+    ------
+    FCSLayoutError
+        If the file's DATA segment isn't in a layout that can be 
+        memory-mapped.
+        
+    CytoflowError
+        If the file is corrupt.
+    """
+
+    if name_metadata not in ("$PnS", "$PnN"):
+        raise CytoflowError('name_metadata must be either "$PnN" or "$PnS"')
+
+    file_size = os.path.getsize(filename)
+
+    # as with fcsparser, keywords from earlier data sets carry over into
+    # the metadata for later ones
+    metadata = {}
+
+    with open(filename, "rb") as f:
+        offset = 0
+        for i in range(data_set + 1):
+            header = _read_header(f, offset, file_size)
+            text = _convert_text(_read_text(f, header))
+            metadata.update(text)
+
+            if i == data_set:
+                break
+
+            if "$NEXTDATA" not in text:
+                if i != 0:
+                    warnings.warn("File does not contain $NEXTDATA information.",
+                                  CytoflowWarning)
+                break
+
+            nextdata = int(text["$NEXTDATA"])
+            if nextdata == 0:
+                warnings.warn("File does not contain the number of data sets.",
+                              CytoflowWarning)
+                break
+
+            offset += nextdata
+
+    metadata["__header__"] = header
+
+    if metadata_only:
+        return metadata, None
+
+    # figure out the record layout
+    pars = range(1, text["$PAR"] + 1)
+
+    if metadata.get("$MODE", "L") != "L":
+        raise FCSLayoutError("$MODE {} is not supported".format(metadata["$MODE"]))
+
+    datatype = metadata.get("$DATATYPE")
+    if datatype not in _DATATYPE:
+        raise FCSLayoutError("$DATATYPE {} is not supported".format(datatype))
+
+    byteord = metadata.get("$BYTEORD", "").strip()
+    if byteord not in _BYTEORD:
+        raise FCSLayoutError("$BYTEORD {} is not supported".format(byteord))
+
+    widths = []
+    for p in pars:
+        bits = metadata["$P{}B".format(p)]
+        if bits % 8 != 0 or bits // 8 not in (1, 2, 4, 8):
+            raise FCSLayoutError("$P{}B = {} is not supported".format(p, bits))
+        widths.append(bits // 8)
+
+    if datatype == "F" and any(w != 4 for w in widths):
+        raise FCSLayoutError("$DATATYPE F must be 32 bits wide")
+    if datatype == "D" and any(w != 8 for w in widths):
+        raise FCSLayoutError("$DATATYPE D must be 64 bits wide")
+
+    record = np.dtype({"names" : ["p{}".format(p) for p in pars],
+                       "formats" : ["{}{}{}".format(_BYTEORD[byteord],
+                                                    _DATATYPE[datatype],
+                                                    w) for w in widths],
+                       "offsets" : list(np.cumsum([0] + widths[:-1])),
+                       "itemsize" : sum(widths)})
+
+    num_events = metadata["$TOT"]
+    data_start = header["data start"]
+    if data_start == offset:
+        # the HEADER offsets are 0 if they don't fit in 8 characters
+        data_start = offset + int(metadata["$BEGINDATA"])
+
+    if data_start + num_events * record.itemsize > file_size:
+        raise CytoflowError("The FCS file {} is corrupted. Part of the data "
+                            "segment is missing.".format(filename))
+
+    # which channels do we want?  (the names only come from this data set)
+    names = _channel_names(text, pars, name_metadata)
+
+    if channels is None:
+        channels = names
+
+    for c in channels:
+        if c not in names:
+            raise CytoflowError("Channel {} not in file {}".format(c, filename))
+
+    if num_events == 0:
+        return metadata, {c : np.empty(0, dtype = record["p{}".format(names.index(c) + 1)])
+                          for c in channels}
+
+    events_mm = np.memmap(filename,
+                          dtype = record,
+                          mode = 'r',
+                          offset = data_start,
+                          shape = (num_events,))
+
+    if events is not None and events < num_events:
+        rows = np.random.default_rng(seed).choice(num_events, 
+                                                  events, 
+                                                  replace = False)
+        
+        # read the rows in file order, then put them back in the order 
+        # they were chosen
+        order = np.argsort(rows)
+        subset = np.empty(events, dtype = record)
+        subset[order] = events_mm[rows[order]]
+        events_mm = subset
+
+    data = {}
+    for c in channels:
+        p = names.index(c) + 1
+        column = events_mm["p{}".format(p)]
+
+        # mask off the high bits of integer channels, as fcsparser does
+        if datatype == "I":
+            valid_bits = _valid_bits(metadata, p)
+            if valid_bits < widths[p - 1] * 8:
+                column = column & column.dtype.type(2 ** valid_bits - 1)
+
+        data[c] = column
+
+    return metadata, data
+
+
+def _read_header(f, offset, file_size):
+    """Read the HEADER segment starting at ``offset``"""
+    f.seek(offset)
+    header = {"FCS format" : f.read(6)}
+    if not header["FCS format"].startswith(b"FCS"):
+        raise CytoflowError("Not an FCS file")
+
+    f.read(4)
+
+    for field in ("text start", "text end", "data start", "data end",
+                  "analysis start", "analysis end"):
+        try:
+            value = int(f.read(8))
+        except ValueError:
+            value = 0
+        header[field] = value + offset
+
+    if header["text end"] == header["data start"]:
+        header["text end"] -= 1
+
+    for field in ("text start", "text end"):
+        if header[field] == offset or header[field] > file_size:
+            raise CytoflowError("The FCS file is corrupted: can't find the "
+                                "{} segment".format(field))
+
+    return header
+
+
+def _read_text(f, header):
+    """Read the TEXT segment into a dict of strings"""
+    f.seek(header["text start"])
+    raw = f.read(header["text end"] - header["text start"] + 1)
+    try:
+        raw = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        raw = raw.decode("utf-8", errors = "ignore")
+
+    delimiter = raw[0]
+
+    if raw[-1] != delimiter:
+        if delimiter.strip() == delimiter:
+            raw = raw.strip()
+        if raw[-1] != delimiter:
+            raw = raw[1:]
+        else:
+            raw = raw[1:-1]
+    else:
+        raw = raw[1:-1]
+
+    # a doubled delimiter is an escaped delimiter
+    elements = []
+    for i, part in enumerate(raw.split(delimiter * 2)):
+        part = part.split(delimiter)
+        if i > 0:
+            elements[-1] += delimiter + part[0]
+            part = part[1:]
+        elements.extend(part)
+
+    return dict(zip(elements[0::2], elements[1::2]))
+
+
+def _convert_text(text):
+    """Convert the integer-valued keywords, as fcsparser does"""
+    ret = dict(text)
+    pars = _int_keyword(ret, "$PAR")
+    for key in (["$P{}B".format(p) for p in range(1, pars + 1)] +
+                ["$NEXTDATA", "$PAR", "$TOT"]):
+        ret[key] = _int_keyword(ret, key)
+    return ret
+
+
+def _int_keyword(text, key):
+    """Get an integer-valued keyword"""
+    if key not in text:
+        raise CytoflowError("Keyword {} is missing".format(key))
+    
+    try:
+        return int(text[key])
+    except ValueError as e:
+        # for example, $PnB is "*" in ASCII (`$DATATYPE` A) files
+        raise CytoflowError("Keyword {} = {} is not an integer"
+                            .format(key, text[key])) from e
+
+
+def _valid_bits(metadata, p):
+    """How many bits of integer parameter ``p`` are used, from ``$PnR``"""
+    key = "$P{}R".format(p)
+    if key not in metadata:
+        raise CytoflowError("Keyword {} is missing".format(key))
+    
+    try:
+        value_range = float(metadata[key])
+    except ValueError as e:
+        raise CytoflowError("Keyword {} = {} is not a number"
+                            .format(key, metadata[key])) from e
+        
+    if not value_range > 0:
+        raise CytoflowError("Keyword {} = {} must be positive"
+                            .format(key, metadata[key]))
+        
+    return int(np.ceil(np.log2(value_range)))
+
+
+def _channel_names(metadata, pars, name_metadata):
+    """Get the channel names, falling back on the other keyword if they aren't unique"""
+    names_n = [metadata.get("$P{}N".format(p), "") for p in pars]
+    names_s = [metadata.get("$P{}S".format(p), "") or n
+               for p, n in zip(pars, names_n)]
+
+    if name_metadata == "$PnS":
+        names, alternate = names_s, names_n
+    else:
+        names, alternate = names_n, names_s
+
+    if len(set(names)) != len(names):
+        names = alternate
+
+    return names
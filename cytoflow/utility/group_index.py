@@ -0,0 +1,142 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.group_index
+----------------------------
+
+`GroupIndex` -- the events in a `pandas.DataFrame`, grouped by the values of
+some of its columns.  Built once (by `Experiment.group_index
+<cytoflow.experiment.Experiment.group_index>`) and then reused by every
+operation that groups by the same columns.
+"""
+
+import numpy as np
+import pandas as pd
+
+class GroupIndex(object):
+    """
+    The events in a `pandas.DataFrame`, grouped by the values of the columns
+    in ``by``.  The groups are the same as ``data.groupby(by)``'s, in the same
+    (sorted) order, except that groups with no events are never included.
+    Events with a missing value in one of the ``by`` columns aren't in any
+    group.
+
+    If ``by`` is empty, there is one group with the key ``True`` that
+    contains every event -- the same as ``data.groupby(lambda _: True)``.
+
+    Iterating over a `GroupIndex` gives ``(key, positions)`` pairs, where
+    ``positions`` are the (sorted) row positions of the group's events.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The data to group.
+
+    by : List(Str)
+        The columns to group by.
+
+    Attributes
+    ----------
+    by : Tuple(Str)
+        The columns the events are grouped by.
+
+    keys : List
+        The groups' keys.  If ``by`` has one column, each key is a value of
+        that column; otherwise, it's a tuple of values.
+
+    codes : numpy.ndarray
+        For each event, the position of its group in `keys`, or -1 if it
+        isn't in a group.
+
+    order : numpy.ndarray
+        The positions of the events that are in a group, sorted by group.
+
+    offsets : numpy.ndarray
+        Where each group starts in `order`.  Has one more entry than `keys`:
+        the last one is ``len(order)``.
+
+    counts : numpy.ndarray
+        The number of events in each group.
+    """
+
+    def __init__(self, data, by):
+        self.by = tuple(by)
+        num_events = len(data)
+
+        if not self.by:
+            self.keys = [True]
+            self.codes = np.zeros(num_events, dtype = np.int8)
+            self.order = np.arange(num_events)
+            self.counts = np.array([num_events])
+            self.offsets = np.array([0, num_events])
+            self._locs = {True : 0}
+            return
+
+        # code each column, then combine them into one code per event
+        codes = np.zeros(num_events, dtype = np.int64)
+        missing = np.zeros(num_events, dtype = np.bool_)
+        uniques = []
+        for b in self.by:
+            col_codes, col_uniques = pd.factorize(data[b], sort = True)
+            missing |= col_codes < 0
+            codes *= len(col_uniques)
+            codes += col_codes
+            uniques.append(col_uniques)
+
+        sizes = [len(u) for u in uniques]
+        num_combinations = int(np.prod(sizes, dtype = np.float64))
+        valid = codes[~missing]
+
+        # keep only the combinations that actually have events
+        if num_combinations <= max(num_events, 1024):
+            observed = np.flatnonzero(np.bincount(valid, minlength = num_combinations))
+            lookup = np.full(num_combinations, -1, dtype = np.int64)
+            lookup[observed] = np.arange(len(observed))
+            group_codes = lookup[valid]
+        else:
+            observed, group_codes = np.unique(valid, return_inverse = True)
+
+        self.codes = np.full(num_events, -1, dtype = np.min_scalar_type(-len(observed) - 1))
+        self.codes[~missing] = group_codes
+
+        key_codes = np.unravel_index(observed, sizes) if len(observed) else [[]] * len(sizes)
+        keys = list(zip(*[u[c] for u, c in zip(uniques, key_codes)]))
+        self.keys = [k[0] for k in keys] if len(self.by) == 1 else keys
+        self._locs = {k : i for i, k in enumerate(self.keys)}
+
+        # numpy uses a radix sort for small integers, so this is O(N)
+        self.order = np.argsort(self.codes, kind = "stable")[np.count_nonzero(missing):]
+        self.counts = np.bincount(group_codes, minlength = len(self.keys))
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._locs
+
+    def __iter__(self):
+        for i, key in enumerate(self.keys):
+            yield key, self.order[self.offsets[i] : self.offsets[i + 1]]
+
+    def indices(self, key):
+        """The row positions of the events in the group ``key``."""
+        i = self._locs[key]
+        return self.order[self.offsets[i] : self.offsets[i + 1]]
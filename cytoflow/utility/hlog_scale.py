@@ -38,6 +38,8 @@ tics are along a plot axis
 `hlog`, `hlog_inv` -- the actual functions that perform the scale and inverse
 """
 
+import functools
+
 from traits.api import (HasTraits, Float, Property, Instance, Str,
                         Undefined, provides, Constant,
                         Tuple, Array)
@@ -108,7 +110,7 @@ class HlogScale(ScaleMixin):
         f = _make_hlog_numeric(self.b, 1.0, np.log10(self.range))
 
         if isinstance(data, pd.Series):            
-            return data.apply(f)
+            return pd.Series(f(data.values), index = data.index, name = data.name)
         elif isinstance(data, np.ndarray):
             return f(data)
         elif isinstance(data, (int, float)):
@@ -129,10 +131,11 @@ class HlogScale(ScaleMixin):
         f_inv = lambda y, b = self.b, d = np.log10(self.range): hlog_inv(y, b, 1.0, d)
         
         if isinstance(data, pd.Series):            
-            return data.apply(f_inv)
+            return pd.Series(f_inv(data.values.astype(np.float64)), 
+                             index = data.index, 
+                             name = data.name)
         elif isinstance(data, np.ndarray):
-            inverse = np.vectorize(f_inv)
-            return inverse(data)
+            return f_inv(data.astype(np.float64))
         elif isinstance(data, float):
             return f_inv(data)
         else:
@@ -289,7 +292,7 @@ class MatplotlibHlogScale(HasTraits, matplotlib.scale.ScaleBase):
             f = _make_hlog_numeric(self.b, 1.0, np.log10(self.range))
 
             if isinstance(values, pd.Series):            
-                return values.apply(f)
+                return pd.Series(f(values.values), index = values.index, name = values.name)
             elif isinstance(values, np.ndarray):
                 return f(values)
             elif isinstance(values, float):
@@ -324,10 +327,11 @@ class MatplotlibHlogScale(HasTraits, matplotlib.scale.ScaleBase):
             f_inv = lambda y, b = self.b, d = np.log10(self.range): hlog_inv(y, b, 1.0, d)
             
             if isinstance(values, pd.Series):            
-                return values.apply(f_inv)
+                return pd.Series(f_inv(values.values.astype(np.float64)), 
+                                 index = values.index, 
+                                 name = values.name)
             elif isinstance(values, np.ndarray):
-                inverse = np.vectorize(f_inv)
-                return inverse(values)
+                return f_inv(values.astype(np.float64))
             elif isinstance(values, float):
                 return f_inv(values)
             else:
@@ -445,8 +449,6 @@ matplotlib.scale.register_scale(MatplotlibHlogScale)
 # http://gorelab.bitbucket.org/flowcytometrytools/
 # thanks, Eugene!
 
-import scipy.optimize
-
 def hlog_inv(y, b, r, d):
     '''
     Inverse of base 10 hyperlog transform.
@@ -459,13 +461,45 @@ def hlog_inv(y, b, r, d):
         s = 1
     return s*10**(s*aux) + b*aux - s
 
+# hlog() is computed by inverting hlog_inv() numerically.  Rather than running
+# a root-finder for every value, we tabulate hlog_inv() once for each set of
+# parameters, interpolate in the table to get close, then polish the answer
+# with a few Newton steps.  The result agrees with a bracketing root-finder
+# (scipy.optimize.brentq, which we used to use) to within 1e-10 * r.
+
+# the number of points in the table, and the number of Newton steps.  with
+# the table this dense, the interpolation is good to ~1e-4 and each Newton
+# step roughly squares the error.
+_HLOG_TABLE_SIZE = 2 ** 14 + 1
+_HLOG_NEWTON_STEPS = 3
+
+@functools.lru_cache(maxsize = 32)
 def _make_hlog_numeric(b, r, d):
     '''
-    Return a function that numerically computes the hlog transformation for given parameter values.
+    Return a function that numerically computes the hlog transformation for 
+    given parameter values.  The function takes a number or an array and 
+    returns a `numpy.ndarray`; values outside of [hlog_inv(-2r), hlog_inv(2r)] 
+    (and NaNs) become NaN.
     '''
-    hlog_obj = lambda y, x, b, r, d: hlog_inv(y, b, r, d) - x
-    find_inv = np.vectorize(lambda x: scipy.optimize.brentq(hlog_obj, -2*r, 2*r, 
-                                        args=(x, b, r, d)))
+    
+    # work in units of r, on [-2, 2]
+    u_table = np.linspace(-2, 2, _HLOG_TABLE_SIZE)
+    x_table = hlog_inv(u_table, b, 1.0, d)
+    
+    def find_inv(x):
+        x = np.asarray(x, dtype = np.float64)
+        
+        u = np.interp(x, x_table, u_table)
+        for _ in range(_HLOG_NEWTON_STEPS):
+            aux = d * u
+            exp = 10 ** np.abs(aux)
+            fx = np.where(aux >= 0, exp - 1, 1 - exp) + b * aux - x
+            dfx = d * (np.log(10) * exp + b)
+            u = np.clip(u - fx / dfx, -2, 2)
+            
+        out_of_range = (x < x_table[0]) | (x > x_table[-1]) | np.isnan(x)
+        return np.where(out_of_range, np.nan, u * r)
+    
     return find_inv 
 
 def hlog(x, b, r, d):
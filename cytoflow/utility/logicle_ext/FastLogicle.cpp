@@ -120,3 +120,60 @@ double FastLogicle::inverse (int index) const
 
     return p->lookup[index];
 }
+
+void FastLogicle::scaleArray (double * values, long n) const
+{
+	const double * lookup = p->lookup;
+	const int bins = p->bins;
+
+	for (long i = 0; i < n; ++i)
+	{
+		double value = values[i];
+
+		// out of range, or NaN
+		if (!(value >= lookup[0] && value < lookup[bins]))
+		{
+			values[i] = NaN;
+			continue;
+		}
+
+		// binary search for the bin, as in intScale
+		int lo = 0;
+		int hi = bins;
+		while (hi - lo > 1)
+		{
+			int mid = (lo + hi) >> 1;
+			if (value < lookup[mid])
+				hi = mid;
+			else
+				lo = mid;
+		}
+
+		// inverse interpolate the table linearly
+		double delta = (value - lookup[lo]) / (lookup[lo + 1] - lookup[lo]);
+		values[i] = (lo + delta) / (double)bins;
+	}
+}
+
+void FastLogicle::inverseArray (double * values, long n) const
+{
+	const double * lookup = p->lookup;
+	const int bins = p->bins;
+
+	for (long i = 0; i < n; ++i)
+	{
+		double x = values[i] * bins;
+
+		// out of range, or NaN
+		if (!(x >= 0 && x < bins))
+		{
+			values[i] = NaN;
+			continue;
+		}
+
+		// interpolate the table linearly
+		int index = (int)floor(x);
+		double delta = x - index;
+		values[i] = (1 - delta) * lookup[index] + delta * lookup[index + 1];
+	}
+}
@@ -34,6 +34,39 @@ except:
    }
 }
 
+// scaleArray and inverseArray take any writable, contiguous buffer of 
+// doubles (like a float64 numpy array) and transform it in place
+%typemap(in) (double * values, long n) (Py_buffer view) {
+   if (PyObject_GetBuffer($input, &view, PyBUF_WRITABLE | PyBUF_FORMAT | PyBUF_C_CONTIGUOUS) != 0) {
+      SWIG_fail;
+   }
+   if (view.format == NULL || strcmp(view.format, "d") != 0) {
+      PyBuffer_Release(&view);
+      PyErr_SetString(PyExc_TypeError, "Expected a contiguous buffer of doubles");
+      SWIG_fail;
+   }
+   $1 = (double *) view.buf;
+   $2 = (long) (view.len / sizeof(double));
+}
+
+%typemap(freearg) (double * values, long n) {
+   PyBuffer_Release(&view$argnum);
+}
+
+// don't hold the GIL while we work through the array, so different threads
+// can transform different parts of it
+%exception scaleArray {
+   Py_BEGIN_ALLOW_THREADS
+   $action
+   Py_END_ALLOW_THREADS
+}
+
+%exception inverseArray {
+   Py_BEGIN_ALLOW_THREADS
+   $action
+   Py_END_ALLOW_THREADS
+}
+
 class Logicle
 {
 public:
@@ -160,6 +193,10 @@ public:
         int intScale (double value) const;
         double inverse (int scale) const;
 
+        // transform a whole array in place.  out-of-range values become NaN
+        void scaleArray (double * values, long n) const;
+        void inverseArray (double * values, long n) const;
+
 private:
         void initialize (int bins);
 
@@ -146,6 +146,12 @@ class FastLogicle(Logicle):
     def inverse(self, *args) -> "double":
         return _Logicle.FastLogicle_inverse(self, *args)
 
+    def scaleArray(self, values: "double *") -> "void":
+        return _Logicle.FastLogicle_scaleArray(self, values)
+
+    def inverseArray(self, values: "double *") -> "void":
+        return _Logicle.FastLogicle_inverseArray(self, values)
+
 # Register FastLogicle in _Logicle:
 _Logicle.FastLogicle_swigregister(FastLogicle)
 FastLogicle.DEFAULT_BINS = _Logicle.cvar.FastLogicle_DEFAULT_BINS
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.logicle_ext.arrays
+-----------------------------------
+
+Transform whole arrays with a `FastLogicle`.
+
+`scale_array`, `inverse_array` -- copy the data into a ``float64`` buffer and
+transform it in place with ``FastLogicle.scaleArray`` or
+``FastLogicle.inverseArray``, which don't hold the GIL.  Large arrays are
+split into chunks and transformed by a pool of threads.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# don't bother with threads for fewer events than this
+_CHUNK_SIZE = 1 << 20
+
+def scale_array(logicle, data, workers = None):
+    """
+    Apply a logicle transform to an array.
+
+    Parameters
+    ----------
+    logicle : FastLogicle
+        The transform.
+
+    data : array-like
+        The data to transform.  Values outside the domain of the transform
+        (and NaNs) become NaN.
+
+    workers : Int (default = None)
+        How many threads to use.  If ``None``, use one per CPU for arrays
+        with more than a million or so values.
+
+    Returns
+    -------
+    numpy.ndarray
+        The transformed data, as a new ``float64`` array with the same shape
+        as ``data``.
+    """
+    return _transform(logicle.scaleArray, data, workers)
+
+
+def inverse_array(logicle, data, workers = None):
+    """
+    Apply the inverse of a logicle transform to an array.  Takes the same
+    parameters as `scale_array`; values outside of [0, 1) become NaN.
+    """
+    return _transform(logicle.inverseArray, data, workers)
+
+
+def _transform(fn, data, workers):
+    ret = np.array(data, dtype = np.float64, order = "C", copy = True)
+    flat = ret.reshape(-1)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    num_chunks = min(workers, len(flat) // _CHUNK_SIZE)
+    if num_chunks <= 1:
+        fn(flat)
+    else:
+        with ThreadPoolExecutor(max_workers = num_chunks) as executor:
+            # each chunk is a contiguous view into ret
+            list(executor.map(fn, np.array_split(flat, num_chunks)))
+
+    return ret
@@ -181,6 +181,10 @@ public:
         int intScale (double value) const;
         double inverse (int scale) const;
 
+        // transform a whole array in place.  out-of-range values become NaN
+        void scaleArray (double * values, long n) const;
+        void inverseArray (double * values, long n) const;
+
 private:
         void initialize (int bins);
 
@@ -53,6 +53,7 @@ import matplotlib.colors
 
 from .scale import IScale, register_scale
 from .logicle_ext.Logicle import FastLogicle
+from .logicle_ext.arrays import scale_array, inverse_array
 from .util_functions import is_numeric
 from .cytoflow_errors import CytoflowError, CytoflowWarning
 
@@ -162,11 +163,12 @@ class LogicleScale(HasStrictTraits):
             logicle_max = self._logicle.inverse(1.0 - sys.float_info.epsilon)
             if isinstance(data, pd.Series):            
                 data = data.clip(logicle_min, logicle_max)
-                return data.apply(self._logicle.scale)
+                return pd.Series(scale_array(self._logicle, data.values),
+                                 index = data.index,
+                                 name = data.name)
             elif isinstance(data, np.ndarray):
                 data = np.clip(data, logicle_min, logicle_max)
-                scale = np.vectorize(self._logicle.scale)
-                return scale(data)
+                return scale_array(self._logicle, data)
             elif isinstance(data, float):
                 data = max(min(data, logicle_max), logicle_min)
                 return self._logicle.scale(data)
@@ -190,11 +192,12 @@ class LogicleScale(HasStrictTraits):
         try:
             if isinstance(data, pd.Series):            
                 data = data.clip(0, 1.0 - sys.float_info.epsilon)
-                return data.apply(self._logicle.inverse)
+                return pd.Series(inverse_array(self._logicle, data.values),
+                                 index = data.index,
+                                 name = data.name)
             elif isinstance(data, np.ndarray):
                 data = np.clip(data, 0, 1.0 - sys.float_info.epsilon)
-                inverse = np.vectorize(self._logicle.inverse)
-                return inverse(data)
+                return inverse_array(self._logicle, data)
             elif isinstance(data, float):
                 data = max(min(data, 1.0 - sys.float_info.epsilon), 0.0)
                 return self._logicle.inverse(data)
@@ -432,11 +435,12 @@ class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):
                 logicle_max = self.logicle.inverse(1.0 - sys.float_info.epsilon)
                 if isinstance(values, pd.Series):            
                     values = values.clip(logicle_min, logicle_max)
-                    return values.apply(self.logicle.scale)
+                    return pd.Series(scale_array(self.logicle, values.values),
+                                     index = values.index,
+                                     name = values.name)
                 elif isinstance(values, np.ndarray):
                     values = np.clip(values, logicle_min, logicle_max)
-                    scale = np.vectorize(self.logicle.scale)
-                    return scale(values)
+                    return scale_array(self.logicle, values)
                 elif isinstance(values, float):
                     data = max(min(values, logicle_max), logicle_min)
                     return self.logicle.scale(data)
@@ -471,11 +475,12 @@ class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):
             try:
                 if isinstance(values, pd.Series):            
                     values = values.clip(0, 1.0 - sys.float_info.epsilon)
-                    return values.apply(self.logicle.inverse)
+                    return pd.Series(inverse_array(self.logicle, values.values),
+                                     index = values.index,
+                                     name = values.name)
                 elif isinstance(values, np.ndarray):
                     values = np.clip(values, 0, 1.0 - sys.float_info.epsilon)
-                    inverse = np.vectorize(self.logicle.inverse)
-                    return inverse(values)
+                    return inverse_array(self.logicle, values)
                 elif isinstance(values, float):
                     values = max(min(values, 1.0 - sys.float_info.epsilon), 0.0)
                     return self.logicle.inverse(values)
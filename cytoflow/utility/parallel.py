@@ -0,0 +1,135 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.parallel
+-------------------------
+
+`map_groups` -- run the same function on each group of events, optionally in
+a process pool.  Used by the operations that fit one model per group (see, 
+for example, `GaussianMixtureOp.workers 
+<cytoflow.operations.gaussian.GaussianMixtureOp.workers>`.)
+
+`mp_context` -- the `multiprocessing` context that process pools should use.
+"""
+
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .cytoflow_errors import CytoflowError, CytoflowOpError
+
+def map_groups(fn, group_args, workers = 1):
+    """
+    Call ``fn(*args)`` for each ``(group, args)`` in ``group_args``.
+    
+    If ``workers`` is greater than 1 (and there's more than one group), the
+    calls run in a `concurrent.futures.ProcessPoolExecutor`, so ``fn``, its
+    arguments and its result must all be picklable -- ``fn`` should be a
+    module-level function, not a lambda or a closure.  The results are the
+    same whether or not they're computed in parallel, as long as ``fn``
+    doesn't depend on global random state.  (Seed any random number 
+    generators through ``args``.)
+    
+    .. note::
+        
+        The worker processes are started with ``forkserver`` (or with 
+        ``spawn`` on Windows), not ``fork``, so a script that sets 
+        ``workers`` must guard its top-level code with 
+        ``if __name__ == '__main__':``.
+    
+    Parameters
+    ----------
+    fn : callable
+        The function to call.
+        
+    group_args : iterable of (group, tuple)
+        The groups, and the arguments to call ``fn`` with for each.
+        
+    workers : Int (default = 1)
+        How many processes to use.
+        
+    Returns
+    -------
+    Dict
+        Each group's result, in the same order as ``group_args``.
+        
+    Raises
+    ------
+    CytoflowOpError
+        If ``fn`` raised an exception for any group.  All the groups are run
+        first, and the error lists every group that failed.  If only one 
+        group failed with a `CytoflowError`, that error is re-raised as-is.
+    """
+    
+    group_args = list(group_args)
+    
+    if workers > 1 and len(group_args) > 1:
+        pool = ProcessPoolExecutor(max_workers = min(workers, len(group_args)),
+                                   mp_context = mp_context())
+    else:
+        pool = contextlib.nullcontext()
+        
+    results = {}
+    errors = []
+        
+    with pool as executor:
+        if executor is None:
+            calls = [(group, lambda args = args: fn(*args)) for group, args in group_args]
+        else:
+            # submit all the groups now; collect them in order below
+            calls = [(group, executor.submit(fn, *args).result) 
+                     for group, args in group_args]
+            
+        for group, call in calls:
+            try:
+                results[group] = call()
+            except Exception as e:
+                errors.append((group, e))
+                
+    if len(errors) == 1 and isinstance(errors[0][1], CytoflowError):
+        raise errors[0][1]
+    elif errors:
+        raise CytoflowOpError(None,
+                              "Estimation failed for {} group(s):\n{}"
+                              .format(len(errors),
+                                      "\n".join("Group {}: {}".format(group, _message(e))
+                                                for group, e in errors))) \
+            from errors[0][1]
+        
+    return results
+
+def mp_context():
+    """
+    The `multiprocessing` context to start worker processes with:
+    ``forkserver`` where it's available, otherwise the platform's default.
+    
+    Don't ``fork`` a process that may be running threads -- `numba`'s 
+    parallel kernels (for example, `polygon_contains`) leave a pool of
+    threads behind, and a forked child can deadlock on their locks.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods 
+                                       else None)
+
+def _message(e):
+    """The message from an exception.  A `CytoflowError`'s is its last arg."""
+    if isinstance(e, CytoflowError) and e.args:
+        return e.args[-1]
+    return str(e)
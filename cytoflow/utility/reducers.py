@@ -0,0 +1,323 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.reducers
+-------------------------
+
+Vectorized versions of common statistics, computed for every group of a
+`GroupIndex` at once.
+
+`group_reduce` -- if a function has a vectorized version, compute it for
+every group in one pass.  `ChannelStatisticOp` uses this, and falls back to
+calling the function once per group if it returns ``None``.
+
+`group_reduce_all` -- the same, for several functions of the same values.
+The work they have in common (sorting the values by group, for example) is
+only done once.
+
+`register_reducer` -- add a vectorized version of a function.
+
+`quantile` -- make a function that computes a quantile, and that has a
+vectorized version.
+
+`GroupedValues` -- the values of each group, as the vectorized versions
+see them.
+
+The functions with vectorized versions are `len`, `numpy.sum`, `numpy.min`,
+`numpy.max`, `numpy.mean`, `numpy.median`, `numpy.std`, `geom_mean`,
+`geom_sd`, `geom_sem` and the functions made by `quantile`.
+"""
+
+import functools
+
+import numpy as np
+
+from .util_functions import geom_mean, geom_sd, geom_sem
+
+_REDUCERS = {}
+
+class GroupedValues(object):
+    """
+    One value per event, split into the groups of a `GroupIndex`.  The
+    values must be ``float64`` with no ``NaN``s.  Things that more than one
+    reducer needs are computed the first time they're asked for.
+
+    Attributes
+    ----------
+    values : numpy.ndarray
+        The values of the events in any group, sorted by group.
+
+    starts : numpy.ndarray
+        Where each group starts in `values`.
+
+    counts : numpy.ndarray
+        The number of events in each group.
+    """
+
+    def __init__(self, values, groups):
+        self.values = values[groups.order]
+        self.starts = groups.offsets[:-1]
+        self.counts = groups.counts
+        self._sorted = None
+        self._geom_mean = None
+        self._geom = None
+
+    @property
+    def sorted_values(self):
+        """Like `values`, but each group's values are sorted too."""
+        if self._sorted is None:
+            if len(self.counts) * 64 <= len(self.values):
+                # sorting each group in place is much faster than lexsort,
+                # unless there are lots of little groups
+                self._sorted = self.values.copy()
+                for start, count in zip(self.starts, self.counts):
+                    self._sorted[start : start + count].sort()
+            else:
+                group_ids = np.repeat(np.arange(len(self.counts)), self.counts)
+                self._sorted = self.values[np.lexsort((self.values, group_ids))]
+        return self._sorted
+
+    @property
+    def rows(self):
+        """
+        If every group is the same size, `values` with one row per group;
+        otherwise ``None``.
+        """
+        if self.counts.min() != self.counts.max() or self.counts[0] == 0:
+            return None
+        return self.values.reshape(len(self.counts), self.counts[0])
+
+    def geom_mean(self):
+        """Each group's `geom_mean`."""
+        if self._geom_mean is None:
+            self._geom_mean = _segment_geom_mean(self.values, self.starts, self.counts)
+        return self._geom_mean
+
+    def geom_stats(self):
+        """
+        Each group's `geom_mean`, and the standard deviation of the logs of
+        its values as `geom_sd` and `geom_sem` compute it.
+        """
+        if self._geom is None:
+            x, starts, counts = self.values, self.starts, self.counts
+            u = self.geom_mean()
+
+            # as in geom_sd, replace non-positive values with |x| + 2 * geom_mean
+            x = np.where(x <= 0, np.abs(x) + 2 * np.repeat(u, counts), x)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                self._geom = (u, _segment_std(np.log(x), starts, counts))
+        return self._geom
+
+    def reduce(self, ufunc):
+        """Reduce each group's values with ``ufunc`` (`numpy.add`, say)."""
+        return ufunc.reduceat(self.values, self.starts)
+
+
+def register_reducer(function, reducer):
+    """
+    Register a vectorized version of ``function``.
+
+    Parameters
+    ----------
+    function : Callable
+        A function that takes a 1-D array of values and returns a scalar.
+
+    reducer : Callable
+        Takes a `GroupedValues` and returns an array with ``function``'s
+        result for each group.
+    """
+    _REDUCERS[function] = reducer
+
+
+def group_reduce(function, values, groups):
+    """
+    Compute ``function`` for every group in ``groups`` in one pass, if it
+    has a vectorized version.
+
+    Parameters
+    ----------
+    function : Callable
+        The function to compute.
+
+    values : array-like
+        The values for every event (not just the ones in ``groups``).
+
+    groups : `GroupIndex`
+        The groups to compute ``function`` for.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        ``function``'s result for each group, in the same order as
+        ``groups.keys``; or ``None`` if ``function`` doesn't have a
+        vectorized version, or if ``values`` isn't numeric or has ``NaN``s.
+        (Then call ``function`` on each group instead.)
+    """
+    return group_reduce_all([function], values, groups)[0]
+
+
+def group_reduce_all(functions, values, groups):
+    """
+    Like `group_reduce`, for each function in ``functions``.
+
+    Returns
+    -------
+    List
+        For each function, its result for each group (a `numpy.ndarray`) or
+        ``None``.
+    """
+    reducers = [_reducer(fn) for fn in functions]
+    if all(r is None for r in reducers):
+        return reducers
+
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iuf':
+        return [None] * len(reducers)
+
+    values = values.astype(np.float64, copy = False)
+    if np.isnan(values).any():
+        return [None] * len(reducers)
+
+    if len(groups) == 0:
+        return [None if r is None else np.empty(0) for r in reducers]
+
+    grouped = GroupedValues(values, groups)
+    return [None if r is None else r(grouped) for r in reducers]
+
+
+def _reducer(function):
+    try:
+        return _REDUCERS.get(function)
+    except TypeError:
+        # unhashable
+        return None
+
+
+@functools.lru_cache(maxsize = None)
+def quantile(q):
+    """
+    Make a function that computes the ``q``'th quantile of an array, the
+    same as `numpy.quantile`.  Unlike a ``lambda``, the function has a
+    vectorized version (see `group_reduce`) and a name,
+    ``quantile_<q>``.  Calling `quantile` again with the same ``q`` 
+    returns the same function, so its vectorized version is only 
+    registered once.
+
+    Parameters
+    ----------
+    q : Float
+        The quantile, between 0 and 1.
+
+    Returns
+    -------
+    Callable
+        A function that takes an array and returns its ``q``'th quantile.
+    """
+
+    if not 0 <= q <= 1:
+        raise ValueError("q must be between 0 and 1")
+
+    def fn(a):
+        return np.quantile(a, q)
+
+    fn.__name__ = fn.__qualname__ = "quantile_{:g}".format(q)
+    register_reducer(fn, lambda grouped: _quantile(grouped, q))
+
+    return fn
+
+## the reducers
+
+def _segment_std(x, starts, counts):
+    """The standard deviation (``ddof = 0``) of each segment of ``x``."""
+    mean = np.add.reduceat(x, starts) / counts
+    dev = x - np.repeat(mean, counts)
+    return np.sqrt(np.add.reduceat(dev * dev, starts) / counts)
+
+def _segment_geom_mean(x, starts, counts):
+    """Like `geom_mean`, for each segment of ``x``."""
+    pos = x > 0
+    neg = x < 0
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        logs = np.log(np.abs(x))
+
+        num_pos = np.add.reduceat(pos, starts, dtype = np.int64)
+        num_neg = np.add.reduceat(neg, starts, dtype = np.int64)
+
+        # a group with no positive values has a NaN geometric mean,
+        # like scipy.stats.gmean of an empty array
+        pos_mean = np.exp(np.add.reduceat(np.where(pos, logs, 0), starts) / num_pos)
+        neg_mean = np.where(num_neg > 0,
+                            np.exp(np.add.reduceat(np.where(neg, logs, 0), starts) / num_neg),
+                            0)
+
+    return (pos_mean * (num_pos / counts)) - (neg_mean * (num_neg / counts))
+
+def _quantile(grouped, q):
+    if grouped.rows is not None:
+        # partitioning each row is faster than sorting it
+        return np.quantile(grouped.rows, q, axis = 1)
+
+    x, starts, n = grouped.sorted_values, grouped.starts, grouped.counts
+
+    # the same arithmetic as numpy.quantile's default ("linear") method
+    virtual = n * q + (1 + q * -1) - 1
+    lo = np.floor(virtual)
+    t = virtual - lo
+    lo = lo.astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+
+    a = x[starts + lo]
+    b = x[starts + hi]
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+def _median(grouped):
+    if grouped.rows is not None:
+        return np.median(grouped.rows, axis = 1)
+
+    x, starts, n = grouped.sorted_values, grouped.starts, grouped.counts
+
+    # like numpy.median: the middle value, or the mean of the middle two
+    lo = x[starts + (n - 1) // 2]
+    hi = x[starts + n // 2]
+    return np.where(n % 2 == 1, lo, (lo + hi) / 2)
+
+def _geom_sd(grouped):
+    _, log_sd = grouped.geom_stats()
+    return np.exp(log_sd)
+
+def _geom_sem(grouped):
+    u, log_sd = grouped.geom_stats()
+    return u * log_sd / np.sqrt(grouped.counts)
+
+for _function, _reducer_fn in [(len, lambda g: g.counts.copy()),
+                               (np.sum, lambda g: g.reduce(np.add)),
+                               (np.min, lambda g: g.reduce(np.minimum)),
+                               (np.max, lambda g: g.reduce(np.maximum)),
+                               (np.mean, lambda g: g.reduce(np.add) / g.counts),
+                               (np.median, _median),
+                               (np.std, lambda g: _segment_std(g.values, g.starts, g.counts)),
+                               (geom_mean, lambda g: g.geom_mean()),
+                               (geom_sd, _geom_sd),
+                               (geom_sem, _geom_sem)]:
+    register_reducer(_function, _reducer_fn)
+
+del _function, _reducer_fn
@@ -32,9 +32,12 @@ Base classes and functions for `cytoflow` scales.
 `register_scale` -- register a new type of scale
 
 `set_default_scale`, `get_default_scale` -- sets and gets the default scale
+
+`set_scale_cache_size`, `get_scale_cache_size` -- sets and gets how much memory
+each `Experiment` can use to remember scaled columns
 """
 
-import numbers
+import numbers, weakref
 
 from traits.api import Interface, Str, Instance, Tuple, Array
 
@@ -152,11 +155,19 @@ class ScaleMixin(HasStrictTraits):
 # maps name -> scale object
 _scale_mapping = {}
 _scale_default = "linear"
+_scale_cache_size = 2 ** 30
 
 def scale_factory(scale, experiment, **scale_params):
     """
     Make a new instance of a named scale.
     
+    Scales that are parameterized by a ``channel`` or a ``condition`` are 
+    memoized in ``experiment``: asking for the same scale with the same
+    parameters again returns the same instance (without estimating its
+    parameters again), until events are added or removed or that channel or 
+    condition is replaced.  So don't change a scale's parameters after you
+    get it from `scale_factory`.
+    
     Parameters
     ----------
     scale : string
@@ -173,8 +184,29 @@ def scale_factory(scale, experiment, **scale_params):
         
     if scale not in _scale_mapping:
         raise CytoflowError("Unknown scale type {0}".format(scale))
+    
+    key = None
+    if experiment is not None \
+        and ("channel" in scale_params or "condition" in scale_params) \
+        and not {"statistic", "error_statistic", "data"} & set(scale_params):
+        key = (scale, tuple(sorted(scale_params.items())))
+        try:
+            hash(key)
+        except TypeError:
+            key = None
+            
+    if key is None:
+        return _scale_mapping[scale](experiment = experiment, **scale_params)
+    
+    row_index = experiment.data.index
+    if key in experiment._scales:
+        ref, ret = experiment._scales[key]
+        if ref() is row_index:
+            return ret
         
-    return _scale_mapping[scale](experiment = experiment, **scale_params)
+    ret = _scale_mapping[scale](experiment = experiment, **scale_params)
+    experiment._scales[key] = (weakref.ref(row_index), ret)
+    return ret
  
 def register_scale(scale_class):
     """
@@ -200,6 +232,25 @@ def get_default_scale():
     """Get the defaults scale set with `set_default_scale`"""
     return _scale_default
 
+def set_scale_cache_size(size):
+    """
+    Set how much memory (in bytes) each `Experiment` can use to remember
+    scaled columns (see `Experiment.scaled 
+    <cytoflow.experiment.Experiment.scaled>`.)  Set it to 0 to turn the cache
+    off.  The default is 1 GB.
+    """
+    
+    global _scale_cache_size
+    
+    if size < 0:
+        raise CytoflowError("The scale cache size must be >= 0")
+    
+    _scale_cache_size = size
+    
+def get_scale_cache_size():
+    """Get the scale cache size set with `set_scale_cache_size`"""
+    return _scale_cache_size
+
 # register the new scales
 import cytoflow.utility.linear_scale   # @UnusedImport
 import cytoflow.utility.log_scale      # @UnusedImport
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3.8
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2018
+# (c) Brian Teague 2018-2022
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cytoflow.utility.tube_cache
+---------------------------
+
+An on-disk cache of parsed FCS files.
+
+`TubeCache` -- stores each parsed tube as one ``.npy`` file per channel, plus
+a JSON file with the tube's metadata.  Entries are keyed by the file's path,
+size and modification time, and by the data set and channel-name metadata
+it was parsed with.  When the cache grows past its size limit, the entries
+that were used least recently are removed.
+
+`set_tube_cache`, `get_tube_cache` -- sets and gets the cache that
+`parse_tube <cytoflow.operations.import_op.parse_tube>` uses.  Caching is
+off by default.
+"""
+
+import os, json, hashlib, shutil, tempfile
+
+import numpy as np
+
+from .cytoflow_errors import CytoflowError
+
+class TubeCache(object):
+    """
+    An on-disk, size-limited, least-recently-used cache of parsed tubes.
+
+    Parameters
+    ----------
+    path : str
+        The directory to keep the cache in.  Created if it doesn't exist.
+
+    max_size : int
+        The maximum size of the cache, in bytes.
+    """
+
+    def __init__(self, path, max_size):
+        if max_size <= 0:
+            raise CytoflowError("max_size must be positive")
+
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok = True)
+
+    def key(self, filename, data_set, name_metadata):
+        """
+        Get the cache key for an FCS file.  The key changes if the file is
+        modified.
+        """
+
+        stat = os.stat(filename)
+        fingerprint = repr((os.path.abspath(filename),
+                            stat.st_size,
+                            stat.st_mtime_ns,
+                            data_set,
+                            name_metadata))
+        return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+
+    def get(self, key, metadata_only = False):
+        """
+        Look up a tube.
+
+        Returns
+        -------
+        (metadata, data) or None
+            The tube's metadata dict and a dict mapping channel names to
+            read-only memory-mapped arrays, or ``None`` if the tube isn't in
+            the cache.  If ``metadata_only`` is ``True``, ``data`` is
+            ``None``.
+        """
+
+        entry = os.path.join(self.path, key)
+        meta_file = os.path.join(entry, "meta.json")
+        if not os.path.exists(meta_file):
+            return None
+
+        try:
+            with open(meta_file, "r", encoding = "utf-8") as f:
+                entry_meta = json.load(f)
+
+            # mark this entry as recently used
+            os.utime(meta_file)
+
+            if metadata_only:
+                return entry_meta["metadata"], None
+
+            data = {c : np.load(os.path.join(entry, "{}.npy".format(i)),
+                                mmap_mode = 'r')
+                    for i, c in enumerate(entry_meta["channels"])}
+
+        except (OSError, ValueError, KeyError):
+            # a damaged entry.  get rid of it.
+            shutil.rmtree(entry, ignore_errors = True)
+            return None
+
+        return entry_meta["metadata"], data
+
+    def put(self, key, metadata, data):
+        """
+        Store a tube, then evict the least-recently-used tubes until the
+        cache fits in ``max_size``.
+
+        Parameters
+        ----------
+        key : str
+            The key from `key`.
+
+        metadata : dict
+            The tube's metadata.  Must be serializable as JSON.
+
+        data : pandas.DataFrame
+            The tube's events.
+        """
+
+        entry = os.path.join(self.path, key)
+        if os.path.exists(entry):
+            return
+
+        # write a temporary directory, then rename it, so that other
+        # processes never see a partial entry
+        tmp = tempfile.mkdtemp(prefix = ".tmp", dir = self.path)
+        try:
+            for i, c in enumerate(data.columns):
+                np.save(os.path.join(tmp, "{}.npy".format(i)),
+                        np.ascontiguousarray(data[c].values))
+
+            with open(os.path.join(tmp, "meta.json"), "w", encoding = "utf-8") as f:
+                json.dump({"channels" : list(data.columns),
+                           "metadata" : metadata}, f)
+
+            os.rename(tmp, entry)
+        except (OSError, TypeError, ValueError):
+            # someone else stored this entry first, the disk is full, or
+            # the metadata isn't JSON.  either way, it's just a cache.
+            shutil.rmtree(tmp, ignore_errors = True)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least-recently-used entries until the cache is smaller
+        than ``max_size``.
+        """
+
+        entries = []
+        total_size = 0
+        for key in os.listdir(self.path):
+            entry = os.path.join(self.path, key)
+            meta_file = os.path.join(entry, "meta.json")
+            if key.startswith(".") or not os.path.exists(meta_file):
+                continue
+
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry))
+                entries.append((os.stat(meta_file).st_mtime, size, entry))
+            except OSError:
+                continue
+
+            total_size += size
+
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            shutil.rmtree(entry, ignore_errors = True)
+            total_size -= size
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        for key in os.listdir(self.path):
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors = True)
+
+
+_tube_cache = None
+
+def set_tube_cache(path, max_size = 10 * 2 ** 30):
+    """
+    Turn on caching of parsed FCS files.  The cache is used by every
+    `ImportOp <cytoflow.operations.import_op.ImportOp>`, including the ones
+    that operations like `AutofluorescenceOp
+    <cytoflow.operations.autofluorescence.AutofluorescenceOp>` use to load
+    their controls.
+
+    Parameters
+    ----------
+    path : str or None
+        The directory to keep the cache in, or ``None`` to turn caching off.
+
+    max_size : int (default = 10 GB)
+        The maximum size of the cache, in bytes.
+    """
+
+    global _tube_cache
+
+    _tube_cache = TubeCache(path, max_size) if path is not None else None
+
+def get_tube_cache():
+    """Get the `TubeCache` set with `set_tube_cache`, or ``None``."""
+    return _tube_cache
@@ -151,7 +151,7 @@ class ExportFCS(HasStrictTraits):
                 self._include_by = _include_by
                 
                 if by:
-                    self._iter = experiment.data.groupby(by).__iter__()
+                    self._iter = iter(experiment.group_index(by))
                 
             def __iter__(self):
                 return self
@@ -260,8 +260,10 @@ class ExportFCS(HasStrictTraits):
                 common_metadata['$P{}V'.format(i + 1)] = experiment.metadata[channel]['voltage']
             
         
-        for group, data_subset in experiment.data.groupby(self.by):
-            data_subset = data_subset[experiment.channels]
+        channel_data = experiment.data[experiment.channels].values
+        
+        for group, group_idx in experiment.group_index(self.by):
+            data_subset = channel_data[group_idx]
             
             if len(self.by) == 1:
                 group = [group]
@@ -288,7 +290,7 @@ class ExportFCS(HasStrictTraits):
             util.write_fcs(str(full_path), 
                            experiment.channels, 
                            {c: experiment.metadata[c]['range'] for c in experiment.channels},
-                           data_subset.values,
+                           data_subset,
                            compat_chn_names = False,
                            compat_negative = False,
                            **kws)
@@ -134,7 +134,7 @@ class HistogramView(Base1DView):
         scale = kwargs.pop('scale')[self.channel]
         lim = kwargs.pop('lim')[self.channel]
         
-        scaled_data = scale(experiment[self.channel])
+        scaled_data = experiment.scaled(self.channel, scale)
         num_bins = kwargs.pop('num_bins', util.num_hist_bins(scaled_data))
         num_bins = util.num_hist_bins(scaled_data) if num_bins is None else num_bins
         
@@ -47,7 +47,7 @@ except ImportError:
 setup(
     name = "cytoflow",
     version = versioneer.get_version(),  # @UndefinedVariable
-    packages = find_namespace_packages(exclude = ["package", "package.qt"]),
+    packages = find_namespace_packages(exclude = ["package", "package.qt", "benchmarks"]),
     cmdclass = cmdclass,
     
     # Project uses reStructuredText, so ensure that the docutils get